@@ -1,13 +1,16 @@
 import streamlit as st
-from data_fetcher import get_user_workouts, get_user_posts
-from modules import display_recent_workouts, display_activity_summary
-from google.cloud import bigquery
+from data_fetcher import get_user_workouts
+from ids import new_id
+import community  # adds written posts to friends' timelines
+from modules import display_recent_workouts, display_activity_summary, display_query_debug_panel, display_failed_writes
+from write_buffer import get_write_buffer
 import datetime
 import uuid
 
 userId = 'user1'
 def display_activity_page(userId):
     st.header("Activity Page")
+    display_failed_writes(userId, "Posts", lambda row: f"Your post \"{row.get('Content')}\"")
 
     st.subheader("Filter Workouts by Date")
     apply_filter = st.checkbox("Filter by date range")
@@ -96,33 +99,23 @@ def display_activity_page(userId):
     if share_button:
         print("share button clicked")   
         new_row = {
-            "PostId": "post" + str(len(get_user_posts(userId)) + 1),
+            "PostId": new_id("post"),
             "AuthorId": userId,
             "Timestamp": datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S'),
             "ImageUrl": "http://example.com/posts/post5.jpg",
             "Content": post_content
         }
 
-        try:
-            client = bigquery.Client(project="sectiona4project")
-            table_ref = client.dataset("ISE").table("Posts")
-
-            rows_to_insert = [new_row]
-            errors = client.insert_rows_json(table_ref, rows_to_insert)
-
-            if errors == []:
-                st.write("Post created successfully")
-                print("Successfully added row to sectiona4project.ISE.Posts")
-                st.rerun()
-            else:
-                print(f"Errors encountered while inserting rows: {errors}")
-
-        except Exception as e:
-            print(f"An error occurred: {e}")
+        # Written in the background; get_user_posts already includes the pending
+        # post, and friends' timelines get it once it is written
+        get_write_buffer("Posts").add(new_row)
+        st.write("Post created successfully")
+        st.rerun()
 
 
 
 if __name__ == '__main__':
     display_activity_page(userId)
+    display_query_debug_panel()
     
     
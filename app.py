@@ -5,15 +5,54 @@
 #
 #############################################################################
 
+from typing import NamedTuple
+
 import streamlit as st
-from modules import display_my_custom_component, display_post, display_genai_advice, display_activity_summary, display_recent_workouts
-from data_fetcher import get_user_posts, get_genai_advice, get_user_profile, get_user_sensor_data, get_user_workouts
+from modules import display_my_custom_component, display_post, display_genai_advice_stream, display_activity_summary, display_recent_workouts, display_query_debug_panel
+from data_fetcher import get_user_posts, get_genai_advice, get_user_profiles, get_user_sensor_data, get_user_workouts
 from google.cloud import bigquery
+from clients import GENAI_WARMUP, start_genai_warmup
+from page_loader import Dependency, load_page_data
 
 
 
 userId = 'user1'
 
+if GENAI_WARMUP:
+    start_genai_warmup()
+
+class HomePageData(NamedTuple):
+    """Everything the home page shows, fetched up front by load_home_page_data."""
+    workouts: list = None
+    advice: dict = None
+    posts: list = None
+    profiles: dict = None
+    errors: dict = None
+
+
+def load_home_page_data(userId):
+    """Fetches the home page's data, running independent queries concurrently."""
+    return load_page_data(HomePageData, [
+        Dependency('workouts', get_user_workouts, args=(userId,)),
+        # Only the advice query runs here; the model is called while rendering
+        Dependency('advice', lambda user_id: get_genai_advice(user_id, stream=True), args=(userId,)),
+        Dependency('posts', get_user_posts, args=(userId,)),
+        # Resolve every author in one query instead of one query per post
+        Dependency('profiles', lambda posts: get_user_profiles([post['user_id'] for post in posts]),
+                   requires=('posts',)),
+    ])
+
+
+def display_load_error(data, name, message):
+    """Shows message if the named part of the page failed to load."""
+    error = data.errors.get(name)
+    if error is None:
+        return False
+    print(f"Failed to load {name}: {error}")
+    st.error(message)
+    return True
+
+
 def display_app_page():
     """Displays the home page of the app."""
     st.title('Welcome to your workout space!')
@@ -25,35 +64,52 @@ def display_app_page():
 
 
     #Display
-    workouts = get_user_workouts(userId)
-    display_activity_summary(workouts)
-    display_recent_workouts(workouts)
-    display_genai_advice_component(userId)
-    display_display_posts(userId)
+    data = load_home_page_data(userId)
+    if not display_load_error(data, 'workouts', "Could not load your workouts."):
+        display_activity_summary(data.workouts)
+        display_recent_workouts(data.workouts)
+    # Keep the advice's place on the page but paint the posts before waiting on the model
+    advice_container = st.container()
+    display_display_posts(data)
+    display_genai_advice_component(data, advice_container)
 
-def display_display_posts(userId):
+def display_display_posts(data):
     st.title('Posts')
-    posts = get_user_posts(userId)
-    for post in posts:
-        user_profile = get_user_profile(post['user_id'])
+    if display_load_error(data, 'posts', "Could not load your posts."):
+        return
+    profiles = data.profiles or {}
+    for post in data.posts:
+        user_profile = profiles.get(post['user_id'], {})
         post_image = post['image'] if post['image'] and post['image'].startswith("http") else None
         display_post(
-            username=user_profile['username'],
-            user_image=user_profile['profile_image'],
+            username=user_profile.get('username', post['user_id']),
+            user_image=user_profile.get('profile_image'),
             timestamp=post['timestamp'],
             content=post['content'],
             post_image=post_image
         )
 
-def display_genai_advice_component(userId):
+def display_genai_advice_component(data, container):
 
-    gen_ai_data = get_genai_advice(userId)
-    print(gen_ai_data)
-    display_genai_advice(gen_ai_data['timestamp'], gen_ai_data['content'], gen_ai_data['image'])
+    with container:
+        if display_load_error(data, 'advice', "Could not generate advice right now."):
+            return
+    gen_ai_data = data.advice
+    try:
+        content = display_genai_advice_stream(
+            gen_ai_data['timestamp'], gen_ai_data['content'], gen_ai_data['image'], container
+        )
+    except Exception as e:
+        print(f"Failed to generate advice: {e}")
+        with container:
+            st.error("Could not generate advice right now.")
+        return
+    print({**gen_ai_data, 'content': content})
 
 
 
 # This is the starting point for your app. You do not need to change these lines
 if __name__ == '__main__':
     display_app_page()
+    display_query_debug_panel()
     
@@ -0,0 +1,132 @@
+#############################################################################
+# benchmarks/bench_activity_summary.py
+#
+# Times summarize_workouts on long synthetic workout histories, without
+# Streamlit, against two pure-Python baselines: the aggregation
+# display_activity_summary used to do inline, which computed only totals and
+# series, and a loop computing everything summarize_workouts returns.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_activity_summary
+#############################################################################
+
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+import clients
+import data_fetcher
+from benchmarks.bench_bulk_fetch import synthetic_workouts
+from benchmarks.fakes import FakeBigQueryClient
+from workout_stats import summarize_workouts
+
+HISTORY_SIZES = [10**4, 10**5]
+REPEATS = 5
+
+
+def inline_summary(workouts_list):
+    """The aggregation display_activity_summary did before summarize_workouts."""
+    workout_details = []
+    for workout in workouts_list:
+        workout_details.append({
+            "workout_id": workout.get('workout_id', 'N/A'),
+            "start_timestamp": workout.get('start_timestamp', 'N/A'),
+            "end_timestamp": workout.get('end_timestamp', 'N/A'),
+            "distance": workout.get('distance', 0),
+            "steps": workout.get('steps', 0),
+            "calories_burned": workout.get('calories_burned', 0)
+        })
+    missing = [
+        workout for workout in workouts_list
+        if "distance" not in workout or "steps" not in workout or "calories_burned" not in workout
+    ]
+    total_distance = sum(workout['distance'] for workout in workouts_list)
+    total_steps = sum(workout['steps'] for workout in workouts_list)
+    total_calories = sum(workout['calories_burned'] for workout in workouts_list)
+    distances = [workout['distance'] for workout in workouts_list]
+    steps = [workout['steps'] for workout in workouts_list]
+    return workout_details, missing, total_distance, total_steps, total_calories, distances, steps
+
+
+def python_summary(workouts_list):
+    """Computes the same statistics as summarize_workouts with plain loops."""
+    def parse(value):
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S') if value else None
+
+    distances, steps, calories, durations, paces = [], [], [], [], []
+    missing = {'distance': [], 'steps': [], 'calories_burned': []}
+    daily = defaultdict(lambda: [0, 0.0, 0, 0])
+    for i, workout in enumerate(workouts_list):
+        values = []
+        for field in ('distance', 'steps', 'calories_burned'):
+            value = workout.get(field)
+            if value is None:
+                missing[field].append(i)
+                value = 0
+            values.append(value)
+        distance, step_count, calories_burned = values
+        distances.append(distance)
+        steps.append(step_count)
+        calories.append(calories_burned)
+        start, end = parse(workout.get('start_timestamp')), parse(workout.get('end_timestamp'))
+        duration = (end - start).total_seconds() / 60 if start and end else None
+        durations.append(duration)
+        paces.append(duration / distance if duration is not None and distance > 0 else None)
+        if start:
+            day = daily[start.date().isoformat()]
+            day[0] += 1
+            day[1] += distance
+            day[2] += step_count
+            day[3] += calories_burned
+    paced = [(duration, distance) for duration, distance in zip(durations, distances) if duration is not None and distance > 0]
+    paced_distance = sum(distance for _, distance in paced)
+    return {
+        'total_distance': sum(distances),
+        'total_steps': sum(steps),
+        'total_calories': sum(calories),
+        'distances': distances,
+        'steps': steps,
+        'calories': calories,
+        'durations': durations,
+        'paces': paces,
+        'average_pace': sum(duration for duration, _ in paced) / paced_distance if paced_distance else None,
+        'missing': missing,
+        'daily': dict(sorted(daily.items())),
+    }
+
+
+def best_time(func, argument):
+    times = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func(argument)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'workouts':>9} {'input':>8} {'aggregation':>12} {'time ms':>9} {'speedup':>8}")
+    for size in HISTORY_SIZES:
+        table = synthetic_workouts(size, rng)
+        clients.set_bigquery_client(FakeBigQueryClient(lambda query, params: table))
+        records = data_fetcher.get_user_workouts.uncached("user1")
+        dicts = [dict(record) for record in records]
+
+        baseline = best_time(inline_summary, dicts)
+        rows = [
+            ("dicts", "inline", baseline),
+            ("dicts", "python", best_time(python_summary, dicts)),
+            ("dicts", "engine", best_time(summarize_workouts, dicts)),
+            ("records", "engine", best_time(summarize_workouts, records)),
+            ("table", "engine", best_time(summarize_workouts, table)),
+        ]
+        for kind, aggregation, elapsed in rows:
+            print(f"{size:>9} {kind:>8} {aggregation:>12} {elapsed * 1000:>9.1f} {baseline / elapsed:>7.1f}x")
+    clients.reset_bigquery_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#############################################################################
+# benchmarks/bench_bulk_fetch.py
+#
+# Compares the "rows" and "arrow" fetch engines of the bulk fetchers, and the
+# Arrow table fetchers, on large synthetic results served from a local
+# stand-in for BigQuery.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_bulk_fetch
+#############################################################################
+
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+
+import clients
+import data_fetcher
+from benchmarks.bench_sensor_data import SENSORS
+from benchmarks.fakes import FakeBigQueryClient
+
+ROW_COUNTS = [10**5, 10**6]
+
+START_MICROS = int(datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp() * 1_000_000)
+
+
+def _timestamps(micros):
+    return pa.array(micros, pa.timestamp("us", tz="UTC"))
+
+
+def synthetic_workouts(rows, rng):
+    """One workout a row, an hour long, every six hours."""
+    starts = START_MICROS + np.arange(rows, dtype=np.int64) * 6 * 3600 * 1_000_000
+    return pa.table({
+        "WorkoutId": [f"workout{i}" for i in range(rows)],
+        "StartTimestamp": _timestamps(starts),
+        "EndTimestamp": _timestamps(starts + 3600 * 1_000_000),
+        "StartLocationLat": rng.uniform(-90, 90, rows),
+        "StartLocationLong": rng.uniform(-180, 180, rows),
+        "EndLocationLat": rng.uniform(-90, 90, rows),
+        "EndLocationLong": rng.uniform(-180, 180, rows),
+        "TotalDistance": rng.uniform(1, 20, rows),
+        "TotalSteps": rng.integers(1000, 30000, rows),
+        "CaloriesBurned": rng.integers(100, 1500, rows),
+    })
+
+
+def synthetic_sensor_data(rows, rng):
+    """Every sensor sampled once per second until rows readings exist."""
+    seconds = -(-rows // len(SENSORS))
+    ticks = START_MICROS + np.arange(seconds, dtype=np.int64) * 1_000_000
+    return pa.table({
+        "Timestamp": _timestamps(np.repeat(ticks, len(SENSORS))[:rows]),
+        "SensorValue": rng.normal(100, 10, rows),
+        "SensorName": np.tile([name for name, _ in SENSORS], seconds)[:rows],
+        "SensorUnits": np.tile([units for _, units in SENSORS], seconds)[:rows],
+    })
+
+
+def synthetic_calories(rows, rng):
+    """Four meals a day."""
+    days = np.arange(rows, dtype=np.int64) // 4
+    created = START_MICROS + np.arange(rows, dtype=np.int64) * 6 * 3600 * 1_000_000
+    return pa.table({
+        "MealId": [f"meal{i}" for i in range(rows)],
+        "UserId": pa.array(["user1"] * rows),
+        "MealDate": pa.array((days + 18262).astype(np.int32), pa.date32()),
+        "MealName": np.tile(["Oatmeal", "Salad", "Pasta", "Yogurt"], -(-rows // 4))[:rows],
+        "Calories": rng.integers(100, 900, rows),
+        "Protein": rng.uniform(0, 60, rows),
+        "Carbs": rng.uniform(0, 120, rows),
+        "Fats": rng.uniform(0, 40, rows),
+        "CreatedAt": _timestamps(created),
+    })
+
+
+# name in FETCH_ENGINES, table builder, record fetcher, table fetcher
+FETCHERS = [
+    ("workouts", synthetic_workouts,
+     lambda: data_fetcher.get_user_workouts.uncached("user1"),
+     lambda: data_fetcher.get_user_workouts_table.uncached("user1")),
+    ("sensor_data", synthetic_sensor_data,
+     lambda: data_fetcher.get_user_sensor_data.uncached("user1", "workout1"),
+     lambda: data_fetcher.get_user_sensor_data_table.uncached("user1", "workout1")),
+    ("calories", synthetic_calories,
+     lambda: data_fetcher.get_user_calorie_tracking.uncached("user1"),
+     lambda: data_fetcher.get_user_calorie_tracking_table.uncached("user1")),
+]
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'fetcher':>12} {'rows':>8} {'path':>12} {'time ms':>10} {'rows/s':>12} {'speedup':>8}")
+    for name, build, fetch_records, fetch_table in FETCHERS:
+        for rows in ROW_COUNTS:
+            table = build(rows, rng)
+            clients.set_bigquery_client(FakeBigQueryClient(lambda query, params: table))
+
+            data_fetcher.set_fetch_engine(name, "rows")
+            baseline, expected = timed(fetch_records)
+            data_fetcher.set_fetch_engine(name, "arrow")
+            arrow_records, actual = timed(fetch_records)
+            assert actual == expected, f"{name}: arrow engine returned different records"
+            del expected, actual
+            arrow_table, _ = timed(fetch_table)
+
+            for path, elapsed in (("rows", baseline), ("arrow", arrow_records), ("arrow table", arrow_table)):
+                print(f"{name:>12} {rows:>8} {path:>12} {elapsed * 1000:>10.1f} "
+                      f"{rows / elapsed:>12,.0f} {baseline / elapsed:>7.1f}x")
+            data_fetcher.set_fetch_engine(name, "rows")
+    clients.reset_bigquery_client()
+
+
+if __name__ == "__main__":
+    main()
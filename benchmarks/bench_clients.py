@@ -0,0 +1,46 @@
+#############################################################################
+# benchmarks/bench_clients.py
+#
+# Renders the home page repeatedly against a local stand-in and reports how
+# many BigQuery clients were built.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_clients
+#############################################################################
+
+import time
+
+import clients
+import data_fetcher
+from app import display_app_page
+from benchmarks.fakes import FakeBigQueryClient, FakeGenerativeModel, quiet_streamlit, sample_responder
+
+RENDERS = 20
+
+
+def main():
+    quiet_streamlit()
+    data_fetcher.GENAI_CACHE_PATH = ""  # measure real model calls, not the disk cache
+    clients.reset_bigquery_client()
+    clients.set_bigquery_client_factory(lambda: FakeBigQueryClient(sample_responder()))
+    clients.set_genai_model(FakeGenerativeModel())
+
+    display_app_page()  # warmup
+    warm = clients.get_client_stats()["bigquery_clients_created"]
+
+    started = time.perf_counter()
+    for _ in range(RENDERS):
+        display_app_page()
+    elapsed = time.perf_counter() - started
+
+    created_after_warmup = clients.get_client_stats()["bigquery_clients_created"] - warm
+    print(f"clients created during warmup:       {warm}")
+    print(f"clients created after warmup:        {created_after_warmup} over {RENDERS} renders")
+    print(f"mean display_app_page render time:   {elapsed / RENDERS * 1000:.2f} ms")
+    clients.reset_bigquery_client()
+    clients.reset_genai_model()
+    return created_after_warmup
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
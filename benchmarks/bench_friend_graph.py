@@ -0,0 +1,105 @@
+#############################################################################
+# benchmarks/bench_friend_graph.py
+#
+# Builds FriendGraph over a synthetic Friends table of 10^5 users and times
+# loading it, its memory, and friends_of / mutual_friends lookups from
+# memory, against the one Friends query per lookup the community page used
+# to run.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_friend_graph
+#############################################################################
+
+import gc
+import time
+import tracemalloc
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+
+import clients
+from benchmarks.fakes import FakeBigQueryClient
+from friend_graph import FriendGraph
+
+USERS = 10**5
+AVERAGE_DEGREE = 20
+LOOKUPS = 10**5
+# Round trip of a small BigQuery job, for the estimate of the old path.
+QUERY_LATENCY = 0.4
+
+
+def synthetic_friendships(users, average_degree, rng):
+    """Random friendships, a tenth of them stored again in the other direction."""
+    edges = users * average_degree // 2
+    first = rng.integers(0, users, edges)
+    second = rng.integers(0, users, edges)
+    repeated = rng.random(edges) < 0.1
+    first, second = (np.concatenate([first, second[repeated]]),
+                     np.concatenate([second, first[repeated]]))
+    names = np.array([f"user{i}" for i in range(users)], dtype=object)
+    return list(zip(names[first].tolist(), names[second].tolist()))
+
+
+def friendship_responder(friendships):
+    """Answers the friend graph's query from an index, as the table's clustering would."""
+    by_user = defaultdict(list)
+    for pair in friendships:
+        row = SimpleNamespace(UserId1=pair[0], UserId2=pair[1])
+        by_user[pair[0]].append(row)
+        if pair[1] != pair[0]:
+            by_user[pair[1]].append(row)
+
+    def respond(query, params):
+        rows = {}
+        for user_id in params["user_ids"]:
+            for row in by_user.get(user_id, ()):
+                rows[id(row)] = row
+        return list(rows.values())
+    return respond
+
+
+def main():
+    rng = np.random.default_rng(0)
+    friendships = synthetic_friendships(USERS, AVERAGE_DEGREE, rng)
+    client = FakeBigQueryClient(friendship_responder(friendships))
+    clients.set_bigquery_client(client)
+    user_ids = [f"user{i}" for i in range(USERS)]
+
+    graph = FriendGraph()
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    graph.preload(user_ids)
+    load_time = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    stats = graph.stats()
+
+    picks = rng.integers(0, USERS, (LOOKUPS, 2))
+    pairs = [(user_ids[a], user_ids[b]) for a, b in picks.tolist()]
+    queries_before = len(client.queries)
+
+    started = time.perf_counter()
+    for user_id, _ in pairs:
+        graph.friends_of(user_id)
+    friends_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for user_id, other_id in pairs:
+        graph.mutual_friends(user_id, other_id)
+    mutual_time = time.perf_counter() - started
+
+    print(f"{USERS} users, {stats['edges'] // 2} friendships "
+          f"({len(friendships)} Friends rows, duplicates included)")
+    print(f"load all users:  {load_time:.2f} s in {stats['loads']} queries, {memory / 2**20:.1f} MiB")
+    print(f"friends_of:      {friends_time / LOOKUPS * 1e6:.2f} us per lookup")
+    print(f"mutual_friends:  {mutual_time / LOOKUPS * 1e6:.2f} us per lookup")
+    print(f"queries for {2 * LOOKUPS} lookups: {len(client.queries) - queries_before} "
+          f"(one query per lookup: {2 * LOOKUPS}, about {2 * LOOKUPS * QUERY_LATENCY / 3600:.0f} h "
+          f"at {QUERY_LATENCY * 1000:.0f} ms each)")
+    clients.reset_bigquery_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#############################################################################
+# benchmarks/bench_genai_cache.py
+#
+# Measures repeated home page advice requests with and without the on-disk
+# cache of generated text, against a stand-in model with a fixed delay.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_genai_cache
+#############################################################################
+
+import os
+import tempfile
+import time
+
+import clients
+import data_fetcher
+from benchmarks.fakes import FakeBigQueryClient, FakeGenerativeModel, sample_responder
+from cache import PersistentCache
+
+GENAI_LATENCY = 1.0
+REQUESTS = 5
+
+
+def time_requests(model):
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        data_fetcher.get_genai_advice("user1")
+    return (time.perf_counter() - started) / REQUESTS, model.calls
+
+
+def main():
+    clients.set_bigquery_client(FakeBigQueryClient(sample_responder()))
+
+    with tempfile.TemporaryDirectory() as directory:
+        model = FakeGenerativeModel(latency=GENAI_LATENCY)
+        clients.set_genai_model(model)
+        data_fetcher.GENAI_CACHE_PATH = ""
+        uncached, uncached_calls = time_requests(model)
+
+        model = FakeGenerativeModel(latency=GENAI_LATENCY)
+        clients.set_genai_model(model)
+        cache = PersistentCache(os.path.join(directory, "genai.sqlite3"))
+        data_fetcher.set_genai_cache(cache)
+        cached, cached_calls = time_requests(model)
+        cache.close()
+
+    print(f"without cache: {uncached * 1000:8.1f} ms per request, {uncached_calls} model calls")
+    print(f"with cache:    {cached * 1000:8.1f} ms per request, {cached_calls} model calls")
+    clients.reset_bigquery_client()
+    clients.reset_genai_model()
+    data_fetcher.set_genai_cache(None)
+
+
+if __name__ == "__main__":
+    main()
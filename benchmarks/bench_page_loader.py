@@ -0,0 +1,61 @@
+#############################################################################
+# benchmarks/bench_page_loader.py
+#
+# Compares loading the home page's data sequentially (the old behaviour)
+# with the concurrent page loader, against a stand-in backend that sleeps
+# for a fixed time per query and per Gemini call.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_page_loader
+#############################################################################
+
+import time
+
+import clients
+import data_fetcher
+from app import load_home_page_data, userId
+from benchmarks.fakes import FakeBigQueryClient, FakeGenerativeModel, quiet_streamlit, sample_responder
+from data_fetcher import clear_caches, get_genai_advice, get_user_posts, get_user_profiles, get_user_workouts
+
+QUERY_LATENCY = 0.3
+GENAI_LATENCY = 0.8
+RUNS = 3
+
+
+def load_sequentially(user_id):
+    workouts = get_user_workouts(user_id)
+    advice = get_genai_advice(user_id)
+    posts = get_user_posts(user_id)
+    profiles = get_user_profiles([post['user_id'] for post in posts])
+    return workouts, advice, posts, profiles
+
+
+def time_cold(load):
+    samples = []
+    for _ in range(RUNS):
+        clear_caches()
+        started = time.perf_counter()
+        load(userId)
+        samples.append(time.perf_counter() - started)
+    return min(samples)
+
+
+def main():
+    quiet_streamlit()
+    data_fetcher.GENAI_CACHE_PATH = ""  # measure real model calls, not the disk cache
+    clients.set_bigquery_client(FakeBigQueryClient(sample_responder(), latency=QUERY_LATENCY))
+    clients.set_genai_model(FakeGenerativeModel(latency=GENAI_LATENCY))
+
+    sequential = time_cold(load_sequentially)
+    concurrent = time_cold(load_home_page_data)
+
+    print(f"per-query latency {QUERY_LATENCY}s, Gemini latency {GENAI_LATENCY}s")
+    print(f"sequential home page load: {sequential:6.2f} s")
+    print(f"concurrent home page load: {concurrent:6.2f} s")
+    print(f"speedup:                   {sequential / concurrent:6.2f}x")
+    clients.reset_bigquery_client()
+    clients.reset_genai_model()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#############################################################################
+# benchmarks/bench_records.py
+#
+# Compares the memory kept per fetched workout, meal and post as a record type
+# with the plain dicts the fetchers used to return, for users with large
+# histories.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_records
+#############################################################################
+
+import gc
+import tracemalloc
+
+import numpy as np
+import pyarrow as pa
+
+import clients
+import data_fetcher
+from benchmarks.bench_bulk_fetch import START_MICROS, synthetic_calories, synthetic_workouts
+from benchmarks.fakes import FakeBigQueryClient
+
+HISTORY_SIZES = [10**4, 10**5]
+
+
+def synthetic_posts(rows, rng):
+    """One post an hour."""
+    timestamps = START_MICROS + np.arange(rows, dtype=np.int64) * 3600 * 1_000_000
+    return pa.table({
+        "PostId": [f"post{i}" for i in range(rows)],
+        "AuthorId": pa.array(["user1"] * rows),
+        "Timestamp": pa.array(timestamps, pa.timestamp("us", tz="UTC")),
+        "Content": np.tile(["Had a great workout today!", "New personal best!"], -(-rows // 2))[:rows],
+        "ImageUrl": pa.nulls(rows, pa.string()),
+    })
+
+
+FETCHERS = [
+    ("workouts", synthetic_workouts, lambda: data_fetcher.get_user_workouts.uncached("user1")),
+    ("meals", synthetic_calories, lambda: data_fetcher.get_user_calorie_tracking.uncached("user1")),
+    ("posts", synthetic_posts, lambda: data_fetcher.get_user_posts.uncached("user1")),
+]
+
+
+def retained_bytes(fetch, as_dicts):
+    """Returns the memory the fetched history keeps alive.
+
+    With as_dicts the records are turned into the dicts the fetchers used to
+    return, and the records are dropped, as if the fetcher had built dicts.
+    """
+    gc.collect()
+    tracemalloc.start()
+    history = fetch()
+    if as_dicts:
+        history = [dict(record) for record in history]
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del history
+    return retained
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'history':>9} {'records':>8} {'dict B/rec':>11} {'record B/rec':>13} {'saved':>7}")
+    for name, build, fetch in FETCHERS:
+        for size in HISTORY_SIZES:
+            table = build(size, rng)
+            clients.set_bigquery_client(FakeBigQueryClient(lambda query, params: table))
+            dict_bytes = retained_bytes(fetch, as_dicts=True) / size
+            record_bytes = retained_bytes(fetch, as_dicts=False) / size
+            print(f"{name:>9} {size:>8} {dict_bytes:>11.0f} {record_bytes:>13.0f} "
+                  f"{1 - record_bytes / dict_bytes:>7.0%}")
+    clients.reset_bigquery_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#############################################################################
+# benchmarks/bench_sensor_data.py
+#
+# Compares get_user_sensor_data's list-of-dicts shape with the columnar
+# (NumPy per sensor type) shape on synthetic long workouts sampled at 1 Hz.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_sensor_data
+#############################################################################
+
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+
+import clients
+from benchmarks.fakes import FakeBigQueryClient
+from data_fetcher import get_user_sensor_data
+
+SENSORS = [("Heart Rate", "bpm"), ("Cadence", "spm"), ("Speed", "m/s"), ("Altitude", "m")]
+WORKOUT_HOURS = [1, 4]
+
+
+def synthetic_sensor_table(hours, seed=0):
+    """Builds a sensor query result: every sensor sampled once per second."""
+    rng = np.random.default_rng(seed)
+    seconds = hours * 3600
+    start = int(datetime(2024, 7, 29, 7, tzinfo=timezone.utc).timestamp() * 1_000_000)
+    ticks = start + np.arange(seconds, dtype=np.int64) * 1_000_000
+    count = seconds * len(SENSORS)
+    return pa.table({
+        "Timestamp": pa.array(np.repeat(ticks, len(SENSORS)), pa.timestamp("us", tz="UTC")),
+        "SensorValue": rng.normal(100, 10, count),
+        "SensorName": np.tile([name for name, _ in SENSORS], seconds),
+        "SensorUnits": np.tile([units for _, units in SENSORS], seconds),
+    })
+
+
+def measure(columnar):
+    """Returns wall time, peak traced memory and retained memory of one fetch.
+
+    Time is measured on its own run because tracing slows allocation down.
+    """
+    started = time.perf_counter()
+    get_user_sensor_data.uncached("user1", "workout1", columnar=columnar)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    result = get_user_sensor_data.uncached("user1", "workout1", columnar=columnar)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak, retained
+
+
+def main():
+    print(f"{'workout':>8} {'rows':>8} {'shape':>9} {'time ms':>9} {'peak MiB':>9} {'kept MiB':>9}")
+    for hours in WORKOUT_HOURS:
+        table = synthetic_sensor_table(hours)
+        clients.set_bigquery_client(FakeBigQueryClient(lambda query, params: table))
+        for columnar in (False, True):
+            elapsed, peak, retained = measure(columnar)
+            shape = "columnar" if columnar else "dicts"
+            print(f"{hours:>7}h {table.num_rows:>8} {shape:>9} {elapsed * 1000:>9.1f} "
+                  f"{peak / 2**20:>9.2f} {retained / 2**20:>9.2f}")
+    clients.reset_bigquery_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#############################################################################
+# benchmarks/bench_startup.py
+#
+# Measures how long a cold process takes to import data_fetcher, with the
+# Gemini model built lazily (current) versus eagerly at import (the old
+# behaviour, reproduced here by building the model right after the import).
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_startup
+#############################################################################
+
+import statistics
+import subprocess
+import sys
+import time
+
+RUNS = 5
+
+LAZY = "import data_fetcher"
+EAGER = (
+    "import data_fetcher, vertexai\n"
+    "from vertexai.preview.generative_models import GenerativeModel\n"
+    "vertexai.init(project='sectiona4project', location='us-central1')\n"
+    "GenerativeModel(model_name='gemini-1.5-flash-002')\n"
+)
+
+
+def time_cold_import(code):
+    """Returns the median wall time of running code in a fresh interpreter."""
+    samples = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    baseline = time_cold_import("pass")
+    eager = time_cold_import(EAGER) - baseline
+    lazy = time_cold_import(LAZY) - baseline
+    print(f"import data_fetcher, eager model init (before): {eager * 1000:8.1f} ms")
+    print(f"import data_fetcher, lazy model init (after):   {lazy * 1000:8.1f} ms")
+    print(f"saved per cold start:                           {(eager - lazy) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+#############################################################################
+# benchmarks/bench_suite.py
+#
+# Runs every fetcher in data_fetcher.py and community.py and every display_*
+# function and page on the synthetic datasets of benchmarks/synthetic.py,
+# loaded into an in-memory SQLiteBackend, at each scale from 10^2 to 10^6
+# rows. Gemini is replaced by FakeGenerativeModel, and the HTML file of
+# display_my_custom_component, which the repo does not ship, by a stub.
+#
+# For each function and scale it records:
+#   seconds           best wall time of the repeats, caches emptied before each
+#   peak_bytes        peak Python memory above the starting point (tracemalloc)
+#   retained_blocks   memory blocks still allocated after the call, i.e. the
+#                     objects it built and returned (sys.getallocatedblocks)
+#
+# Functions that raise are recorded with their error instead. Results are
+# written as JSON. Pass --compare with an earlier file to list what got
+# slower by more than REGRESSION_THRESHOLD; the exit status is then 1 if
+# anything did.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_suite [--scales 100 10000] [--output FILE]
+#                                      [--compare OLD_FILE]
+#############################################################################
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Callable, NamedTuple, Optional
+from unittest.mock import patch
+
+import clients
+import community
+import data_fetcher
+import modules
+from activity_page import display_activity_page
+from app import display_app_page
+from benchmarks.fakes import FakeGenerativeModel, load_stub_component, quiet_streamlit
+from benchmarks.synthetic import BENCH_USER, SCALES, load_dataset
+from friend_graph import get_friend_graph
+from meal_entry_page import display_meal_entry_page
+from storage import SQLiteBackend, set_storage_backend
+from timeline_store import get_timeline_store
+
+DEFAULT_OUTPUT = "bench_suite.json"
+# Repeats stop once a function has run this many seconds in total.
+TIME_BUDGET = 0.5
+MAX_REPEATS = 5
+# A function counts as regressed when it is this many times slower.
+REGRESSION_THRESHOLD = 1.2
+
+
+class Case(NamedTuple):
+    """One function to measure.
+
+    Attributes:
+        name (str): Shown in the results, e.g. "get_user_workouts".
+        kind (str): "fetcher", "display" or "page".
+        run (callable): Called with setup's arguments; this is what is timed.
+        setup (callable): Returns the tuple of arguments for run, built
+            before each repeat and not timed. None for no arguments.
+    """
+    name: str
+    kind: str
+    run: Callable
+    setup: Optional[Callable] = None
+
+
+def reset_caches():
+    data_fetcher.clear_caches()
+    get_friend_graph().invalidate()
+    get_timeline_store().clear()
+
+
+def fetcher_cases(today):
+    """Every fetcher, reading the heavy user's data with empty caches."""
+    month_ago = today - timedelta(days=30)
+    friends = lambda: (community.get_friends(BENCH_USER),)
+    return [
+        Case("get_user_workouts", "fetcher", lambda: data_fetcher.get_user_workouts(BENCH_USER)),
+        Case("get_user_workouts_table", "fetcher", lambda: data_fetcher.get_user_workouts_table(BENCH_USER)),
+        Case("get_user_workouts_by_date", "fetcher",
+             lambda: data_fetcher.get_user_workouts_by_date(BENCH_USER, month_ago.isoformat(), today.isoformat())),
+        Case("get_user_sensor_data", "fetcher", lambda: data_fetcher.get_user_sensor_data(BENCH_USER, "workout0")),
+        Case("get_user_sensor_data[columnar]", "fetcher",
+             lambda: data_fetcher.get_user_sensor_data(BENCH_USER, "workout0", columnar=True)),
+        Case("get_user_sensor_data_table", "fetcher",
+             lambda: data_fetcher.get_user_sensor_data_table(BENCH_USER, "workout0")),
+        Case("get_user_profile", "fetcher", lambda: data_fetcher.get_user_profile(BENCH_USER)),
+        Case("get_user_profiles", "fetcher", data_fetcher.get_user_profiles, setup=friends),
+        Case("get_user_posts", "fetcher", lambda: data_fetcher.get_user_posts(BENCH_USER)),
+        Case("get_user_calorie_tracking", "fetcher", lambda: data_fetcher.get_user_calorie_tracking(BENCH_USER)),
+        Case("get_user_calorie_tracking_table", "fetcher",
+             lambda: data_fetcher.get_user_calorie_tracking_table(BENCH_USER)),
+        Case("get_user_today_calorie_tracking", "fetcher",
+             lambda: data_fetcher.get_user_today_calorie_tracking(BENCH_USER)),
+        Case("get_user_calorie_tracking_between", "fetcher",
+             lambda: data_fetcher.get_user_calorie_tracking_between(BENCH_USER, month_ago, today)),
+        Case("get_user_calorie_summary", "fetcher",
+             lambda: data_fetcher.get_user_calorie_summary(BENCH_USER, month_ago, today, "week")),
+        Case("get_user_weekly_calorie_summary", "fetcher",
+             lambda: data_fetcher.get_user_weekly_calorie_summary(BENCH_USER)),
+        Case("get_genai_advice", "fetcher", lambda: data_fetcher.get_genai_advice(BENCH_USER)),
+        Case("get_genai_nutrition_feedback", "fetcher",
+             lambda: data_fetcher.get_genai_nutrition_feedback(BENCH_USER)),
+        Case("get_friends", "fetcher", lambda: community.get_friends(BENCH_USER)),
+        Case("get_friends_feed", "fetcher", lambda: community.get_friends_feed(BENCH_USER)),
+        Case("get_feed_page", "fetcher", lambda: community.get_feed_page(BENCH_USER)),
+    ]
+
+
+def display_cases():
+    """Every display_* function on the heavy user's data, and every page.
+
+    Inputs are fetched once up front; pages fetch their own with empty caches.
+    """
+    reset_caches()
+    workouts = data_fetcher.get_user_workouts(BENCH_USER)
+    workout_dicts = [dict(workout) for workout in workouts]
+    meals = [dict(meal) for meal in data_fetcher.get_user_today_calorie_tracking(BENCH_USER)]
+    weekly = data_fetcher.get_user_weekly_calorie_summary(BENCH_USER)
+    profile = data_fetcher.get_user_profile(BENCH_USER)
+    posts = data_fetcher.get_user_posts(BENCH_USER)
+    feed = community.get_feed_page(BENCH_USER).posts
+    chunks = lambda: (iter(["Keep ", "up ", "the ", "good ", "work!"]),)
+
+    def show_posts():
+        for post in posts:
+            modules.display_post(profile.username, profile.profile_image, post['timestamp'],
+                                 post.content, post.image)
+
+    def show_custom_component():
+        # The component's HTML file is not in the repo; time the rendering of a stub
+        with patch("internals.load_html_file", load_stub_component):
+            modules.display_my_custom_component(profile.full_name)
+
+    def show_feed():
+        for post in feed:
+            community.display_feed_post(post)
+
+    return [
+        Case("display_my_custom_component", "display", show_custom_component),
+        Case("display_post", "display", show_posts),
+        Case("display_feed_post", "display", show_feed),
+        Case("display_workouts_table", "display", lambda: modules.display_workouts_table(workout_dicts)),
+        Case("display_activity_summary", "display", lambda: modules.display_activity_summary(workouts)),
+        Case("display_recent_workouts", "display", lambda: modules.display_recent_workouts(workouts)),
+        Case("display_filtered_workouts", "display", lambda: modules.display_filtered_workouts(workout_dicts)),
+        Case("display_genai_advice", "display",
+             lambda: modules.display_genai_advice("2025-01-01 00:00:00", "Keep up the good work!", None)),
+        Case("display_streamed_text", "display", modules.display_streamed_text, setup=chunks),
+        Case("display_genai_advice_stream", "display",
+             lambda content: modules.display_genai_advice_stream("2025-01-01 00:00:00", content, None),
+             setup=chunks),
+        Case("display_macro_calorie_chart", "display", lambda: modules.display_macro_calorie_chart(meals)),
+        Case("display_weekly_calorie_summary", "display",
+             lambda: modules.display_weekly_calorie_summary(weekly)),
+        Case("display_app_page", "page", display_app_page),
+        Case("display_activity_page", "page", lambda: display_activity_page(BENCH_USER)),
+        Case("display_meal_entry_page", "page", lambda: display_meal_entry_page(BENCH_USER)),
+        Case("community_page", "page", lambda: community.community_page(BENCH_USER)),
+    ]
+
+
+def measure(case, cold):
+    """Times case and measures its memory; cold empties caches before each run."""
+    def prepare():
+        if cold:
+            reset_caches()
+        return case.setup() if case.setup else ()
+
+    # The pages print what they fetch; keep that out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        times = []
+        while len(times) < MAX_REPEATS and sum(times) < TIME_BUDGET:
+            args = prepare()
+            started = time.perf_counter()
+            case.run(*args)
+            times.append(time.perf_counter() - started)
+
+        args = prepare()
+        gc.collect()
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        result = case.run(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    gc.collect()
+    retained = sys.getallocatedblocks() - blocks
+    del result
+    return {
+        "name": case.name,
+        "kind": case.kind,
+        "seconds": min(times),
+        "repeats": len(times),
+        "peak_bytes": peak,
+        "retained_blocks": retained,
+    }
+
+
+def run_scale(scale, seed, today):
+    backend = SQLiteBackend(":memory:")
+    started = time.perf_counter()
+    counts = load_dataset(backend, scale, seed, today)
+    print(f"scale {scale}: loaded {sum(counts.values())} rows in {time.perf_counter() - started:.1f} s")
+    set_storage_backend(backend)
+    results = []
+    try:
+        cases = [(case, True) for case in fetcher_cases(today)]
+        cases += [(case, case.kind == "page") for case in display_cases()]
+        for case, cold in cases:
+            try:
+                result = measure(case, cold)
+            except Exception as e:
+                # Recorded rather than fatal, so one broken function does not
+                # hide the others
+                results.append({"name": case.name, "kind": case.kind, "scale": scale,
+                                "error": f"{type(e).__name__}: {e}"})
+                print(f"  {case.name:<34} failed: {type(e).__name__}: {e}")
+                continue
+            result["scale"] = scale
+            results.append(result)
+            print(f"  {case.name:<34} {result['seconds'] * 1000:>10.2f} ms "
+                  f"{result['peak_bytes'] / 2**20:>9.2f} MiB {result['retained_blocks']:>9} blocks")
+    finally:
+        set_storage_backend(None)
+        backend.close()
+    return counts, results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Prints the functions slower than in the baseline file; returns how many."""
+    with open(baseline_path) as f:
+        baseline = {(r["name"], r["scale"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    for result in results:
+        before = baseline.get((result["name"], result["scale"]))
+        if before is None or not before.get("seconds") or "error" in result:
+            continue
+        ratio = result["seconds"] / before["seconds"]
+        if ratio > REGRESSION_THRESHOLD:
+            regressions += 1
+            print(f"slower: {result['name']} at {result['scale']}: "
+                  f"{before['seconds'] * 1000:.2f} -> {result['seconds'] * 1000:.2f} ms ({ratio:.2f}x)")
+    print(f"{regressions} regressions against {baseline_path}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every fetcher and display function.")
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES, help="dataset sizes in rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"results file (default {DEFAULT_OUTPUT})")
+    parser.add_argument("--compare", metavar="OLD_FILE", help="an earlier results file to compare with")
+    args = parser.parse_args()
+
+    quiet_streamlit()
+    data_fetcher.GENAI_CACHE_PATH = ""  # measure the fetchers, not the disk cache
+    data_fetcher.set_genai_cache(None)
+    clients.set_genai_model(FakeGenerativeModel())
+    today = datetime.now(timezone.utc).date()
+
+    datasets = {}
+    results = []
+    for scale in args.scales:
+        counts, scale_results = run_scale(scale, args.seed, today)
+        datasets[str(scale)] = counts
+        results.extend(scale_results)
+    clients.reset_genai_model()
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "created": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "seed": args.seed,
+            "datasets": datasets,
+            "results": results,
+        }, f, indent=2)
+    print(f"wrote {len(results)} results to {args.output}")
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
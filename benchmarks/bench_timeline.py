@@ -0,0 +1,126 @@
+#############################################################################
+# benchmarks/bench_timeline.py
+#
+# Compares reading community feed pages from the precomputed timelines with
+# the feed query, on a synthetic network. The query is answered locally by
+# scanning the posts table for the reader's friends and sorting, which is the
+# work BigQuery does per page; the real path adds a job round trip on top.
+# Also times publishing posts, which fans each one out to the author's
+# friends.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_timeline
+#############################################################################
+
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+import clients
+import community
+from benchmarks.bench_friend_graph import friendship_responder, synthetic_friendships
+from benchmarks.fakes import FakeBigQueryClient
+from data_fetcher import clear_caches
+from friend_graph import FRIENDSHIPS_QUERY, get_friend_graph
+from timeline_store import get_timeline_store
+
+USERS = 5000
+AVERAGE_DEGREE = 20
+POSTS_PER_USER = 10
+READS = 2000
+PUBLISHES = 2000
+START_MICROS = 1_735_689_600_000_000  # 2025-01-01
+
+
+def feed_responder(users, posts_per_user, rng):
+    """Answers FEED_QUERY by scanning a synthetic Posts table."""
+    count = users * posts_per_user
+    authors = rng.integers(0, users, count)
+    timestamps = START_MICROS + np.sort(rng.integers(0, 90 * 86400 * 10**6, count))
+    post_ids = np.array([f"post{i:08d}" for i in range(count)], dtype=object)
+
+    def respond(params):
+        friends = np.array([int(user_id[4:]) for user_id in params["friend_ids"]])
+        mask = np.isin(authors, friends)
+        if params["before_timestamp"] is not None:
+            before = int(params["before_timestamp"].timestamp() * 10**6)
+            mask &= (timestamps < before) | ((timestamps == before) & (post_ids < params["before_post_id"]))
+        matches = np.flatnonzero(mask)
+        newest = matches[np.lexsort((post_ids[matches], timestamps[matches]))[::-1][:params["limit"]]]
+        return [
+            SimpleNamespace(
+                PostId=post_ids[i], AuthorId=f"user{authors[i]}",
+                Timestamp=datetime.fromtimestamp(timestamps[i] / 10**6, tz=timezone.utc),
+                ImageUrl=None, Content="Had a great workout today!",
+                AuthorName=f"User {authors[i]}", AuthorUsername=f"user{authors[i]}", AuthorImageUrl=None,
+            )
+            for i in newest.tolist()
+        ]
+    return respond
+
+
+def time_reads(read, readers):
+    started = time.perf_counter()
+    for user_id in readers:
+        page = read(user_id, None)
+        read(user_id, page.next_cursor)
+    return (time.perf_counter() - started) / (2 * len(readers))
+
+
+def main():
+    rng = np.random.default_rng(0)
+    answer_friendships = friendship_responder(synthetic_friendships(USERS, AVERAGE_DEGREE, rng))
+    answer_feed = feed_responder(USERS, POSTS_PER_USER, rng)
+
+    def respond(query, params):
+        if query == FRIENDSHIPS_QUERY:
+            return answer_friendships(query, params)
+        if query == community.FEED_QUERY:
+            return answer_feed(params)
+        # The author's profile, looked up when publishing
+        user_id = params["user_id"]
+        return [SimpleNamespace(UserId=user_id, Name=f"User {user_id[4:]}", Username=user_id,
+                                ImageUrl=None, DateOfBirth=None)]
+
+    client = FakeBigQueryClient(respond)
+    clients.set_bigquery_client(client)
+    user_ids = [f"user{i}" for i in range(USERS)]
+    get_friend_graph().preload(user_ids)
+    readers = [user_ids[i] for i in rng.integers(0, USERS, READS).tolist()]
+
+    query_read = time_reads(lambda user_id, before: community.get_friends_feed.uncached(user_id, before), readers)
+
+    store = get_timeline_store()
+    started = time.perf_counter()
+    for user_id in user_ids:
+        community.get_feed_page(user_id)
+    build = time.perf_counter() - started
+    queries = len(client.queries)
+    timeline_read = time_reads(community.get_feed_page, readers)
+    timeline_queries = len(client.queries) - queries
+
+    authors = [user_ids[i] for i in rng.integers(0, USERS, PUBLISHES).tolist()]
+    writes = store.fanout_writes
+    started = time.perf_counter()
+    for i, author_id in enumerate(authors):
+        community.publish_post({
+            "PostId": f"new{i:06d}", "AuthorId": author_id, "Timestamp": "2025-06-01T00:00:00",
+            "ImageUrl": None, "Content": "New personal best!",
+        })
+    publish = (time.perf_counter() - started) / PUBLISHES
+
+    print(f"{USERS} users, {USERS * POSTS_PER_USER} posts, about {AVERAGE_DEGREE} friends each")
+    print(f"feed query path:  {query_read * 1000:8.3f} ms per page (scan only, plus a job round trip)")
+    print(f"timeline path:    {timeline_read * 1000:8.3f} ms per page, "
+          f"{timeline_queries} queries for {2 * READS} pages ({query_read / timeline_read:.0f}x)")
+    print(f"build timelines:  {build:8.2f} s for {USERS} users, one query each")
+    print(f"publish:          {publish * 1000:8.3f} ms per post, "
+          f"{(store.fanout_writes - writes) / PUBLISHES:.1f} timelines written per post")
+    clients.reset_bigquery_client()
+    clear_caches()
+
+
+if __name__ == "__main__":
+    main()
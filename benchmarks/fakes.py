@@ -0,0 +1,183 @@
+#############################################################################
+# benchmarks/fakes.py
+#
+# This file contains local stand-ins for BigQuery and Gemini so benchmarks can
+# run without cloud credentials.
+#############################################################################
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pyarrow as pa
+import streamlit.config as streamlit_config
+import streamlit.logger as streamlit_logger
+from google.cloud import bigquery
+
+
+def quiet_streamlit():
+    """Silences the bare-mode warnings Streamlit logs outside `streamlit run`."""
+    streamlit_config.get_option("logger.level")  # parse config before overriding it
+    streamlit_logger.set_log_level(logging.ERROR)
+
+
+# Stands in for custom_components/my_custom_component.html, which the repo
+# does not ship, so display_my_custom_component can be timed.
+STUB_COMPONENT_HTML = "<div>Hello, {{NAME}}!</div>"
+
+
+def load_stub_component(file_path):
+    """Replaces internals.load_html_file, returning STUB_COMPONENT_HTML for any component."""
+    return STUB_COMPONENT_HTML
+
+
+class FakeQueryJob:
+    """Mimics the parts of a BigQuery QueryJob the fetchers use.
+
+    Give it either row objects or a pyarrow Table. Rows are built from the
+    table on demand, one Python object per row, as the real client does.
+    """
+
+    def __init__(self, rows=None, table=None):
+        self._rows = rows
+        self._table = table
+
+    def result(self):
+        if self._rows is None:
+            return (SimpleNamespace(**record) for record in _table_records(self._table))
+        return iter(self._rows)
+
+    def to_arrow(self, **kwargs):
+        if self._table is None:
+            return pa.Table.from_pylist([vars(row) for row in self._rows])
+        # Decode a serialized copy, as the client decodes downloaded record batches
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, self._table.schema) as writer:
+            writer.write_table(self._table)
+        return pa.ipc.open_stream(sink.getvalue()).read_all()
+
+    def to_dataframe(self, **kwargs):
+        return self.to_arrow().to_pandas()
+
+
+def _table_records(table):
+    """Yields a table's rows as dicts of Python values.
+
+    pyarrow converts zoned timestamps far more slowly than the BigQuery client
+    parses them, so they are converted as naive UTC and given their zone after.
+    """
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_timestamp(column.type) and column.type.tz is not None:
+            naive = column.cast(pa.timestamp(column.type.unit))
+            columns[name] = [value and value.replace(tzinfo=timezone.utc) for value in naive.to_pylist()]
+        else:
+            columns[name] = column.to_pylist()
+    for values in zip(*columns.values()):
+        yield dict(zip(columns, values))
+
+
+class FakeBigQueryClient:
+    """Answers queries from a responder function instead of the network.
+
+    responder(query, params) receives the SQL text and a dict of parameter
+    values and returns a list of row objects or a pyarrow Table. latency (seconds) is slept per
+    query to imitate a remote job round trip.
+    """
+
+    def __init__(self, responder, latency=0.0):
+        self.responder = responder
+        self.latency = latency
+        self.queries = []
+        self.inserted = []
+
+    def query(self, query, job_config=None):
+        params = {}
+        if job_config is not None:
+            for param in job_config.query_parameters:
+                if isinstance(param, bigquery.ArrayQueryParameter):
+                    params[param.name] = param.values
+                else:
+                    params[param.name] = param.value
+        self.queries.append(query)
+        if self.latency:
+            time.sleep(self.latency)
+        result = self.responder(query, params)
+        if isinstance(result, pa.Table):
+            return FakeQueryJob(table=result)
+        return FakeQueryJob(rows=result)
+
+    def dataset(self, dataset_id):
+        return SimpleNamespace(table=lambda table_id: f"{dataset_id}.{table_id}")
+
+    def insert_rows_json(self, table, rows, row_ids=None):
+        self.inserted.append((table, list(rows)))
+        return []
+
+
+class FakeGenerativeModel:
+    """Returns canned text after an optional delay."""
+
+    def __init__(self, text="Keep it up!", latency=0.0):
+        self.text = text
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return self._stream()
+        if self.latency:
+            time.sleep(self.latency)
+        return SimpleNamespace(text=self.text)
+
+    def _stream(self):
+        # Spread the delay over the words, as a real model streams tokens
+        words = self.text.split(" ")
+        for i, word in enumerate(words):
+            if self.latency:
+                time.sleep(self.latency / len(words))
+            yield SimpleNamespace(text=word if i == 0 else " " + word)
+
+
+def sample_responder(workouts=3, posts=3):
+    """Builds a responder that serves a small, fixed dataset for 'user1'."""
+    start = datetime(2024, 7, 29, 7, 0, 0)
+    workout_rows = [
+        SimpleNamespace(
+            WorkoutId=f"workout{i}",
+            StartTimestamp=start + timedelta(days=i),
+            EndTimestamp=start + timedelta(days=i, hours=1),
+            StartLocationLat=34.05, StartLocationLong=-118.24,
+            EndLocationLat=34.06, EndLocationLong=-118.25,
+            TotalDistance=5.0 + i, TotalSteps=8000 + i, CaloriesBurned=400 + i,
+        )
+        for i in range(workouts)
+    ]
+    post_rows = [
+        SimpleNamespace(
+            PostId=f"post{i}", AuthorId="user1", Timestamp=start + timedelta(hours=i),
+            Content="Had a great workout today!", ImageUrl=None,
+        )
+        for i in range(posts)
+    ]
+    profile_rows = [
+        SimpleNamespace(
+            UserId="user1", Name="Remi", Username="remi_the_rems",
+            ImageUrl="https://example.com/remi.jpg", DateOfBirth="1990-01-01",
+        )
+    ]
+
+    def respond(query, params):
+        if "ISE.Users" in query:
+            return profile_rows
+        if "ISE.Posts" in query:
+            return post_rows
+        if "ISE.Workouts" in query:
+            if "LIMIT 1" in query:
+                return workout_rows[-1:]
+            return workout_rows
+        return []
+
+    return respond
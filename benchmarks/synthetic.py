@@ -0,0 +1,148 @@
+#############################################################################
+# benchmarks/synthetic.py
+#
+# Generates a deterministic synthetic ISE dataset into a storage backend,
+# usually an in-memory SQLiteBackend, so benchmarks can run the real queries
+# at any size without the cloud.
+#
+# A dataset of scale N centres on one heavy user, BENCH_USER ("user1", the
+# user the pages show). They have half of the N // 10 workouts, posts and
+# meals, and their first workout has a dense sensor series of N readings.
+# The other users share the other half, and everyone has about
+# AVERAGE_DEGREE friends, the heavy user up to MAX_BENCH_FRIENDS.
+#
+# The same seed and day give the same rows. Meals and posts lead up to the
+# given day (today by default), so "today" and "this week" queries find data.
+#############################################################################
+
+from datetime import date, datetime, time, timedelta, timezone
+
+import numpy as np
+
+from benchmarks.bench_sensor_data import SENSORS
+
+SCALES = [10**2, 10**3, 10**4, 10**5, 10**6]
+BENCH_USER = "user1"
+AVERAGE_DEGREE = 10
+MAX_BENCH_FRIENDS = 100
+HISTORY_DAYS = 90
+INSERT_BATCH = 50000
+MEAL_NAMES = ["Oatmeal", "Chicken salad", "Pasta", "Smoothie", "Rice bowl", "Yogurt"]
+
+
+def dataset_sizes(scale):
+    """Returns the number of rows of each table at a scale."""
+    users = max(10, scale // 100)
+    return {
+        "Users": users,
+        "Workouts": max(2, scale // 10),
+        "SensorData": scale,
+        "SensorTypes": len(SENSORS),
+        "Posts": max(2, scale // 10),
+        "Friends": users * AVERAGE_DEGREE // 2 + min(users - 1, MAX_BENCH_FRIENDS),
+        "CalorieTracking": max(2, scale // 10),
+    }
+
+
+def _owners(count, users, rng):
+    """The heavy user owns every other row, from the first; the rest are random.
+
+    Rows are generated in time order, so the heavy user's rows span the
+    whole history.
+    """
+    owners = [f"user{i}" for i in rng.integers(2, users + 1, count).tolist()]
+    owners[::2] = [BENCH_USER] * len(owners[::2])
+    return owners
+
+
+def _times(start, count, span, rng):
+    """count sorted random datetimes in [start, start + span)."""
+    offsets = np.sort(rng.integers(0, int(span.total_seconds()), count))
+    return [start + timedelta(seconds=offset) for offset in offsets.tolist()]
+
+
+def generate(scale, seed=0, today=None):
+    """Yields (table, rows) batches of the dataset at a scale."""
+    rng = np.random.default_rng(seed)
+    today = today or datetime.now(timezone.utc).date()
+    sizes = dataset_sizes(scale)
+    users = sizes["Users"]
+    history_start = datetime.combine(today - timedelta(days=HISTORY_DAYS - 1), time(), timezone.utc)
+    history = timedelta(days=HISTORY_DAYS)
+
+    yield "Users", [
+        {"UserId": f"user{i}", "Name": f"User {i}", "Username": f"user_{i}",
+         "ImageUrl": f"https://example.com/user{i}.png",
+         "DateOfBirth": date(1960 + i % 40, 1 + i % 12, 1 + i % 28)}
+        for i in range(1, users + 1)
+    ]
+
+    first = rng.integers(1, users + 1, users * AVERAGE_DEGREE // 2)
+    second = rng.integers(1, users + 1, len(first))
+    friends = [{"UserId1": f"user{a}", "UserId2": f"user{b}"} for a, b in zip(first.tolist(), second.tolist())]
+    friends += [{"UserId1": BENCH_USER, "UserId2": f"user{i}"} for i in range(2, min(users, MAX_BENCH_FRIENDS + 1) + 1)]
+    yield "Friends", friends
+
+    count = sizes["Workouts"]
+    starts = _times(history_start, count, history, rng)
+    minutes = rng.integers(20, 120, count).tolist()
+    distances = rng.uniform(1, 20, count).round(2).tolist()
+    lats = rng.uniform(-60, 60, (count, 2)).round(4).tolist()
+    lngs = rng.uniform(-180, 180, (count, 2)).round(4).tolist()
+    # The heavy user's first workout is "workout0", the one with sensor data
+    owners = _owners(count, users, rng)
+    yield "Workouts", [
+        {"WorkoutId": f"workout{i}", "UserId": owners[i],
+         "StartTimestamp": starts[i], "EndTimestamp": starts[i] + timedelta(minutes=minutes[i]),
+         "StartLocationLat": lats[i][0], "StartLocationLong": lngs[i][0],
+         "EndLocationLat": lats[i][1], "EndLocationLong": lngs[i][1],
+         "TotalDistance": distances[i], "TotalSteps": int(distances[i] * 1300),
+         "CaloriesBurned": round(distances[i] * 65, 1)}
+        for i in range(count)
+    ]
+
+    yield "SensorTypes", [
+        {"SensorId": f"sensor{i}", "Name": name, "Units": units} for i, (name, units) in enumerate(SENSORS)
+    ]
+    count = sizes["SensorData"]
+    values = rng.normal(100, 10, count).round(2).tolist()
+    for batch in range(0, count, INSERT_BATCH):
+        yield "SensorData", [
+            {"SensorId": f"sensor{i % len(SENSORS)}", "WorkoutID": "workout0",
+             "Timestamp": starts[0] + timedelta(seconds=i // len(SENSORS)), "SensorValue": values[i]}
+            for i in range(batch, min(batch + INSERT_BATCH, count))
+        ]
+
+    count = sizes["Posts"]
+    owners = _owners(count, users, rng)
+    timestamps = _times(history_start, count, history, rng)
+    yield "Posts", [
+        {"PostId": f"post{i:08d}", "AuthorId": owners[i], "Timestamp": timestamps[i],
+         "ImageUrl": None, "Content": f"Workout number {i} done!"}
+        for i in range(count)
+    ]
+
+    count = sizes["CalorieTracking"]
+    owners = _owners(count, users, rng)
+    created = _times(history_start, count, history, rng)
+    calories = rng.uniform(100, 900, count).round(1).tolist()
+    names = rng.integers(0, len(MEAL_NAMES), count).tolist()
+    yield "CalorieTracking", [
+        {"MealId": f"meal{i:08d}", "UserId": owners[i], "MealName": MEAL_NAMES[names[i]],
+         "Calories": calories[i], "Protein": round(calories[i] * 0.05, 1),
+         "Carbs": round(calories[i] * 0.12, 1), "Fats": round(calories[i] * 0.03, 1),
+         "MealDate": created[i].date(), "CreatedAt": created[i]}
+        for i in range(count)
+    ]
+
+
+def load_dataset(backend, scale, seed=0, today=None):
+    """Inserts the dataset at a scale into backend and returns the row counts."""
+    counts = {}
+    for table, rows in generate(scale, seed, today):
+        for start in range(0, len(rows), INSERT_BATCH):
+            errors = backend.insert_rows(table, rows[start:start + INSERT_BATCH])
+            if errors:
+                raise RuntimeError(f"Could not load {table}: {errors[:3]}")
+        counts[table] = counts.get(table, 0) + len(rows)
+    return counts
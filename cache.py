@@ -0,0 +1,345 @@
+#############################################################################
+# cache.py
+#
+# This file contains the in-process caches used by the data fetchers.
+#
+# Streamlit re-runs every page script on each interaction, so data that has
+# not changed is kept here between reruns instead of being fetched again.
+#############################################################################
+
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+# Every named cache in the process, so they can be inspected and invalidated
+# without knowing which fetcher owns them.
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class TTLCache:
+    """A thread-safe LRU cache whose entries expire after a fixed time.
+
+    Args:
+        maxsize (int): Most entries kept; the least recently used is evicted
+            when a new entry would exceed it.
+        ttl (float): Seconds an entry stays valid after it is stored.
+        clock (callable): Returns the current time in seconds.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key, now):
+        # Must be called with the lock held.
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        """Returns the cached value for key, or default if absent or expired."""
+        with self._lock:
+            value = self._lookup(key, self._clock())
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def get_many(self, keys):
+        """Returns a dict of the keys that are cached and still valid."""
+        found = {}
+        with self._lock:
+            now = self._clock()
+            for key in keys:
+                value = self._lookup(key, now)
+                if value is _MISSING:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[key] = value
+        return found
+
+    def set(self, key, value):
+        """Stores value under key, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        """Removes key from the cache if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_where(self, predicate):
+        """Removes every entry whose key satisfies predicate.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        with self._lock:
+            doomed = [key for key in self._entries if predicate(key)]
+            for key in doomed:
+                del self._entries[key]
+            return len(doomed)
+
+    def stats(self):
+        """Returns the hit/miss/eviction counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key, self._clock()) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class PersistentCache:
+    """A size-bounded, expiring key/value store kept in a SQLite file on disk.
+
+    Unlike TTLCache it survives restarts, so it suits results that are slow or
+    costly to produce, such as LLM responses. Values must be JSON-serializable.
+    Expiry uses wall-clock time because entries outlive the process.
+
+    Args:
+        path (str): The SQLite file. Its directory is created if needed.
+        maxsize (int): Most entries kept; the least recently used are evicted.
+        ttl (float): Seconds an entry stays valid after it is stored.
+    """
+
+    def __init__(self, path, maxsize=1000, ttl=86400, clock=time.time):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        # Must be called with the lock held.
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+        return self._connection
+
+    def get(self, key, default=None):
+        """Returns the stored value for key, or default if absent or expired."""
+        with self._lock:
+            connection = self._connect()
+            now = self._clock()
+            row = connection.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    connection.commit()
+                self.misses += 1
+                return default
+            connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            connection.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        """Stores value under key, evicting the least recently used entries."""
+        with self._lock:
+            connection = self._connect()
+            now = self._clock()
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            excess = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.maxsize
+            if excess > 0:
+                connection.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+            connection.commit()
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM entries")
+            connection.commit()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Returns the hit/miss/eviction counters and the current size."""
+        with self._lock:
+            size = self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": size,
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+    def close(self):
+        """Closes the underlying SQLite connection."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def _normalize(value):
+    # Equal inputs must hash equally: 5 and 5.0 are the same distance, and
+    # surrounding whitespace in text does not change a prompt.
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), 4)
+    if isinstance(value, str):
+        return value.strip()
+    return str(value)
+
+
+def content_key(kind, model_name, **inputs):
+    """Returns a stable hash identifying a generated result by what produced it.
+
+    Args:
+        kind (str): What is being generated, e.g. "advice".
+        model_name (str): The model that generates it.
+        **inputs: The values the prompt is built from.
+    """
+    payload = {
+        "kind": kind,
+        "model": model_name,
+        "inputs": {name: _normalize(value) for name, value in inputs.items()},
+    }
+    encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def get_cache(name, maxsize=1024, ttl=300):
+    """Returns the named cache, creating it with the given limits on first use."""
+    with _registry_lock:
+        cache = _registry.get(name)
+        if cache is None:
+            cache = _registry[name] = TTLCache(maxsize=maxsize, ttl=ttl)
+        return cache
+
+
+def cached(name, ttl, maxsize=256):
+    """Decorates a fetcher so its results are served from the named cache.
+
+    The cache key is the call's arguments, and the first argument must be the
+    user ID so that invalidate_user can find every entry belonging to a user.
+    Cached results are shared between callers and must be treated as read-only.
+
+    Args:
+        name (str): The query type, used for invalidation and statistics.
+        ttl (float): Seconds a result stays valid.
+        maxsize (int): Most results kept before the least recently used is evicted.
+    """
+    def decorator(func):
+        cache = get_cache(name, maxsize=maxsize, ttl=ttl)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = args + tuple(sorted(kwargs.items()))
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
+
+
+def invalidate_user(user_id, *names):
+    """Drops every cached result for user_id from the named caches.
+
+    With no names, the user's entries are dropped from every cache.
+    """
+    with _registry_lock:
+        if names:
+            caches = [_registry[name] for name in names if name in _registry]
+        else:
+            caches = list(_registry.values())
+
+    def belongs_to_user(key):
+        # Profiles are keyed by the bare user ID, fetcher results by their arguments
+        return key == user_id or (isinstance(key, tuple) and key[:1] == (user_id,))
+
+    for cache in caches:
+        cache.discard_where(belongs_to_user)
+
+
+def cache_stats():
+    """Returns the counters of every named cache, keyed by name."""
+    with _registry_lock:
+        caches = dict(_registry)
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+def clear_all():
+    """Empties every named cache and resets its counters."""
+    with _registry_lock:
+        caches = list(_registry.values())
+    for cache in caches:
+        cache.clear()
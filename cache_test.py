@@ -0,0 +1,145 @@
+#############################################################################
+# cache_test.py
+#
+# This file contains tests for cache.py.
+#############################################################################
+import os
+import tempfile
+import unittest
+
+from cache import PersistentCache, TTLCache, cached, content_key, invalidate_user, get_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_entries_expire(self):
+        """Test that an entry is gone once its TTL has passed."""
+        cache = TTLCache(maxsize=10, ttl=5, clock=self.clock)
+        cache.set("a", 1)
+
+        self.clock.now = 4.9
+        self.assertEqual(cache.get("a"), 1)
+        self.clock.now = 5.0
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the entry not read for longest is evicted first."""
+        cache = TTLCache(maxsize=2, ttl=60, clock=self.clock)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_get_many_returns_only_cached_keys(self):
+        """Test that get_many skips missing and expired keys."""
+        cache = TTLCache(maxsize=10, ttl=5, clock=self.clock)
+        cache.set("a", 1)
+        self.clock.now = 3
+        cache.set("b", 2)
+        self.clock.now = 6
+
+        self.assertEqual(cache.get_many(["a", "b", "c"]), {"b": 2})
+
+
+class TestCachedDecorator(unittest.TestCase):
+
+    def test_results_are_cached_per_user(self):
+        """Test that each user's result is computed once and invalidated alone."""
+        calls = []
+
+        @cached("test_per_user", ttl=60)
+        def fetch(user_id):
+            calls.append(user_id)
+            return [user_id]
+
+        self.addCleanup(get_cache("test_per_user").clear)
+
+        fetch("user1")
+        fetch("user1")
+        fetch("user2")
+        invalidate_user("user1", "test_per_user")
+        fetch("user1")
+        fetch("user2")
+
+        self.assertEqual(calls, ["user1", "user2", "user1"])
+
+
+class TestPersistentCache(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "nested", "cache.sqlite3")
+        self.clock = FakeClock()
+
+    def make_cache(self, **kwargs):
+        cache = PersistentCache(self.path, clock=self.clock, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_survives_restart(self):
+        """Test that a new instance on the same file sees stored values."""
+        self.make_cache().set("key", {"content": "hi"})
+
+        self.assertEqual(self.make_cache().get("key"), {"content": "hi"})
+
+    def test_entries_expire(self):
+        """Test that an entry is gone once its TTL has passed."""
+        cache = self.make_cache(ttl=10)
+        cache.set("key", "value")
+        self.clock.now = 10
+
+        self.assertIsNone(cache.get("key"))
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the size limit evicts the entry read longest ago."""
+        cache = self.make_cache(maxsize=2)
+        cache.set("a", 1)
+        self.clock.now = 1
+        cache.set("b", 2)
+        self.clock.now = 2
+        cache.get("a")
+        self.clock.now = 3
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+class TestContentKey(unittest.TestCase):
+
+    def test_equivalent_inputs_share_a_key(self):
+        """Test that 5 and 5.0, and argument order, do not change the key."""
+        self.assertEqual(
+            content_key("advice", "model", distance=5, steps=100),
+            content_key("advice", "model", steps=100.0, distance=5.0),
+        )
+
+    def test_model_is_part_of_the_key(self):
+        """Test that switching models does not reuse old answers."""
+        self.assertNotEqual(
+            content_key("advice", "model-a", distance=5),
+            content_key("advice", "model-b", distance=5),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
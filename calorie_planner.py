@@ -0,0 +1,92 @@
+#############################################################################
+# calorie_planner.py
+#
+# This file contains the planner that serves one render of the meal page
+# from a single read.
+#
+# The page shows today's meals, feedback on today's totals and the last
+# week's summary. All three are derived from the week's meals, read once
+# with get_user_calorie_tracking_between, so a render with a cold cache runs
+# one query and a rerun with a warm one runs none. Meals still in the write
+# buffer are among the week's meals, so they show up everywhere at once. The
+# page asks the planner for each value up front and reads them as it draws,
+# so nothing is read that the page does not show.
+#
+# A planner belongs to one rerun: make a new one each time the page runs.
+#############################################################################
+
+from datetime import datetime, timedelta
+
+from data_fetcher import get_user_calorie_tracking_between, meal_totals, summarize_calorie_days
+
+# Days in the weekly summary, today included.
+WEEK_DAYS = 7
+
+_UNREAD = object()
+
+
+class PlannedResult:
+    """A value the planner reads the first time it is asked for."""
+
+    def __init__(self, read):
+        self._read = read
+        self._value = _UNREAD
+
+    def result(self):
+        """Returns the value, reading it if it has not been read yet."""
+        if self._value is _UNREAD:
+            self._value = self._read()
+        return self._value
+
+
+class CaloriePlanner:
+    """Reads a user's meals of the last week once and derives the meal page's values from them.
+
+    Args:
+        user_id (str): The ID of the user.
+    """
+
+    def __init__(self, user_id):
+        if not user_id:
+            raise ValueError("User ID must not be empty.")
+        self.user_id = user_id
+        # UTC, the day CURRENT_DATE() gives in BigQuery
+        self.today = datetime.utcnow().date()
+        self.days = [self.today - timedelta(days=i) for i in range(WEEK_DAYS - 1, -1, -1)]
+        self._week_meals = PlannedResult(
+            lambda: get_user_calorie_tracking_between(user_id, self.days[0], self.today)
+        )
+
+    def today_meals(self):
+        """Requests today's meals.
+
+        Returns:
+            PlannedResult: Its result is a list of Meal, as
+            get_user_today_calorie_tracking returns them.
+        """
+        return PlannedResult(lambda: [meal for meal in self._week_meals.result() if meal.date == self.today])
+
+    def today_totals(self):
+        """Requests today's totals, in the form get_genai_nutrition_feedback takes.
+
+        Returns:
+            PlannedResult: Its result is a dict of 'calories', 'protein',
+            'fats' and 'carbs', all None if no meals were logged today.
+        """
+        def read():
+            todays = self.today_meals().result()
+            if not todays:
+                return {"calories": None, "protein": None, "fats": None, "carbs": None}
+            calories, protein, fats, carbs, _ = meal_totals(todays)
+            return {"calories": calories, "protein": protein, "fats": fats, "carbs": carbs}
+        return PlannedResult(read)
+
+    def weekly_summary(self):
+        """Requests the last week's daily totals, as get_user_weekly_calorie_summary returns them."""
+        def read():
+            by_day = {day: [] for day in self.days}
+            for meal in self._week_meals.result():
+                if meal.date in by_day:
+                    by_day[meal.date].append(meal)
+            return summarize_calorie_days(self.days, {day: meal_totals(meals) for day, meals in by_day.items()})
+        return PlannedResult(read)
@@ -0,0 +1,109 @@
+#############################################################################
+# calorie_planner_test.py
+#
+# This file contains tests for calorie_planner.py.
+#############################################################################
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from calorie_planner import CaloriePlanner
+from clients import reset_bigquery_client, set_bigquery_client
+from data_fetcher import QUERY_CALORIES_BETWEEN, clear_caches, get_genai_nutrition_feedback
+
+TODAY = datetime.utcnow().date()
+
+
+def meal_row(meal_id, calories, protein, fats, carbs, days_ago=0):
+    return MagicMock(
+        MealId=meal_id, UserId="user1", MealDate=TODAY - timedelta(days=days_ago), MealName=f"Meal {meal_id}",
+        Calories=calories, Protein=protein, Fats=fats, Carbs=carbs,
+        CreatedAt=datetime.now(timezone.utc),
+    )
+
+
+class TestCaloriePlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [
+            meal_row("meal1", 400, 0, 0, 0, days_ago=6), meal_row("meal2", 600, 0, 0, 0, days_ago=2),
+            meal_row("meal3", 500, 25, 15, 60), meal_row("meal4", 300, None, 5, 40),
+        ]
+        self.client = MagicMock()
+        self.client.query.side_effect = self.query
+        set_bigquery_client(self.client)
+        self.addCleanup(reset_bigquery_client)
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+    def query(self, sql, job_config):
+        self.assertEqual(sql, QUERY_CALORIES_BETWEEN)
+        rows = list(self.rows)
+        return MagicMock(**{"result.side_effect": lambda: iter(rows)})
+
+    def queries(self):
+        return [call.args[0] for call in self.client.query.call_args_list]
+
+    def render(self):
+        planner = CaloriePlanner("user1")
+        today_meals = planner.today_meals()
+        today_totals = planner.today_totals()
+        weekly_summary = planner.weekly_summary()
+        return today_meals.result(), today_totals.result(), weekly_summary.result()
+
+    def test_meal_page_is_one_query(self):
+        """Test that a render reads the week's meals in one query, and a rerun reads nothing."""
+        meals, totals, weekly = self.render()
+
+        self.assertEqual(self.queries(), [QUERY_CALORIES_BETWEEN])
+        params = {param.name: param.value for param in self.client.query.call_args.kwargs["job_config"].query_parameters}
+        self.assertEqual((params["start_date"], params["end_date"]), (TODAY - timedelta(days=6), TODAY))
+        self.assertEqual([meal.meal_id for meal in meals], ["meal3", "meal4"])
+        self.assertEqual(totals, {"calories": 800, "protein": 25, "fats": 20, "carbs": 100})
+        self.assertEqual(len(weekly), 7)
+        self.assertEqual(weekly["MealDate"].iloc[0], TODAY - timedelta(days=6))
+        self.assertEqual(list(weekly["total_calories"]), [400, 0, 0, 0, 600, 0, 800])
+        self.assertEqual(list(weekly["meal_count"]), [1, 0, 0, 0, 1, 0, 2])
+
+        self.render()
+        self.assertEqual(self.client.query.call_count, 1)
+
+    def test_no_meals_today(self):
+        """Test that a day without meals has no totals."""
+        self.rows = self.rows[:2]
+        planner = CaloriePlanner("user1")
+
+        self.assertEqual(planner.today_totals().result(),
+                         {"calories": None, "protein": None, "fats": None, "carbs": None})
+
+    def test_feedback_uses_planned_totals(self):
+        """Test that nutrition feedback given the planner's totals does not query again."""
+        self.rows = []
+        planner = CaloriePlanner("user1")
+        totals = planner.today_totals().result()
+
+        feedback = get_genai_nutrition_feedback("user1", totals=totals)
+
+        self.client.query.assert_called_once()
+        self.assertIn("No nutrition data found", feedback["content"])
+
+    def test_pending_meal_shows_everywhere(self):
+        """Test that a meal still in the write buffer is in today's meals, totals and the week."""
+        self.rows = []
+        pending = {"MealId": "meal5", "UserId": "user1", "MealName": "Soup", "Calories": 200, "Protein": 10,
+                   "Carbs": 20, "Fats": 5, "MealDate": TODAY.isoformat(), "CreatedAt": "2025-04-20T12:00:00"}
+        with patch("data_fetcher.pending_rows", return_value=[pending]):
+            meals, totals, weekly = self.render()
+
+        self.assertEqual([meal.meal_id for meal in meals], ["meal5"])
+        self.assertEqual(totals["calories"], 200)
+        self.assertEqual(list(weekly["total_calories"]), [0, 0, 0, 0, 0, 0, 200])
+
+    def test_invalid_user(self):
+        """Test that an empty user is rejected."""
+        with self.assertRaises(ValueError):
+            CaloriePlanner("")
+
+
+if __name__ == "__main__":
+    unittest.main()
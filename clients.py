@@ -0,0 +1,207 @@
+#############################################################################
+# clients.py
+#
+# This file contains the process-wide clients shared by every page of the app.
+#
+# Streamlit re-runs the page scripts on every interaction, so anything that is
+# expensive to build (credentials, HTTP sessions, the Gemini model) lives here
+# instead of being rebuilt inside each fetcher.
+#############################################################################
+
+import os
+import threading
+import time
+
+import requests
+from google.cloud import bigquery
+
+PROJECT_ID = "sectiona4project"
+GENAI_LOCATION = "us-central1"
+GENAI_MODEL_NAME = "gemini-1.5-flash-002"
+
+# Set GENAI_WARMUP=1 to build the Gemini model in the background as soon as the
+# server starts instead of on the first request that needs it.
+GENAI_WARMUP = os.environ.get("GENAI_WARMUP", "0") == "1"
+
+# Size of the HTTP connection pool shared by every query issued from this
+# process. The default of 10 is too small once pages fetch concurrently.
+HTTP_POOL_SIZE = 16
+
+# After building a client fails (e.g. no credentials), callers within this
+# many seconds get the same error instead of each repeating the slow
+# credential lookup.
+CLIENT_RETRY_DELAY = 30
+
+_lock = threading.Lock()
+_bigquery_client = None
+_bigquery_factory = None
+_bigquery_clients_created = 0
+_bigquery_error = None
+_bigquery_retry_at = 0.0
+
+_genai_lock = threading.Lock()
+_genai_model = None
+_genai_factory = None
+_genai_models_created = 0
+_genai_warmup_thread = None
+
+
+def _default_bigquery_factory():
+    client = bigquery.Client(project=PROJECT_ID)
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE
+    )
+    client._http.mount("https://", adapter)
+    return client
+
+
+def get_bigquery_client():
+    """Returns the BigQuery client for this process, creating it on first use.
+
+    The client is thread-safe and keeps its connection pool open, so every
+    session and every rerun shares the same credentials and HTTP sessions.
+    """
+    global _bigquery_client, _bigquery_clients_created, _bigquery_error, _bigquery_retry_at
+
+    client = _bigquery_client
+    if client is not None:
+        return client
+
+    with _lock:
+        if _bigquery_client is None:
+            if _bigquery_error is not None and time.monotonic() < _bigquery_retry_at:
+                raise _bigquery_error
+            factory = _bigquery_factory or _default_bigquery_factory
+            try:
+                _bigquery_client = factory()
+            except Exception as e:
+                _bigquery_error = e
+                _bigquery_retry_at = time.monotonic() + CLIENT_RETRY_DELAY
+                raise
+            _bigquery_error = None
+            _bigquery_clients_created += 1
+        return _bigquery_client
+
+
+def set_bigquery_client(client):
+    """Installs a ready-made client (e.g. a local stand-in) for this process.
+
+    Passing None drops the current client so the next call builds a new one.
+    """
+    global _bigquery_client
+    with _lock:
+        _bigquery_client = client
+
+
+def set_bigquery_client_factory(factory):
+    """Sets the callable used to build the client on first use.
+
+    The current client is dropped so the factory takes effect immediately.
+    Passing None restores the default BigQuery factory.
+    """
+    global _bigquery_client, _bigquery_factory, _bigquery_error
+    with _lock:
+        _bigquery_factory = factory
+        _bigquery_client = None
+        _bigquery_error = None
+
+
+def reset_bigquery_client():
+    """Drops the current client and factory and clears the creation count."""
+    global _bigquery_client, _bigquery_factory, _bigquery_clients_created, _bigquery_error
+    with _lock:
+        _bigquery_client = None
+        _bigquery_factory = None
+        _bigquery_clients_created = 0
+        _bigquery_error = None
+
+
+def _default_genai_factory():
+    # vertexai is slow to import, so it is only loaded once a model is needed.
+    import vertexai
+    from vertexai.preview.generative_models import GenerativeModel
+
+    vertexai.init(project=PROJECT_ID, location=GENAI_LOCATION)
+    return GenerativeModel(model_name=GENAI_MODEL_NAME)
+
+
+def get_genai_model():
+    """Returns the Gemini model for this process, initializing it on first use."""
+    global _genai_model, _genai_models_created
+
+    model = _genai_model
+    if model is not None:
+        return model
+
+    with _genai_lock:
+        if _genai_model is None:
+            factory = _genai_factory or _default_genai_factory
+            _genai_model = factory()
+            _genai_models_created += 1
+        return _genai_model
+
+
+def set_genai_model(model):
+    """Installs a ready-made model (e.g. a local fake) for this process.
+
+    Passing None drops the current model so the next call builds a new one.
+    """
+    global _genai_model
+    with _genai_lock:
+        _genai_model = model
+
+
+def set_genai_model_factory(factory):
+    """Sets the callable used to build the model on first use.
+
+    Passing None restores the default Vertex AI factory.
+    """
+    global _genai_model, _genai_factory
+    with _genai_lock:
+        _genai_factory = factory
+        _genai_model = None
+
+
+def reset_genai_model():
+    """Drops the current model and factory and clears the creation count."""
+    global _genai_model, _genai_factory, _genai_models_created, _genai_warmup_thread
+    with _genai_lock:
+        _genai_model = None
+        _genai_factory = None
+        _genai_models_created = 0
+        _genai_warmup_thread = None
+
+
+def start_genai_warmup():
+    """Builds the model on a background thread so the first request finds it warm.
+
+    Calling this more than once (e.g. on every Streamlit rerun) starts at most
+    one warmup per process. Failures are left for the first real request to
+    surface.
+
+    Returns:
+        threading.Thread: The warmup thread.
+    """
+    global _genai_warmup_thread
+
+    def warm():
+        try:
+            get_genai_model()
+        except Exception as e:
+            print(f"GenAI warmup failed: {e}")
+
+    with _genai_lock:
+        if _genai_warmup_thread is None:
+            _genai_warmup_thread = threading.Thread(target=warm, name="genai-warmup", daemon=True)
+            _genai_warmup_thread.start()
+        return _genai_warmup_thread
+
+
+def get_client_stats():
+    """Returns how many clients this process has built so far."""
+    return {
+        "bigquery_clients_created": _bigquery_clients_created,
+        "bigquery_client_active": _bigquery_client is not None,
+        "genai_models_created": _genai_models_created,
+        "genai_model_active": _genai_model is not None,
+    }
@@ -0,0 +1,153 @@
+#############################################################################
+# clients_test.py
+#
+# This file contains tests for clients.py.
+#############################################################################
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from clients import (
+    get_bigquery_client,
+    get_client_stats,
+    get_genai_model,
+    reset_bigquery_client,
+    reset_genai_model,
+    set_bigquery_client,
+    set_bigquery_client_factory,
+    set_genai_model,
+    set_genai_model_factory,
+    start_genai_warmup,
+)
+
+
+class TestBigQueryClientManager(unittest.TestCase):
+
+    def setUp(self):
+        reset_bigquery_client()
+        self.addCleanup(reset_bigquery_client)
+
+    @patch("clients.bigquery.Client")
+    def test_client_is_built_once(self, mock_client_cls):
+        """Test that repeated calls share one client."""
+        first = get_bigquery_client()
+        second = get_bigquery_client()
+
+        self.assertIs(first, second)
+        mock_client_cls.assert_called_once_with(project="sectiona4project")
+        self.assertEqual(get_client_stats()["bigquery_clients_created"], 1)
+
+    def test_concurrent_first_use_builds_one_client(self):
+        """Test that threads racing on first use still share one client."""
+        factory = MagicMock(side_effect=lambda: object())
+        set_bigquery_client_factory(factory)
+
+        seen = []
+        threads = [threading.Thread(target=lambda: seen.append(get_bigquery_client())) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        factory.assert_called_once()
+        self.assertEqual(len({id(client) for client in seen}), 1)
+
+    def test_failed_build_is_not_retried_immediately(self):
+        """Test that callers right after a failed build get the same error."""
+        factory = MagicMock(side_effect=RuntimeError("no credentials"))
+        set_bigquery_client_factory(factory)
+
+        for _ in range(3):
+            with self.assertRaises(RuntimeError):
+                get_bigquery_client()
+
+        factory.assert_called_once()
+
+    def test_injected_client_is_used(self):
+        """Test that an injected stand-in is returned and not counted."""
+        stand_in = MagicMock()
+        set_bigquery_client(stand_in)
+
+        self.assertIs(get_bigquery_client(), stand_in)
+        self.assertEqual(get_client_stats()["bigquery_clients_created"], 0)
+
+    def test_reset_drops_client(self):
+        """Test that a reset builds a fresh client on next use."""
+        set_bigquery_client_factory(lambda: object())
+        first = get_bigquery_client()
+        set_bigquery_client(None)
+        second = get_bigquery_client()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(get_client_stats()["bigquery_clients_created"], 2)
+
+
+class TestGenAIModelProvider(unittest.TestCase):
+
+    def setUp(self):
+        reset_genai_model()
+        self.addCleanup(reset_genai_model)
+
+    def test_data_fetcher_import_does_not_load_vertexai(self):
+        """Test that importing data_fetcher leaves Vertex AI untouched."""
+        code = "import sys, data_fetcher; print('vertexai' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "False")
+
+    def test_model_is_built_once(self):
+        """Test that the model is built on first use and then reused."""
+        factory = MagicMock(side_effect=lambda: object())
+        set_genai_model_factory(factory)
+
+        self.assertEqual(get_client_stats()["genai_models_created"], 0)
+        first = get_genai_model()
+        second = get_genai_model()
+
+        self.assertIs(first, second)
+        factory.assert_called_once()
+
+    def test_warmup_builds_model_once(self):
+        """Test that repeated warmups share one background build."""
+        factory = MagicMock(side_effect=lambda: object())
+        set_genai_model_factory(factory)
+
+        thread = start_genai_warmup()
+        self.assertIs(start_genai_warmup(), thread)
+        thread.join(timeout=5)
+
+        factory.assert_called_once()
+        self.assertTrue(get_client_stats()["genai_model_active"])
+
+    @patch("data_fetcher.bigquery.Client")
+    def test_fake_model_serves_advice(self, mock_client_cls):
+        """Test that get_genai_advice runs against an injected fake model."""
+        from cache import PersistentCache
+        from data_fetcher import get_genai_advice, set_genai_cache
+
+        reset_bigquery_client()
+        self.addCleanup(reset_bigquery_client)
+        cache_dir = tempfile.TemporaryDirectory()
+        genai_cache = PersistentCache(os.path.join(cache_dir.name, "genai.sqlite3"))
+        set_genai_cache(genai_cache)
+        self.addCleanup(cache_dir.cleanup)
+        self.addCleanup(genai_cache.close)
+        self.addCleanup(set_genai_cache, None)
+        fake_model = MagicMock()
+        fake_model.generate_content.return_value.text = "Stretch after runs."
+        set_genai_model(fake_model)
+
+        mock_row = MagicMock(TotalDistance=5.0, TotalSteps=8000, CaloriesBurned=400)
+        mock_client_cls.return_value.query.return_value.result.return_value = iter([mock_row])
+
+        advice = get_genai_advice("user1")
+
+        self.assertEqual(advice["content"], "Stretch after runs.")
+        fake_model.generate_content.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,79 +1,231 @@
 import streamlit as st
+from datetime import datetime, timezone
 from google.cloud import bigquery
-from data_fetcher import get_genai_advice
+from typing import List, NamedTuple, Optional, Tuple
+from cache import cached, invalidate_user
+from friend_graph import get_friend_graph
+from data_fetcher import get_genai_advice, get_user_profile
+from modules import display_streamed_text, display_query_debug_panel
+from queries import run_within_budget
+from records import FeedPost
+from storage import get_storage_backend
+from timeline_store import TIMELINE_MAX_LENGTH, get_timeline_store
+from write_buffer import FLUSH_ORDER_CACHES, add_flush_listener
 
 user_id = 'user1'
 
-FRIENDS_QUERY = """
+# Posts per feed page, and seconds a fetched page is reused across reruns.
+FEED_PAGE_SIZE = 10
+FEED_CACHE_TTL = 120
+
+# Posts of the given friends and their authors' profiles in one round trip.
+# A page starts after the (Timestamp, PostId) cursor of the previous one, so
+# every page reads only the posts it returns plus one, however deep the feed
+# goes.
+FEED_QUERY = """
     SELECT
-        CASE
-            WHEN UserId1 = @user_id THEN UserId2
-            ELSE UserId1
-        END AS friend_id
-    FROM `sectiona4project.ISE.Friends`
-    WHERE UserId1 = @user_id OR UserId2 = @user_id
+        posts.PostId,
+        posts.AuthorId,
+        posts.Timestamp,
+        posts.ImageUrl,
+        posts.Content,
+        users.Name AS AuthorName,
+        users.Username AS AuthorUsername,
+        users.ImageUrl AS AuthorImageUrl
+    FROM `sectiona4project.ISE.Posts` AS posts
+    LEFT JOIN `sectiona4project.ISE.Users` AS users ON users.UserId = posts.AuthorId
+    WHERE posts.AuthorId IN UNNEST(@friend_ids)
+        AND (@before_timestamp IS NULL
+            OR posts.Timestamp < @before_timestamp
+            OR (posts.Timestamp = @before_timestamp AND posts.PostId < @before_post_id))
+    ORDER BY posts.Timestamp DESC, posts.PostId DESC
+    LIMIT @limit
 """
 
-POSTS_QUERY = """
-    SELECT PostId, AuthorId, Timestamp, ImageUrl, Content
-    FROM `sectiona4project.ISE.Posts`
-    WHERE AuthorId IN UNNEST(@friend_ids)
-    ORDER BY Timestamp DESC
-    LIMIT 10
-"""
 
-def get_friends(user_id):
-  
-    client = bigquery.Client(project="sectiona4project")
+class FeedPage(NamedTuple):
+    """One page of the community feed.
 
-    # friends_params = {"user_id": user_id}
-    
-    friends_results = client.query(FRIENDS_QUERY, job_config=bigquery.QueryJobConfig(query_parameters=[
-        bigquery.ScalarQueryParameter("user_id", "STRING", user_id)
-    ])).result()
+    Attributes:
+        posts (list of FeedPost): Newest first.
+        next_cursor (tuple): The (timestamp, post_id) to pass as before to
+            get the next, older page, or None if this is the last page.
+    """
+    posts: List[FeedPost]
+    next_cursor: Optional[Tuple]
 
-    friend_ids = [row.friend_id for row in friends_results]
-    return friend_ids
 
-
-def get_friends_latest_posts(user_id):
+def get_friends(user_id):
+    """Returns the IDs of the user's friends, sorted, from the friend graph."""
+    return list(get_friend_graph().friends_of(user_id))
+
+
+@cached("community_feed", ttl=FEED_CACHE_TTL)
+def get_friends_feed(user_id, before=None, page_size=FEED_PAGE_SIZE):
+    """Fetches one page of the user's friends' posts, newest first, in one query.
+
+    Friends are read from the friend graph, which queries Friends only when
+    its entry for the user has expired.
+
+    Args:
+        user_id (str): The ID of the user whose friends' posts are shown.
+        before (tuple): The next_cursor of the previous page; None for the
+            first page.
+        page_size (int): Most posts on the page.
+
+    Returns:
+        FeedPage: The posts with their authors' names and images, and the
+        cursor of the next page.
+    """
+    if not user_id:
+        raise ValueError("User ID must not be empty.")
+    if page_size < 1:
+        raise ValueError("Page size must be at least 1.")
+    before_timestamp, before_post_id = before or (None, None)
+
+    # Friends come from memory, so the page's only query is the posts
     friend_ids = get_friends(user_id)
-
     if not friend_ids:
-        st.write("You have no friends, no posts to show.")
-        return []
-
-    client = bigquery.Client(project="sectiona4project")
-
-    posts_results = client.query(POSTS_QUERY, job_config=bigquery.QueryJobConfig(query_parameters=[
-        bigquery.ArrayQueryParameter("friend_ids", "STRING", friend_ids)
-    ])).result()
+        return FeedPage([], None)
+
+    rows = list(run_within_budget(get_storage_backend(), "community_feed", FEED_QUERY, [
+        bigquery.ArrayQueryParameter("friend_ids", "STRING", friend_ids),
+        bigquery.ScalarQueryParameter("before_timestamp", "TIMESTAMP", before_timestamp),
+        bigquery.ScalarQueryParameter("before_post_id", "STRING", before_post_id),
+        # One extra row tells whether an older page exists
+        bigquery.ScalarQueryParameter("limit", "INT64", page_size + 1),
+    ]).result())
+
+    posts = [
+        FeedPost(
+            user_id=row.AuthorId,
+            post_id=row.PostId,
+            timestamp=row.Timestamp,
+            content=row.Content,
+            image=row.ImageUrl,
+            author_full_name=row.AuthorName,
+            author_username=row.AuthorUsername,
+            author_profile_image=row.AuthorImageUrl,
+        )
+        for row in rows[:page_size]
+    ]
+    next_cursor = (posts[-1].timestamp, posts[-1].post_id) if len(rows) > page_size else None
+    return FeedPage(posts, next_cursor)
+
+
+def get_feed_page(user_id, before=None, page_size=FEED_PAGE_SIZE):
+    """Reads one page of the user's feed from their precomputed timeline.
+
+    The timeline is built with one feed query the first time the user reads
+    it. Pages older than the stored posts are read with get_friends_feed.
+
+    Args:
+        user_id (str): The ID of the user whose friends' posts are shown.
+        before (tuple): The next_cursor of the previous page; None for the
+            first page.
+        page_size (int): Most posts on the page.
+
+    Returns:
+        FeedPage: As returned by get_friends_feed.
+    """
+    store = get_timeline_store()
+    if not store.has_timeline(user_id):
+        newest = get_friends_feed.uncached(user_id, None, TIMELINE_MAX_LENGTH)
+        store.backfill(user_id, newest.posts, complete=newest.next_cursor is None)
+
+    page = store.read_page(user_id, get_friends(user_id), before, page_size)
+    if page is None:
+        return get_friends_feed(user_id, before, page_size)
+    return FeedPage(*page)
+
+
+def publish_post(row):
+    """Adds a Posts row the app just wrote to the timelines of the author's friends.
+
+    Posts written through the write buffer are published when they are
+    written; call this only for rows written some other way.
+    """
+    author_id = row["AuthorId"]
+    author = get_user_profile(author_id)
+    post = FeedPost(
+        user_id=author_id,
+        post_id=row["PostId"],
+        timestamp=datetime.fromisoformat(row["Timestamp"]).replace(tzinfo=timezone.utc),
+        content=row.get("Content"),
+        image=row.get("ImageUrl"),
+        author_full_name=author.full_name if author else None,
+        author_username=author.username if author else None,
+        author_profile_image=author.profile_image if author else None,
+    )
+    get_timeline_store().publish(post, get_friend_graph().friends_of(author_id))
+
+
+def _publish_written_posts(table, rows):
+    if table != "Posts":
+        return
+    for row in rows:
+        try:
+            publish_post(row)
+            # Feed pages cached before the write would miss the post
+            for friend_id in get_friend_graph().friends_of(row["AuthorId"]):
+                invalidate_user(friend_id, "community_feed")
+        except Exception as e:
+            # The post is saved; friends see it when their timelines are next rebuilt
+            print(f"Could not add post to timelines: {e}")
+
+
+# Friends only see a post once it is written, so a post that fails to save
+# never shows up in their feeds
+add_flush_listener(_publish_written_posts, FLUSH_ORDER_CACHES)
+
+
+def display_feed_post(post):
+    st.write(f"Post ID: {post.post_id}")
+    if post.author_full_name:
+        st.write(f"Friend: {post.author_full_name} (@{post.author_username})")
+    else:
+        st.write(f"Friend's ID: {post.user_id}")
+    st.write(f"Content: {post.content}")
+    st.write(f"Timestamp: {post['timestamp']}")
+    if post.image:
+        st.image(post.image)
+    st.write("---")
 
-    return posts_results
 
 def community_page(user_id):
     st.title("Community Page")
-    
-    posts = get_friends_latest_posts(user_id)
-
-    if posts:
-        st.header("Latest Posts from Your Friends:")
-        for post in posts:
-            st.write(f"Post ID: {post.PostId}")
-            st.write(f"Friend's ID: {post.AuthorId}")
-            st.write(f"Content: {post.Content}")
-            st.write(f"Timestamp: {post.Timestamp}")
-            if post.ImageUrl:
-                st.image(post.ImageUrl)
-            st.write("---")
-    
+
+    # Each page is a slice of the user's timeline, so reruns cost no queries
+    pages_shown = st.session_state.get("community_feed_pages", 1)
+    cursor = None
+    shown = 0
+    for _ in range(pages_shown):
+        page = get_feed_page(user_id, cursor)
+        if shown == 0 and page.posts:
+            st.header("Latest Posts from Your Friends:")
+        for post in page.posts:
+            display_feed_post(post)
+        shown += len(page.posts)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    if shown == 0:
+        st.write("No posts from your friends to show.")
+    elif cursor is not None:
+        def show_older_posts():
+            st.session_state["community_feed_pages"] = pages_shown + 1
+
+        st.button("Older posts", key="community_feed_older", on_click=show_older_posts)
+
     st.header("GenAI Advice and Encouragement:")
-    advice = get_genai_advice(user_id)
-    st.write(f"Advice: {advice['content']}")
+    advice = get_genai_advice(user_id, stream=True)
+    display_streamed_text(advice['content'], prefix="Advice: ")
 
     if advice["image"]:
         st.image(advice["image"])
 
 
 if __name__ == "__main__":
-    community_page(user_id)
\ No newline at end of file
+    community_page(user_id)
+    display_query_debug_panel()
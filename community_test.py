@@ -0,0 +1,146 @@
+#############################################################################
+# community_test.py
+#
+# This file contains tests for community.py.
+#############################################################################
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from clients import reset_bigquery_client, set_bigquery_client
+from community import FEED_QUERY, get_feed_page, get_friends_feed, publish_post
+from data_fetcher import clear_caches
+from friend_graph import FRIENDSHIPS_QUERY, get_friend_graph
+from timeline_store import get_timeline_store
+from write_buffer import WriteBuffer
+
+NEWEST = datetime(2025, 4, 20, 12, 0, tzinfo=timezone.utc)
+
+
+def feed_row(i):
+    return MagicMock(
+        PostId=f"post{i}", AuthorId="user2", Timestamp=NEWEST - timedelta(hours=i),
+        ImageUrl=None, Content=f"Post {i}",
+        AuthorName="Jane Doe", AuthorUsername="jane", AuthorImageUrl="http://example.com/jane.jpg",
+    )
+
+
+class TestGetFriendsFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MagicMock()
+        set_bigquery_client(self.client)
+        self.addCleanup(reset_bigquery_client)
+        clear_caches()
+        self.addCleanup(clear_caches)
+        get_friend_graph().invalidate()
+        self.addCleanup(get_friend_graph().invalidate)
+        get_timeline_store().clear()
+        self.addCleanup(get_timeline_store().clear)
+
+        self.feed_rows = []
+        friendships = [MagicMock(UserId1="user1", UserId2="user2"), MagicMock(UserId1="user3", UserId2="user1")]
+
+        def query(sql, job_config):
+            job = MagicMock()
+            job.result.return_value = friendships if sql == FRIENDSHIPS_QUERY else self.feed_rows
+            return job
+        self.client.query.side_effect = query
+
+    def feed_calls(self):
+        return [call for call in self.client.query.call_args_list if call.args[0] == FEED_QUERY]
+
+    def query_parameters(self):
+        job_config = self.feed_calls()[-1].kwargs["job_config"]
+        return {param.name: getattr(param, "values", None) or param.value
+                for param in job_config.query_parameters}
+
+    def test_first_page_is_one_query(self):
+        """Test that posts and authors come from one query, one row past the page."""
+        self.feed_rows = [feed_row(i) for i in range(4)]
+
+        page = get_friends_feed("user1", page_size=3)
+
+        self.assertEqual(len(self.feed_calls()), 1)
+        self.assertEqual(self.query_parameters(), {
+            "friend_ids": ["user2", "user3"], "before_timestamp": None, "before_post_id": None, "limit": 4,
+        })
+        self.assertEqual([post.post_id for post in page.posts], ["post0", "post1", "post2"])
+        self.assertEqual(page.posts[0].author_full_name, "Jane Doe")
+        self.assertEqual(page.posts[0]["timestamp"], "2025-04-20 12:00:00")
+        self.assertEqual(page.next_cursor, (NEWEST - timedelta(hours=2), "post2"))
+
+    def test_older_page_starts_after_cursor(self):
+        """Test that the next page is keyed on the last post's timestamp and ID."""
+        self.feed_rows = [feed_row(3)]
+        cursor = (NEWEST - timedelta(hours=2), "post2")
+
+        page = get_friends_feed("user1", cursor, page_size=3)
+
+        self.assertEqual(self.query_parameters()["before_timestamp"], cursor[0])
+        self.assertEqual(self.query_parameters()["before_post_id"], "post2")
+        self.assertEqual([post.post_id for post in page.posts], ["post3"])
+        self.assertIsNone(page.next_cursor)
+
+    def test_pages_and_friends_are_cached(self):
+        """Test that rerunning the page fetches neither shown pages nor friends again."""
+        get_friends_feed("user1")
+        get_friends_feed("user1")
+        get_friends_feed("user1", (NEWEST, "post0"))
+
+        self.assertEqual(len(self.feed_calls()), 2)
+        self.assertEqual(self.client.query.call_count, 3)
+
+    def test_feed_pages_come_from_the_timeline(self):
+        """Test that the timeline is built with one query and then read from memory."""
+        self.feed_rows = [feed_row(i) for i in range(3)]
+
+        first = get_feed_page("user1", page_size=2)
+        second = get_feed_page("user1", first.next_cursor, page_size=2)
+        self.assertEqual([post.post_id for post in first.posts + second.posts], ["post0", "post1", "post2"])
+        self.assertIsNone(second.next_cursor)
+        self.assertEqual(len(self.feed_calls()), 1)
+
+        with patch("community.get_user_profile", return_value=None):
+            publish_post({"PostId": "post9", "AuthorId": "user2", "Timestamp": "2025-04-21T08:00:00",
+                          "ImageUrl": None, "Content": "New post"})
+        newest = get_feed_page("user1", page_size=2)
+        self.assertEqual([post.post_id for post in newest.posts], ["post9", "post0"])
+        self.assertEqual(len(self.feed_calls()), 1)
+
+    def test_written_posts_reach_friends(self):
+        """Test that a buffered post is published, and cached feed pages dropped, only once it is written."""
+        get_feed_page("user1")
+        get_friends_feed("user1")
+        backend = MagicMock()
+        backend.insert_rows.return_value = [{"index": 0, "errors": ["backendError"]}]
+        buffer = WriteBuffer("Posts", "PostId", "AuthorId", backend_factory=lambda: backend, sleep=lambda _: None)
+        row = {"PostId": "post9", "AuthorId": "user2", "Timestamp": "2025-04-21T08:00:00",
+               "ImageUrl": None, "Content": "New post"}
+
+        with patch("community.get_user_profile", return_value=None), \
+                patch("write_buffer.WRITE_BUFFER_MAX_ATTEMPTS", 1):
+            buffer.add(row)
+            buffer.flush(timeout=5)
+            self.assertEqual(get_feed_page("user1").posts, [])
+            get_friends_feed("user1")
+            self.assertEqual(len(self.feed_calls()), 2)
+
+            backend.insert_rows.return_value = []
+            buffer.add(dict(row))
+            buffer.close(timeout=5)
+
+        self.assertEqual([post.post_id for post in get_feed_page("user1").posts], ["post9"])
+        get_friends_feed("user1")
+        self.assertEqual(len(self.feed_calls()), 3)
+
+    def test_invalid_arguments(self):
+        """Test that an empty user or page size is rejected."""
+        with self.assertRaises(ValueError):
+            get_friends_feed("")
+        with self.assertRaises(ValueError):
+            get_friends_feed("user1", page_size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,17 +9,37 @@
 #############################################################################
 
 from google.cloud import bigquery
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from clients import GENAI_MODEL_NAME, get_genai_model
+from cache import PersistentCache, cached, clear_all, content_key, get_cache, invalidate_user
+from records import Meal, Post, Profile, Workout
+from queries import run_within_budget, select
+from replica import get_replica
+from storage import get_storage_backend
+from write_buffer import BUFFERED_TABLES, FLUSH_ORDER_CACHES, add_flush_listener, pending_rows
+import functools
+import importlib.util
 import random
 import os 
+import threading
 import uuid
-from datetime import datetime, timedelta
-import vertexai
-from vertexai.preview.generative_models import GenerativeModel
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
 
-QUERY_WORKOUTS = """
-    SELECT * FROM `sectiona4project.ISE.Workouts` 
-    WHERE UserId = @user_id
-"""
+# The columns each row mapper reads (_workout_from_row and so on), so the
+# queries scan nothing else. data_fetcher_test checks they stay in step.
+WORKOUT_COLUMNS = [
+    "WorkoutId", "StartTimestamp", "EndTimestamp", "StartLocationLat", "StartLocationLong",
+    "EndLocationLat", "EndLocationLong", "TotalDistance", "TotalSteps", "CaloriesBurned",
+]
+PROFILE_COLUMNS = ["UserId", "Name", "Username", "ImageUrl", "DateOfBirth"]
+POST_COLUMNS = ["AuthorId", "PostId", "Timestamp", "Content", "ImageUrl"]
+MEAL_COLUMNS = ["MealId", "UserId", "MealDate", "MealName", "Calories", "Protein", "Carbs", "Fats", "CreatedAt"]
+
+QUERY_WORKOUTS = select("Workouts", WORKOUT_COLUMNS, "UserId = @user_id")
 
 QUERY_SENSOR_DATA = """
     SELECT
@@ -44,75 +64,471 @@ ADVICE_QUERY = """
     LIMIT 1
 """
 
-QUERY_PROFILES = """
-    SELECT * FROM `sectiona4project.ISE.Users` 
-    WHERE UserId = @user_id
-"""
+QUERY_PROFILES = select("Users", PROFILE_COLUMNS, "UserId = @user_id")
 
-QUERY_POSTS = """
-    SELECT * FROM `sectiona4project.ISE.Posts` 
-    WHERE AuthorId = @user_id
+QUERY_PROFILES_BULK = """
+    SELECT UserId, Name, Username, ImageUrl, DateOfBirth
+    FROM `sectiona4project.ISE.Users`
+    WHERE UserId IN UNNEST(@ids)
 """
 
-QUERY_WORKOUTS_BY_DATE = """
-    SELECT * FROM `sectiona4project.ISE.Workouts` 
-    WHERE UserId = @user_id
-    AND DATE(StartTimestamp) BETWEEN @start_date AND @end_date
-"""
+QUERY_POSTS = select("Posts", POST_COLUMNS, "AuthorId = @user_id")
 
-QUERY_CALORIES = """
-    SELECT * FROM `sectiona4project.ISE.CalorieTracking` 
-    WHERE UserId = @user_id
-"""
+QUERY_WORKOUTS_BY_DATE = select(
+    "Workouts", WORKOUT_COLUMNS, "UserId = @user_id AND DATE(StartTimestamp) BETWEEN @start_date AND @end_date"
+)
 
-QUERY_TODAY_CALORIES = """
-    SELECT * FROM `sectiona4project.ISE.CalorieTracking` WHERE MealDate=CURRENT_DATE()
-    AND UserId = @user_id
-"""
+QUERY_CALORIES = select("CalorieTracking", MEAL_COLUMNS, "UserId = @user_id")
 
+QUERY_TODAY_CALORIES = select("CalorieTracking", MEAL_COLUMNS, "MealDate = CURRENT_DATE() AND UserId = @user_id")
+
+QUERY_CALORIES_BETWEEN = select(
+    "CalorieTracking", MEAL_COLUMNS, "UserId = @user_id AND MealDate BETWEEN @start_date AND @end_date"
+)
+
+# Nutrition totals are read from the daily rollups kept by nutrition_rollups.py
+# rather than summed from CalorieTracking on every request.
 QUERY_NUTRITION_FEEDBACK = """
-    SELECT 
-    SUM(Calories) AS total_calories,
-    SUM(Protein) AS total_protein,
-    SUM(Fats) AS total_fats,
-    SUM(Carbs) AS total_carbs
-    FROM `sectiona4project.ISE.CalorieTracking`
+    SELECT
+    TotalCalories AS total_calories,
+    TotalProtein AS total_protein,
+    TotalFats AS total_fats,
+    TotalCarbs AS total_carbs
+    FROM `sectiona4project.ISE.DailyNutrition`
     WHERE UserId = @user_id AND MealDate = @meal_date
 """
 
-WEEKLY_CALORIE_QUERY = """
+QUERY_CALORIE_DAYS = """
     SELECT 
         MealDate,
-        SUM(Calories) AS total_calories,
-        SUM(Protein) AS total_protein,
-        SUM(Fats) AS total_fats,
-        SUM(Carbs) AS total_carbs
-    FROM `sectiona4project.ISE.CalorieTracking`
-    WHERE UserId = @user_id AND MealDate BETWEEN @start_date AND @end_date
-    GROUP BY MealDate
-    ORDER BY MealDate
+        TotalCalories AS total_calories,
+        TotalProtein AS total_protein,
+        TotalFats AS total_fats,
+        TotalCarbs AS total_carbs,
+        MealCount AS meal_count
+    FROM `sectiona4project.ISE.DailyNutrition`
+    WHERE UserId = @user_id AND MealDate IN UNNEST(@dates)
 """
 
-def get_user_sensor_data(user_id, workout_id):
+ADVICE_PROMPT = (
+    "Based on a workout where the user covered {distance} km, "
+    "took {steps} steps, and burned {calories} calories, "
+    "give a brief fitness advice on recovery, future training, or improvements."
+)
+
+NUTRITION_PROMPT = (
+    "Today, the user consumed:\n"
+    "- Calories: {calories} kcal\n"
+    "- Protein: {protein} g\n"
+    "- Fats: {fats} g\n"
+    "- Carbohydrates: {carbs} g\n\n"
+    "Provide brief, personalized nutrition feedback. Suggest improvements, assess balance, and be encouraging. "
+    "Compare to average adult dietary recommendations."
+)
+
+# Seconds each kind of result is served from memory before it is fetched
+# again. Writes made through this app invalidate the affected entries
+# immediately, so these only bound how stale other writers' data can get.
+CACHE_TTLS = {
+    "profiles": 600,
+    "workouts": 300,
+    "workouts_by_date": 300,
+    "sensor_data": 3600,
+    "posts": 120,
+    "calories": 300,
+    "today_calories": 120,
+    "calories_between": 120,
+    "calorie_days": 24 * 60 * 60,
+    "workouts_table": 300,
+    "sensor_data_table": 3600,
+    "calories_table": 300,
+}
+
+# The cached query types that read each table, for write invalidation.
+TABLE_QUERY_TYPES = {
+    "Users": ("profiles",),
+    "Workouts": ("workouts", "workouts_by_date", "workouts_table"),
+    "Posts": ("posts",),
+    "CalorieTracking": ("calories", "today_calories", "calories_between", "calories_table", "calorie_days"),
+    "DailyNutrition": ("calorie_days",),
+}
+
+# How the bulk fetchers read their results. "rows" iterates query_job.result()
+# and builds each record from a Row; "arrow" downloads the whole result as an
+# Arrow table and builds the records column by column, which is several times
+# faster for large results. Either way the fetchers return the same records.
+FETCH_ENGINES = {
+    "workouts": os.environ.get("FETCH_ENGINE", "rows"),
+    "sensor_data": os.environ.get("FETCH_ENGINE", "rows"),
+    "calories": os.environ.get("FETCH_ENGINE", "rows"),
+}
+
+# Arrow downloads go through the BigQuery Storage Read API when its client
+# library is installed; otherwise they page through the REST API.
+BQSTORAGE_AVAILABLE = importlib.util.find_spec("google.cloud.bigquery_storage") is not None
+
+_profile_cache = get_cache("profiles", maxsize=2048, ttl=CACHE_TTLS["profiles"])
+
+# Nutrition totals of past days, keyed by (user_id, date). Meals for a past
+# day are rarely added later, and when they are through this app the write
+# invalidates the user's days, so these are kept for a day.
+_calorie_day_cache = get_cache("calorie_days", maxsize=20000, ttl=CACHE_TTLS["calorie_days"])
+
+CALORIE_SUMMARY_COLUMNS = ["MealDate", "total_calories", "total_protein", "total_fats", "total_carbs", "meal_count"]
+CALORIE_GRANULARITIES = ("day", "week", "month", "year")
+
+# Generated advice is stored on local disk, keyed by a hash of the prompt
+# inputs, so unchanged data never costs another LLM call, even after a restart.
+# Set GENAI_CACHE_PATH to an empty string to turn this off.
+GENAI_CACHE_PATH = os.environ.get(
+    "GENAI_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "workout_app", "genai.sqlite3"),
+)
+GENAI_CACHE_TTL = 24 * 60 * 60
+GENAI_CACHE_MAXSIZE = 5000
+
+_genai_cache = None
+_genai_cache_lock = threading.Lock()
+
+
+def clear_caches():
+    """Empties every in-process cache kept by the fetchers."""
+    clear_all()
+
+
+def get_genai_cache():
+    """Returns the on-disk cache of generated text, or None if it is disabled."""
+    global _genai_cache
+    with _genai_cache_lock:
+        if _genai_cache is None and GENAI_CACHE_PATH:
+            _genai_cache = PersistentCache(
+                GENAI_CACHE_PATH, maxsize=GENAI_CACHE_MAXSIZE, ttl=GENAI_CACHE_TTL
+            )
+        return _genai_cache
+
+
+def set_genai_cache(cache):
+    """Replaces the cache of generated text, e.g. with one in a temporary directory.
+
+    Passing None goes back to the default cache at GENAI_CACHE_PATH.
+    """
+    global _genai_cache
+    with _genai_cache_lock:
+        _genai_cache = cache
+
+
+def _generate(kind, template, fallback, **inputs):
+    """Fills template with inputs and asks the model, reusing earlier answers.
+
+    Returns:
+        tuple: The generated text and the ISO timestamp it was generated at.
+    """
+    cache = get_genai_cache()
+    key = content_key(kind, GENAI_MODEL_NAME, template=template, **inputs)
+    if cache is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            return hit["content"], hit["timestamp"]
+
+    response = get_genai_model().generate_content(template.format(**inputs))
+    timestamp = datetime.utcnow().isoformat()
+    if not response:
+        return fallback, timestamp
+
+    if cache is not None:
+        cache.set(key, {"content": response.text, "timestamp": timestamp})
+    return response.text, timestamp
+
+
+def _generate_stream(kind, template, fallback, **inputs):
+    """Like _generate, but yields the text in chunks as the model produces it.
+
+    A cached answer is yielded in one piece. The full text is cached once the
+    stream has been read to the end.
+    """
+    cache = get_genai_cache()
+    key = content_key(kind, GENAI_MODEL_NAME, template=template, **inputs)
+    if cache is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            yield hit["content"]
+            return
+
+    timestamp = datetime.utcnow().isoformat()
+    parts = []
+    for chunk in get_genai_model().generate_content(template.format(**inputs), stream=True):
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text (e.g. only safety ratings) carry nothing to show
+            continue
+        if text:
+            parts.append(text)
+            yield text
+
+    if not parts:
+        yield fallback
+        return
+
+    if cache is not None:
+        cache.set(key, {"content": "".join(parts), "timestamp": timestamp})
+
+
+def invalidate_user_data(user_id, table):
+    """Drops the cached results a write to table can change for user_id.
+
+    Insert paths call this after a successful write so the user sees their own
+    change on the next rerun while everything else stays cached.
+
+    Args:
+        user_id (str): The user whose data changed.
+        table (str): The table written to, e.g. "Posts" or "CalorieTracking".
+    """
+    invalidate_user(user_id, *TABLE_QUERY_TYPES.get(table, ()))
+
+
+def _invalidate_written_rows(table, rows):
+    _, user_field = BUFFERED_TABLES[table]
+    for user_id in {row.get(user_field) for row in rows}:
+        invalidate_user_data(user_id, table)
+
+
+# Rows written behind the pages' backs make cached results stale like any insert
+add_flush_listener(_invalidate_written_rows, FLUSH_ORDER_CACHES)
+
+
+def _parse_row_time(value):
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _parse_row_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def _post_from_pending(row):
+    return Post(
+        user_id=row.get("AuthorId"),
+        post_id=row.get("PostId"),
+        timestamp=_parse_row_time(row.get("Timestamp")),
+        content=row.get("Content"),
+        image=row.get("ImageUrl"),
+    )
+
+
+def _meal_from_pending(row):
+    return Meal(
+        meal_id=row.get("MealId"),
+        user_id=row.get("UserId"),
+        date=_parse_row_date(row.get("MealDate")),
+        meal_name=row.get("MealName"),
+        calories=row.get("Calories"),
+        protein=row.get("Protein"),
+        carbs=row.get("Carbs"),
+        fat=row.get("Fats"),
+        created_at=_parse_row_time(row.get("CreatedAt")),
+    )
+
+
+def _with_pending(table, from_row, key, keep=None):
+    """Decorates a fetcher of table's records to add the user's unwritten rows.
+
+    Rows still in the write buffer are converted with from_row and appended
+    unless a fetched record has the same key attribute, so a row is never
+    shown twice while it is being written. keep(record, *args) can leave out
+    pending records outside what the fetcher was asked for. The wrapper goes
+    outside @cached, so pending rows are never cached.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(user_id, *args):
+            records = func(user_id, *args)
+            rows = pending_rows(table, user_id)
+            if not rows:
+                return records
+            known = {getattr(record, key) for record in records}
+            added = [from_row(row) for row in rows]
+            return list(records) + [
+                record for record in added
+                if getattr(record, key) not in known and (keep is None or keep(record, *args))
+            ]
+        return wrapper
+    return decorator
+
+
+def _is_today(meal):
+    return meal.date == datetime.utcnow().date()
+
+
+def _in_date_range(meal, start_date, end_date):
+    return meal.date is not None and _as_date(start_date) <= meal.date <= _as_date(end_date)
+
+
+def _run_query(query_class, query, query_parameters=()):
+    """Runs a parameterized query on the storage backend, within its class's budget, and returns the job."""
+    return run_within_budget(get_storage_backend(), query_class, query, query_parameters)
+
+
+def _run_user_query(table, user_id, query_class, query, query_parameters=()):
+    """Runs a query of one user's rows of table, on the local replica if enabled."""
+    replica = get_replica()
+    if replica is None:
+        return _run_query(query_class, query, query_parameters)
+    return replica.query(table, user_id, query, query_parameters, query_class)
+
+
+def set_fetch_engine(name, engine):
+    """Chooses how the named fetcher reads its results: "rows" or "arrow"."""
+    if name not in FETCH_ENGINES:
+        raise ValueError(f"Unknown fetcher: {name}")
+    if engine not in ("rows", "arrow"):
+        raise ValueError(f"Unknown fetch engine: {engine}")
+    FETCH_ENGINES[name] = engine
+
+
+def _fetch_arrow(query_job):
+    """Downloads a query's whole result as a pyarrow Table."""
+    return query_job.to_arrow(create_bqstorage_client=BQSTORAGE_AVAILABLE)
+
+
+def _column_values(column):
+    """Returns a column as a list of Python values.
+
+    Going through NumPy is several times faster than to_pylist, but would turn
+    missing numbers into NaN, so columns with nulls take the slow path.
+    """
+    if column.null_count:
+        return column.to_pylist()
+    return column.to_numpy(zero_copy_only=False).tolist()
+
+
+def _format_timestamps(column, fmt):
+    # BigQuery timestamps are UTC, and formatting them without a time zone is
+    # faster. Arrow prints fractions of a second with %S, so drop them too.
+    if pa.types.is_timestamp(column.type):
+        column = column.cast(pa.timestamp("s"), safe=False)
+    return _column_values(pc.strftime(column, format=fmt))
+
+
+def _column_datetimes(column):
+    """Returns a timestamp or date column as a list of datetimes or dates.
+
+    pyarrow converts zoned timestamps slowly, so they are converted without
+    their zone and given it back afterwards. BigQuery timestamps are UTC.
+    """
+    if not pa.types.is_timestamp(column.type) or column.type.tz is None:
+        return column.to_pylist()
+    naive = column.cast(pa.timestamp(column.type.unit)).to_pylist()
+    return [value and value.replace(tzinfo=timezone.utc) for value in naive]
+
+
+def _or_none(column):
+    # The row adapters turn every falsy value into None, so match them
+    return [value or None for value in _column_values(column)]
+
+
+class SensorSeries(NamedTuple):
+    """One sensor's readings for a workout, stored as NumPy columns.
+
+    Attributes:
+        timestamps (numpy.ndarray): float64 seconds since the Unix epoch (UTC).
+        values (numpy.ndarray): float64 readings, aligned with timestamps.
+        units (str): The units of the readings, e.g. "bpm".
+    """
+    timestamps: np.ndarray
+    values: np.ndarray
+    units: str
+
+
+def _sensor_series_from_arrow(table):
+    """Splits a sensor query result into one SensorSeries per sensor type.
+
+    Works on whole columns so no Python object is built per reading.
+    """
+    if table.num_rows == 0:
+        return {}
+
+    timestamps = pc.cast(table.column("Timestamp"), pa.timestamp("us"))
+    seconds = pc.cast(timestamps, pa.int64()).to_numpy() / 1_000_000
+    values = pc.cast(table.column("SensorValue"), pa.float64()).to_numpy(zero_copy_only=False)
+    names = pc.dictionary_encode(table.column("SensorName")).combine_chunks()
+    codes = names.indices.to_numpy(zero_copy_only=False)
+    units = table.column("SensorUnits").to_numpy(zero_copy_only=False)
+
+    series = {}
+    for code, name in enumerate(names.dictionary.to_pylist()):
+        positions = np.flatnonzero(codes == code)
+        series[name] = SensorSeries(seconds[positions], values[positions], units[positions[0]])
+    return series
+
+
+def _query_sensor_data(workout_id):
+    if not workout_id:
+        raise ValueError("Workout ID must not be empty.")
+
+    return _run_query(
+        "sensor_data", QUERY_SENSOR_DATA,
+        [bigquery.ScalarQueryParameter("workout_id", "STRING", workout_id)]
+    )
+
+
+def _sensor_readings_from_arrow(table):
+    return [
+        {
+            'sensor_type': sensor_type,
+            'timestamp': timestamp,
+            'data': data,
+            'units': units
+        }
+        for sensor_type, timestamp, data, units in zip(
+            _column_values(table.column("SensorName")),
+            _format_timestamps(table.column("Timestamp"), '%Y-%m-%dT%H:%M:%S'),
+            _column_values(table.column("SensorValue")),
+            _column_values(table.column("SensorUnits")),
+        )
+    ]
+
+
+@cached("sensor_data_table", ttl=CACHE_TTLS["sensor_data_table"])
+def get_user_sensor_data_table(user_id, workout_id):
+    """Fetch a workout's sensor data as a pyarrow Table.
+
+    Columns are Timestamp, SensorValue, SensorName and SensorUnits, one row
+    per reading in time order.
+
+    Args:
+        user_id (str): The ID of the user (not used, kept for consistency).
+        workout_id (str): The ID of the workout.
+
+    Returns:
+        pyarrow.Table: The readings.
+    """
+    return _fetch_arrow(_query_sensor_data(workout_id))
+
+
+@cached("sensor_data", ttl=CACHE_TTLS["sensor_data"])
+def get_user_sensor_data(user_id, workout_id, columnar=False):
     """Fetch timestamped sensor data for a given workout from BigQuery.
 
     Args:
         user_id (str): The ID of the user (not used, kept for consistency).
         workout_id (str): The ID of the workout.
+        columnar (bool): If True, return NumPy columns per sensor type instead
+            of one dictionary per reading. Much cheaper for long workouts.
 
     Returns:
-        list: A list of sensor readings as dictionaries.
+        list: A list of sensor readings as dictionaries, or, if columnar is
+        True, a dict mapping each sensor type to a SensorSeries.
     """
-    if not workout_id:
-        raise ValueError("Workout ID must not be empty.")
+    query_job = _query_sensor_data(workout_id)
 
-    client = bigquery.Client(project="sectiona4project")
-    query_job = client.query(
-        QUERY_SENSOR_DATA,
-        job_config=bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("workout_id", "STRING", workout_id)]
-        )
-    )
+    if columnar:
+        return _sensor_series_from_arrow(_fetch_arrow(query_job))
+
+    if FETCH_ENGINES["sensor_data"] == "arrow":
+        return _sensor_readings_from_arrow(_fetch_arrow(query_job))
 
     return [
         {
@@ -125,6 +541,61 @@ def get_user_sensor_data(user_id, workout_id):
     ]
 
 
+def _query_workouts(user_id):
+    return _run_user_query(
+        "Workouts", user_id, "workouts", QUERY_WORKOUTS,
+        [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
+    )
+
+
+def _workout_from_row(row):
+    return Workout(
+        workout_id=row.WorkoutId,
+        start_timestamp=row.StartTimestamp or None,
+        end_timestamp=row.EndTimestamp or None,
+        start_lat_lng=(row.StartLocationLat, row.StartLocationLong) if row.StartLocationLat and row.StartLocationLong else None,
+        end_lat_lng=(row.EndLocationLat, row.EndLocationLong) if row.EndLocationLat and row.EndLocationLong else None,
+        distance=row.TotalDistance,
+        steps=row.TotalSteps,
+        calories_burned=row.CaloriesBurned,
+    )
+
+
+def _lat_lngs(table, lat_column, lng_column):
+    return [
+        (lat, lng) if lat and lng else None
+        for lat, lng in zip(_column_values(table.column(lat_column)), _column_values(table.column(lng_column)))
+    ]
+
+
+def _workouts_from_arrow(table):
+    columns = zip(
+        _column_values(table.column("WorkoutId")),
+        _column_datetimes(table.column("StartTimestamp")),
+        _column_datetimes(table.column("EndTimestamp")),
+        _lat_lngs(table, "StartLocationLat", "StartLocationLong"),
+        _lat_lngs(table, "EndLocationLat", "EndLocationLong"),
+        _column_values(table.column("TotalDistance")),
+        _column_values(table.column("TotalSteps")),
+        _column_values(table.column("CaloriesBurned")),
+    )
+    return [Workout(*values) for values in columns]
+
+
+@cached("workouts_table", ttl=CACHE_TTLS["workouts_table"])
+def get_user_workouts_table(user_id):
+    """Fetch user's workout data as a pyarrow Table with the WORKOUT_COLUMNS.
+
+    Args:
+        user_id (str): The ID of the user.
+
+    Returns:
+        pyarrow.Table: One row per workout.
+    """
+    return _fetch_arrow(_query_workouts(user_id))
+
+
+@cached("workouts", ttl=CACHE_TTLS["workouts"])
 def get_user_workouts(user_id) -> list:
     """Fetch user's workout data from BigQuery.
 
@@ -132,81 +603,103 @@ def get_user_workouts(user_id) -> list:
         user_id (str): The ID of the user.
 
     Returns:
-        list: A list of workout records as dictionaries.
+        list of Workout: The user's workouts.
     """
-    client = bigquery.Client(project="sectiona4project")
-    query_job = client.query(
-        QUERY_WORKOUTS,
-        job_config=bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
-        )
-    )
+    query_job = _query_workouts(user_id)
 
-    return [
-        {
-            'workout_id': row.WorkoutId,
-            'start_timestamp': row.StartTimestamp.strftime('%Y-%m-%d %H:%M:%S') if row.StartTimestamp else None,
-            'end_timestamp': row.EndTimestamp.strftime('%Y-%m-%d %H:%M:%S') if row.EndTimestamp else None,
-            'start_lat_lng': (row.StartLocationLat, row.StartLocationLong) if row.StartLocationLat and row.StartLocationLong else None,
-            'end_lat_lng': (row.EndLocationLat, row.EndLocationLong) if row.EndLocationLat and row.EndLocationLong else None,
-            'distance': row.TotalDistance,
-            'steps': row.TotalSteps,
-            'calories_burned': row.CaloriesBurned,
-        }
-        for row in query_job.result()
-    ]
+    if FETCH_ENGINES["workouts"] == "arrow":
+        return _workouts_from_arrow(_fetch_arrow(query_job))
+
+    return [_workout_from_row(row) for row in query_job.result()]
+
+
+def _profile_from_row(row):
+    return Profile(
+        user_id=row.UserId,
+        full_name=row.Name,
+        username=row.Username,
+        profile_image=row.ImageUrl,
+        date_of_birth=row.DateOfBirth
+    )
 
 
 def get_user_profile(user_id):
-    
-    client = bigquery.Client(project="sectiona4project")
-    query_job = client.query(
-        QUERY_PROFILES,
-        job_config=bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
-        )
+    """Fetch a single user's profile, served from the profile cache when possible.
+
+    Args:
+        user_id (str): The ID of the user.
+
+    Returns:
+        Profile: The profile, or None if the user does not exist.
+    """
+    profile = _profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+
+    query_job = _run_query(
+        "profiles", QUERY_PROFILES,
+        [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
     )
 
     results = []
     for row in query_job.result():
-        results.append({
-            'user_id': row.UserId,
-            'full_name': row.Name,
-            'username': row.Username,
-            'profile_image': row.ImageUrl,
-            'date_of_birth': row.DateOfBirth
-        })
+        results.append(_profile_from_row(row))
     
     if not results:
         return None
     else:
+        _profile_cache.set(user_id, results[0])
         return results[0]
-    '''
-    if user_id not in users:
-        raise ValueError(f'User {user_id} not found.')
-    return users[user_id]
-    '''
 
 
+def get_user_profiles(user_ids):
+    """Fetch the profiles of several users with at most one query.
+
+    Profiles already in the profile cache are not queried again, so rendering
+    a feed costs one round trip no matter how many posts it shows.
+
+    Args:
+        user_ids (iterable of str): The IDs of the users. Duplicates are allowed.
+
+    Returns:
+        dict: Profiles keyed by user ID. Users that do not exist are left out.
+    """
+    unique_ids = list(dict.fromkeys(user_id for user_id in user_ids if user_id))
+    profiles = _profile_cache.get_many(unique_ids)
+    missing_ids = [user_id for user_id in unique_ids if user_id not in profiles]
+
+    if missing_ids:
+        query_job = _run_query(
+            "profiles", QUERY_PROFILES_BULK,
+            [bigquery.ArrayQueryParameter("ids", "STRING", missing_ids)]
+        )
+        for row in query_job.result():
+            profile = _profile_from_row(row)
+            _profile_cache.set(profile['user_id'], profile)
+            profiles[profile['user_id']] = profile
+
+    return profiles
+
+
+def _post_from_row(row):
+    return Post(
+        user_id=row.AuthorId,
+        post_id=row.PostId,
+        timestamp=row.Timestamp,
+        content=row.Content,
+        image=row.ImageUrl
+    )
+
+
+@_with_pending("Posts", _post_from_pending, "post_id")
+@cached("posts", ttl=CACHE_TTLS["posts"])
 def get_user_posts(user_id):
     
-    client = bigquery.Client(project="sectiona4project")
-    query_job = client.query(
-        QUERY_POSTS,
-        job_config=bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
-        )
+    query_job = _run_user_query(
+        "Posts", user_id, "posts", QUERY_POSTS,
+        [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
     )
-    return[
-        {
-            'user_id': row.AuthorId,
-            'post_id': row.PostId,
-            'timestamp': row.Timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            'content': row.Content,
-            'image': row.ImageUrl
-        }
-        for row in query_job.result()
-    ]
+    return [_post_from_row(row) for row in query_job.result()]
     
     """
     content = random.choice([
@@ -223,10 +716,18 @@ def get_user_posts(user_id):
     """
 
 
-vertexai.init(project="sectiona4project", location="us-central1")
-model = GenerativeModel(model_name="gemini-1.5-flash-002")
-def get_genai_advice(user_id):
-    """Generates fitness advice based on the user's most recent workout."""
+def get_genai_advice(user_id, stream=False):
+    """Generates fitness advice based on the user's most recent workout.
+
+    Args:
+        user_id (str): The ID of the user.
+        stream (bool): If True, 'content' is an iterator of text chunks that
+            calls the model only when it is read, so the page can paint first
+            and render the advice as it arrives.
+
+    Returns:
+        dict: The advice with 'advice_id', 'timestamp', 'content' and 'image'.
+    """
     if not user_id:
         raise ValueError("User ID must not be empty.")
 
@@ -235,145 +736,197 @@ def get_genai_advice(user_id):
         None
     ]
 
-    client = bigquery.Client(project="sectiona4project")
-
-    query_job = client.query(
-        ADVICE_QUERY,
-        job_config=bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ScalarQueryParameter("user_id", "STRING", user_id)
-            ]
-        )
+    query_job = _run_query(
+        "advice", ADVICE_QUERY,
+        [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
     )
 
     workout_row = next(query_job.result(), None)
 
     if not workout_row:
+        content = "No recent workout data found."
         return {
             "advice_id": str(uuid.uuid4()),
             "timestamp": datetime.utcnow().isoformat(),
-            "content": "No recent workout data found.",
+            "content": iter([content]) if stream else content,
             "image": None
         }
 
-    total_distance = workout_row.TotalDistance
-    total_steps = workout_row.TotalSteps
-    calories_burned = workout_row.CaloriesBurned
-
-    prompt = (
-        f"Based on a workout where the user covered {total_distance} km, "
-        f"took {total_steps} steps, and burned {calories_burned} calories, "
-        f"give a brief fitness advice on recovery, future training, or improvements."
-    )
-
-    response = model.generate_content(prompt)
-    advice_content = response.text if response else "Could not generate advice."
+    inputs = {
+        "distance": workout_row.TotalDistance,
+        "steps": workout_row.TotalSteps,
+        "calories": workout_row.CaloriesBurned,
+    }
+    if stream:
+        advice_content = _generate_stream("advice", ADVICE_PROMPT, "Could not generate advice.", **inputs)
+        timestamp = datetime.utcnow().isoformat()
+    else:
+        advice_content, timestamp = _generate("advice", ADVICE_PROMPT, "Could not generate advice.", **inputs)
 
     return {
         "advice_id": str(uuid.uuid4()),
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": timestamp,
         "content": advice_content,
         "image": random.choice(IMAGES)
     }
 
-def get_genai_nutrition_feedback(user_id):
-    """Generates nutrition feedback based on today's total calorie and macro intake."""
+def get_genai_nutrition_feedback(user_id, stream=False, totals=None):
+    """Generates nutrition feedback based on today's total calorie and macro intake.
+
+    Args:
+        user_id (str): The ID of the user.
+        stream (bool): If True, 'content' is an iterator of text chunks, as in
+            get_genai_advice.
+        totals (dict): Today's 'calories', 'protein', 'fats' and 'carbs' if
+            the caller already has them, e.g. from CaloriePlanner.today_totals;
+            no query is run then. 'calories' is None if there are no meals.
+
+    Returns:
+        dict: The feedback with 'feedback_id', 'timestamp' and 'content'.
+    """
     if not user_id:
         raise ValueError("User ID must not be empty.")
 
-    client = bigquery.Client(project="sectiona4project")
-
-    today = datetime.utcnow().date()
+    if totals is None:
+        today = datetime.utcnow().date()
 
-    query_job = client.query(
-        QUERY_NUTRITION_FEEDBACK,
-        job_config=bigquery.QueryJobConfig(
-            query_parameters=[
+        query_job = _run_query(
+            "nutrition_feedback", QUERY_NUTRITION_FEEDBACK,
+            [
                 bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
                 bigquery.ScalarQueryParameter("meal_date", "DATE", today)
             ]
         )
-    )
 
-    result = next(query_job.result(), None)
+        result = next(query_job.result(), None)
+        totals = {
+            "calories": result.total_calories if result else None,
+            "protein": result.total_protein if result else None,
+            "fats": result.total_fats if result else None,
+            "carbs": result.total_carbs if result else None,
+        }
 
-    if not result or result.total_calories is None:
+    if totals["calories"] is None:
+        content = "No nutrition data found for today. Try logging your meals!"
         return {
             "feedback_id": str(uuid.uuid4()),
             "timestamp": datetime.utcnow().isoformat(),
-            "content": "No nutrition data found for today. Try logging your meals!",
+            "content": iter([content]) if stream else content,
             "image": None
         }
 
-    calories = result.total_calories
-    protein = result.total_protein
-    fats = result.total_fats
-    carbs = result.total_carbs
-
-    prompt = (
-        f"Today, the user consumed:\n"
-        f"- Calories: {calories} kcal\n"
-        f"- Protein: {protein} g\n"
-        f"- Fats: {fats} g\n"
-        f"- Carbohydrates: {carbs} g\n\n"
-        "Provide brief, personalized nutrition feedback. Suggest improvements, assess balance, and be encouraging. "
-        "Compare to average adult dietary recommendations."
-    )
-
-    response = model.generate_content(prompt)
-    feedback_content = response.text if response else "Could not generate feedback."
+    inputs = {name: totals[name] for name in ("calories", "protein", "fats", "carbs")}
+    if stream:
+        feedback_content = _generate_stream(
+            "nutrition_feedback", NUTRITION_PROMPT, "Could not generate feedback.", **inputs
+        )
+        timestamp = datetime.utcnow().isoformat()
+    else:
+        feedback_content, timestamp = _generate(
+            "nutrition_feedback", NUTRITION_PROMPT, "Could not generate feedback.", **inputs
+        )
 
     return {
         "feedback_id": str(uuid.uuid4()),
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": timestamp,
         "content": feedback_content
     }
 
+def _query_calories(user_id):
+    return _run_user_query(
+        "CalorieTracking", user_id, "calories", QUERY_CALORIES,
+        [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)])
+
+
+def _meal_from_row(row):
+    return Meal(
+        meal_id=row.MealId if row.MealId else None,
+        user_id=row.UserId if row.UserId else None,
+        date=row.MealDate if row.MealDate else None,
+        meal_name=row.MealName if row.MealName else None,
+        calories=row.Calories if row.Calories else None,
+        protein=row.Protein if row.Protein else None,
+        carbs=row.Carbs if row.Carbs else None,
+        fat=row.Fats if row.Fats else None,
+        created_at=row.CreatedAt if row.CreatedAt else None
+    )
+
+
+def _meals_from_arrow(table):
+    columns = zip(
+        _or_none(table.column("MealId")),
+        _or_none(table.column("UserId")),
+        _column_datetimes(table.column("MealDate")),
+        _or_none(table.column("MealName")),
+        _or_none(table.column("Calories")),
+        _or_none(table.column("Protein")),
+        _or_none(table.column("Carbs")),
+        _or_none(table.column("Fats")),
+        _column_datetimes(table.column("CreatedAt")),
+    )
+    return [Meal(*values) for values in columns]
+
+
+@cached("calories_table", ttl=CACHE_TTLS["calories_table"])
+def get_user_calorie_tracking_table(user_id):
+    """Fetch user's whole calorie history as a pyarrow Table with the MEAL_COLUMNS."""
+    return _fetch_arrow(_query_calories(user_id))
+
+
+@_with_pending("CalorieTracking", _meal_from_pending, "meal_id")
+@cached("calories", ttl=CACHE_TTLS["calories"])
 def get_user_calorie_tracking(user_id):
-        client = bigquery.Client(project="sectiona4project")
-        query_job = client.query(
-            QUERY_CALORIES,
-            job_config=bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]))
+        query_job = _query_calories(user_id)
+
+        if FETCH_ENGINES["calories"] == "arrow":
+            return _meals_from_arrow(_fetch_arrow(query_job))
 
         return [
-        {
-            'meal_id': row.MealId if row.MealId else None,
-            'user_id': row.UserId if row.UserId else None,
-            'date': row.MealDate.strftime('%Y-%m-%d') if row.MealDate else None,
-            'meal_name': row.MealName if row.MealName else None,
-            'calories': row.Calories if row.Calories else None,
-            'protein': row.Protein if row.Protein else None,
-            'carbs': row.Carbs if row.Carbs else None,
-            'fat': row.Fats if row.Fats else None,
-            'created_at': row.CreatedAt.strftime('%Y-%m-%d %H:%M:%S') if row.CreatedAt else None
-        }
+        _meal_from_row(row)
         for row in query_job.result()
     ]
 
+@_with_pending("CalorieTracking", _meal_from_pending, "meal_id", keep=_is_today)
+@cached("today_calories", ttl=CACHE_TTLS["today_calories"])
 def get_user_today_calorie_tracking(user_id):
-        client = bigquery.Client(project="sectiona4project")
-        query_job = client.query(
-            QUERY_TODAY_CALORIES,
-            job_config=bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]))
+        query_job = _run_query(
+            "today_calories", QUERY_TODAY_CALORIES,
+            [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)])
 
         return [
-        {
-            'meal_id': row.MealId if row.MealId else None,
-            'user_id': row.UserId if row.UserId else None,
-            'date': row.MealDate.strftime('%Y-%m-%d') if row.MealDate else None,
-            'meal_name': row.MealName if row.MealName else None,
-            'calories': row.Calories if row.Calories else None,
-            'protein': row.Protein if row.Protein else None,
-            'carbs': row.Carbs if row.Carbs else None,
-            'fat': row.Fats if row.Fats else None,
-            'created_at': row.CreatedAt.strftime('%Y-%m-%d %H:%M:%S') if row.CreatedAt else None
-        }
+        _meal_from_row(row)
         for row in query_job.result()
     ]
 
         
 
 
+@_with_pending("CalorieTracking", _meal_from_pending, "meal_id", keep=_in_date_range)
+@cached("calories_between", ttl=CACHE_TTLS["calories_between"])
+def get_user_calorie_tracking_between(user_id, start_date, end_date):
+    """Fetches a user's meals eaten between two dates, inclusive.
+
+    Args:
+        user_id (str): The ID of the user.
+        start_date (datetime.date or str): First day, 'YYYY-MM-DD'.
+        end_date (datetime.date or str): Last day, inclusive.
+
+    Returns:
+        list of Meal: The meals, in no particular order, including meals
+        still waiting in the write buffer.
+    """
+    query_job = _run_query(
+        "calories_between", QUERY_CALORIES_BETWEEN,
+        [
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
+            bigquery.ScalarQueryParameter("end_date", "DATE", end_date),
+        ]
+    )
+    return [_meal_from_row(row) for row in query_job.result()]
+
+
+@cached("workouts_by_date", ttl=CACHE_TTLS["workouts_by_date"])
 def get_user_workouts_by_date(user_id: str, start_date: str, end_date: str) -> list:
     """
     Fetch user's workouts between a start and end date (inclusive).
@@ -384,49 +937,152 @@ def get_user_workouts_by_date(user_id: str, start_date: str, end_date: str) -> l
         end_date (str): End date in 'YYYY-MM-DD' format
 
     Returns:
-        list: Filtered workout records
+        list of Workout: Filtered workout records
     """
-    client = bigquery.Client(project="sectiona4project")
-    query_job = client.query(
-        QUERY_WORKOUTS_BY_DATE,
-        job_config=bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
-                bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
-                bigquery.ScalarQueryParameter("end_date", "DATE", end_date),
-            ]
-        )
+    query_job = _run_query(
+        "workouts_by_date", QUERY_WORKOUTS_BY_DATE,
+        [
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
+            bigquery.ScalarQueryParameter("end_date", "DATE", end_date),
+        ]
     )
 
-    return [
-        {
-            'workout_id': row.WorkoutId,
-            'start_timestamp': row.StartTimestamp.isoformat() if row.StartTimestamp else None,
-            'end_timestamp': row.EndTimestamp.isoformat() if row.EndTimestamp else None,
-            'start_lat_lng': (row.StartLocationLat, row.StartLocationLong) if row.StartLocationLat and row.StartLocationLong else None,
-            'end_lat_lng': (row.EndLocationLat, row.EndLocationLong) if row.EndLocationLat and row.EndLocationLong else None,
-            'distance': row.TotalDistance,
-            'steps': row.TotalSteps,
-            'calories_burned': row.CaloriesBurned,
-        }
-        for row in query_job.result()
-    ]
+    return [_workout_from_row(row) for row in query_job.result()]
 
 
-def get_user_weekly_calorie_summary(user_id):
-    """Fetches total calories and macros for each of the last 7 days."""
-    client = bigquery.Client(project="sectiona4project")
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    return value
 
-    today = datetime.utcnow().date()
-    start_date = today - timedelta(days=6)
 
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
+def _period_start(day, granularity):
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "year":
+        return day.replace(month=1, day=1)
+    return day
+
+
+def _fetch_calorie_days(user_id, days):
+    """Queries the nutrition totals of the given days, zero for days without meals."""
+    totals = {day: (0.0, 0.0, 0.0, 0.0, 0) for day in days}
+    query_job = _run_query(
+        "calorie_days", QUERY_CALORIE_DAYS,
+        [
             bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
-            bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
-            bigquery.ScalarQueryParameter("end_date", "DATE", today),
+            bigquery.ArrayQueryParameter("dates", "DATE", days),
         ]
     )
+    for row in query_job.result():
+        totals[_as_date(row.MealDate)] = (
+            row.total_calories or 0.0,
+            row.total_protein or 0.0,
+            row.total_fats or 0.0,
+            row.total_carbs or 0.0,
+            row.meal_count or 0,
+        )
+    return totals
+
+
+def meal_totals(meals):
+    """Adds up meals into (calories, protein, fats, carbs, meal count)."""
+    return (
+        sum(meal.calories or 0.0 for meal in meals),
+        sum(meal.protein or 0.0 for meal in meals),
+        sum(meal.fat or 0.0 for meal in meals),
+        sum(meal.carbs or 0.0 for meal in meals),
+        len(meals),
+    )
+
+
+def summarize_calorie_days(days, totals, granularity="day"):
+    """Adds up per-day nutrition totals into the rows of get_user_calorie_summary.
+
+    Args:
+        days (list of datetime.date): The days of the range, in order.
+        totals (dict): Day to (calories, protein, fats, carbs, meal count).
+        granularity (str): As in get_user_calorie_summary.
+
+    Returns:
+        pandas.DataFrame: As returned by get_user_calorie_summary.
+    """
+    periods = {}
+    for day in days:
+        period = _period_start(day, granularity)
+        current = periods.get(period, (0.0, 0.0, 0.0, 0.0, 0))
+        periods[period] = tuple(a + b for a, b in zip(current, totals[day]))
+
+    return pd.DataFrame(
+        [(period, *values) for period, values in periods.items()],
+        columns=CALORIE_SUMMARY_COLUMNS,
+    )
+
+
+def get_user_calorie_summary(user_id, start_date, end_date, granularity="day"):
+    """Fetches total calories and macros per day, week, month or year of a date range.
 
-    query_job = client.query(WEEKLY_CALORIE_QUERY, job_config=job_config)
-    return query_job.to_dataframe()
\ No newline at end of file
+    Totals are kept per day. Days before today are read from the
+    DailyNutrition rollups and cached, so only days not seen before are
+    queried, in a single query; days without meals count as zero. Today is
+    added up from get_user_today_calorie_tracking, so a warm view runs no
+    query at all. Meals still in the write buffer are counted too.
+
+    Args:
+        user_id (str): The ID of the user.
+        start_date (datetime.date or str): First day of the range, 'YYYY-MM-DD'.
+        end_date (datetime.date or str): Last day of the range, inclusive.
+        granularity (str): "day", "week" (starting Monday), "month" or "year".
+
+    Returns:
+        pandas.DataFrame: One row per period in the range, in order, with
+        columns MealDate (the first day of the period), total_calories,
+        total_protein, total_fats, total_carbs and meal_count. Weeks, months
+        and years cut by the range only count its days.
+    """
+    if granularity not in CALORIE_GRANULARITIES:
+        raise ValueError(f"Granularity must be one of {CALORIE_GRANULARITIES}.")
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    if start_date > end_date:
+        raise ValueError("Start date must not be after end date.")
+
+    today = datetime.utcnow().date()
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    cached_days = _calorie_day_cache.get_many([(user_id, day) for day in days if day < today])
+    totals = {day: value for (_, day), value in cached_days.items()}
+
+    missing = [day for day in days if day not in totals and day != today]
+    if missing:
+        fetched = _fetch_calorie_days(user_id, missing)
+        for day, value in fetched.items():
+            # Later days can still get meals, so they are never cached
+            if day < today:
+                _calorie_day_cache.set((user_id, day), value)
+        totals.update(fetched)
+
+    if start_date <= today <= end_date:
+        # Today's rollup row changes with every meal, so today is added up
+        # from its meals, which get_user_today_calorie_tracking caches
+        totals[today] = meal_totals(get_user_today_calorie_tracking(user_id))
+
+    # Meals still in the write buffer are in neither the rollups nor the
+    # cache; today's are already among today's meals
+    for meal in map(_meal_from_pending, pending_rows("CalorieTracking", user_id)):
+        if meal.date in totals and meal.date != today:
+            totals[meal.date] = tuple(a + b for a, b in zip(totals[meal.date], meal_totals([meal])))
+
+    return summarize_calorie_days(days, totals, granularity)
+
+
+def get_user_weekly_calorie_summary(user_id):
+    """Fetches total calories and macros for each of the last 7 days.
+
+    Not cached itself: its days are, and pending meals must never be.
+    """
+    today = datetime.utcnow().date()
+    return get_user_calorie_summary(user_id, today - timedelta(days=6), today)
@@ -5,14 +5,42 @@
 #
 # You will write these tests in Unit 3.
 #############################################################################
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
 import uuid
+import pyarrow as pa
 from data_fetcher import get_user_sensor_data, get_user_workouts, get_genai_advice, get_user_posts, get_user_profile, get_genai_nutrition_feedback, get_user_weekly_calorie_summary, get_user_today_calorie_tracking
+from data_fetcher import get_user_profiles, clear_caches, invalidate_user_data, set_genai_cache
+from data_fetcher import get_user_calorie_tracking, get_user_calorie_summary, get_user_workouts_table
+from data_fetcher import QUERY_CALORIE_DAYS
+from cache import PersistentCache, cache_stats
+from clients import reset_bigquery_client, reset_genai_model
 
 
-class TestGetUserSensorData(unittest.TestCase):
+class FetcherTestCase(unittest.TestCase):
+    """Resets the process-wide state shared between fetchers around each test."""
+
+    def setUp(self):
+        reset_bigquery_client()
+        reset_genai_model()
+        clear_caches()
+        self.addCleanup(reset_bigquery_client)
+        self.addCleanup(reset_genai_model)
+        self.addCleanup(clear_caches)
+
+        # Keep generated text out of the real on-disk cache
+        cache_dir = tempfile.TemporaryDirectory()
+        self.genai_cache = PersistentCache(os.path.join(cache_dir.name, "genai.sqlite3"))
+        set_genai_cache(self.genai_cache)
+        self.addCleanup(cache_dir.cleanup)
+        self.addCleanup(self.genai_cache.close)
+        self.addCleanup(set_genai_cache, None)
+
+
+class TestGetUserSensorData(FetcherTestCase):
 
     @patch("data_fetcher.bigquery.Client")
     def test_valid_data(self, mock_client_cls):
@@ -52,7 +80,43 @@ class TestGetUserSensorData(unittest.TestCase):
         with self.assertRaises(ValueError):
             get_user_sensor_data("user1", "")
 
-class TestGetUserWorkouts(unittest.TestCase):
+    @patch("data_fetcher.bigquery.Client")
+    def test_columnar_data(self, mock_client_cls):
+        """Test that the columnar shape splits readings into arrays per sensor type."""
+        mock_client = mock_client_cls.return_value
+        mock_client.query.return_value.to_arrow.return_value = pa.table({
+            "Timestamp": pa.array([
+                datetime(2024, 7, 29, 7, 15, 0), datetime(2024, 7, 29, 7, 15, 0), datetime(2024, 7, 29, 7, 15, 1)
+            ], pa.timestamp("us", tz="UTC")),
+            "SensorValue": [120.0, 80.0, 121.5],
+            "SensorName": ["Heart Rate", "Cadence", "Heart Rate"],
+            "SensorUnits": ["bpm", "spm", "bpm"],
+        })
+
+        result = get_user_sensor_data("user1", "workout1", columnar=True)
+
+        self.assertEqual(set(result), {"Heart Rate", "Cadence"})
+        heart_rate = result["Heart Rate"]
+        self.assertEqual(heart_rate.units, "bpm")
+        self.assertEqual(heart_rate.values.tolist(), [120.0, 121.5])
+        start = datetime(2024, 7, 29, 7, 15, 0, tzinfo=timezone.utc).timestamp()
+        self.assertEqual(heart_rate.timestamps.tolist(), [start, start + 1])
+        self.assertEqual(result["Cadence"].values.tolist(), [80.0])
+        mock_client.query.return_value.result.assert_not_called()
+
+    @patch("data_fetcher.bigquery.Client")
+    def test_columnar_no_data(self, mock_client_cls):
+        """Test that an empty result gives no series."""
+        mock_client_cls.return_value.query.return_value.to_arrow.return_value = pa.table({
+            "Timestamp": pa.array([], pa.timestamp("us", tz="UTC")),
+            "SensorValue": pa.array([], pa.float64()),
+            "SensorName": pa.array([], pa.string()),
+            "SensorUnits": pa.array([], pa.string()),
+        })
+
+        self.assertEqual(get_user_sensor_data("user1", "workout2", columnar=True), {})
+
+class TestGetUserWorkouts(FetcherTestCase):
     @patch("data_fetcher.bigquery.Client")  # Mocking BigQuery client globally
     def test_valid_workout_data(self, mock_client):
         """Test fetching valid workout data."""
@@ -128,11 +192,11 @@ class TestGetUserWorkouts(unittest.TestCase):
         self.assertIsNone(result[0]["end_lat_lng"])
 
 
-class TestGetGenAIAdvice(unittest.TestCase):
+class TestGetGenAIAdvice(FetcherTestCase):
 
     @patch("data_fetcher.bigquery.Client")
-    @patch("data_fetcher.model.generate_content")
-    def test_valid_workout_data(self, mock_generate_content, mock_client):
+    @patch("data_fetcher.get_genai_model")
+    def test_valid_workout_data(self, mock_get_model, mock_client):
         """Test generating advice with valid workout data."""
         mock_instance = mock_client.return_value
         mock_query_job = MagicMock()
@@ -144,7 +208,7 @@ class TestGetGenAIAdvice(unittest.TestCase):
         mock_query_job.result.return_value.to_dataframe.return_value = [mock_row]
 
         mock_instance.query.return_value = mock_query_job
-        mock_generate_content.return_value.text = "Keep it up! Stay hydrated."
+        mock_get_model.return_value.generate_content.return_value.text = "Keep it up! Stay hydrated."
 
         result = get_genai_advice("user1")
 
@@ -154,8 +218,8 @@ class TestGetGenAIAdvice(unittest.TestCase):
         self.assertIn("image", result)
 
     @patch("data_fetcher.bigquery.Client")
-    @patch("data_fetcher.model.generate_content")
-    def test_no_workout_data(self, mock_generate_content, mock_client):
+    @patch("data_fetcher.get_genai_model")
+    def test_no_workout_data(self, mock_get_model, mock_client):
         """Test generating advice when no workout data is available."""
         mock_instance = mock_client.return_value
         mock_query_job = MagicMock()
@@ -163,13 +227,57 @@ class TestGetGenAIAdvice(unittest.TestCase):
 
         mock_instance.query.return_value = mock_query_job
 
-        mock_generate_content.return_value.text = "Without knowing the actual numerical values, I can provide general advice."
+        mock_get_model.return_value.generate_content.return_value.text = "Without knowing the actual numerical values, I can provide general advice."
 
         result = get_genai_advice("user_no_data")
 
         self.assertEqual(result["content"], "Without knowing the actual numerical values, I can provide general advice.")
 
-class TestGetPosts(unittest.TestCase):
+    @patch("data_fetcher.bigquery.Client")
+    @patch("data_fetcher.get_genai_model")
+    def test_unchanged_inputs_reuse_cached_advice(self, mock_get_model, mock_client):
+        """Test that identical workout numbers cost one LLM call."""
+        mock_row = MagicMock()
+        mock_row.TotalDistance = 5
+        mock_row.TotalSteps = 8000
+        mock_row.CaloriesBurned = 400
+        mock_client.return_value.query.return_value.result.side_effect = lambda: iter([mock_row])
+        mock_get_model.return_value.generate_content.return_value.text = "Stretch after runs."
+
+        first = get_genai_advice("user1")
+        mock_row.TotalDistance = 5.0
+        second = get_genai_advice("user2")
+        mock_row.TotalDistance = 6.0
+        get_genai_advice("user1")
+
+        self.assertEqual(first["content"], second["content"])
+        self.assertEqual(first["timestamp"], second["timestamp"])
+        self.assertEqual(mock_get_model.return_value.generate_content.call_count, 2)
+
+    @patch("data_fetcher.bigquery.Client")
+    @patch("data_fetcher.get_genai_model")
+    def test_streamed_advice(self, mock_get_model, mock_client):
+        """Test that streamed advice yields chunks and caches the full text."""
+        mock_row = MagicMock()
+        mock_row.TotalDistance = 5.0
+        mock_row.TotalSteps = 8000
+        mock_row.CaloriesBurned = 400
+        mock_client.return_value.query.return_value.result.side_effect = lambda: iter([mock_row])
+        mock_get_model.return_value.generate_content.return_value = iter([
+            MagicMock(text="Keep it "), MagicMock(text="up!")
+        ])
+
+        result = get_genai_advice("user1", stream=True)
+        mock_get_model.return_value.generate_content.assert_not_called()
+        chunks = list(result["content"])
+        cached = get_genai_advice("user1")
+
+        self.assertEqual(chunks, ["Keep it ", "up!"])
+        self.assertEqual(cached["content"], "Keep it up!")
+        mock_get_model.return_value.generate_content.assert_called_once()
+        self.assertTrue(mock_get_model.return_value.generate_content.call_args.kwargs["stream"])
+
+class TestGetPosts(FetcherTestCase):
 
     @patch("data_fetcher.bigquery.Client")  
     def test_valid_post(self, mock_client):
@@ -196,11 +304,88 @@ class TestGetPosts(unittest.TestCase):
         self.assertEqual(result[0]["content"], "This is a test post.")
         self.assertEqual(result[0]["image"], "image_url")
 
-class TestGenAINutritionFeedback(unittest.TestCase):
+class TestReadThroughCache(FetcherTestCase):
+
+    @patch("data_fetcher.bigquery.Client")
+    def test_repeat_reads_are_served_from_memory(self, mock_client):
+        """Test that a rerun does not query unchanged data again."""
+        mock_instance = mock_client.return_value
+        mock_instance.query.return_value.result.return_value = []
+
+        get_user_posts("user1")
+        get_user_posts("user1")
+
+        mock_instance.query.assert_called_once()
+        stats = cache_stats()["posts"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
 
     @patch("data_fetcher.bigquery.Client")
-    @patch("data_fetcher.model.generate_content")
-    def test_valid_nutrition_data(self, mock_generate_content, mock_bigquery_client):
+    def test_write_invalidates_only_that_user_and_table(self, mock_client):
+        """Test that a post insert refetches the author's posts and nothing else."""
+        mock_instance = mock_client.return_value
+        mock_instance.query.return_value.result.return_value = []
+
+        get_user_posts("user1")
+        get_user_posts("user2")
+        get_user_workouts("user1")
+        invalidate_user_data("user1", "Posts")
+        get_user_posts("user1")
+        get_user_posts("user2")
+        get_user_workouts("user1")
+
+        self.assertEqual(mock_instance.query.call_count, 4)
+
+class TestGetUserProfiles(FetcherTestCase):
+
+    @staticmethod
+    def make_profile_row(user_id):
+        mock_row = MagicMock()
+        mock_row.UserId = user_id
+        mock_row.Name = f"Name {user_id}"
+        mock_row.Username = f"{user_id}_handle"
+        mock_row.ImageUrl = f"http://example.com/{user_id}.jpg"
+        mock_row.DateOfBirth = "1990-01-01"
+        return mock_row
+
+    @patch("data_fetcher.bigquery.Client")
+    def test_single_query_for_many_users(self, mock_client):
+        """Test that all authors are resolved in one query."""
+        mock_instance = mock_client.return_value
+        mock_instance.query.return_value.result.return_value = [
+            self.make_profile_row("user1"), self.make_profile_row("user2")
+        ]
+
+        result = get_user_profiles(["user1", "user2", "user1", "user3"])
+
+        mock_instance.query.assert_called_once()
+        self.assertEqual(set(result), {"user1", "user2"})
+        self.assertEqual(result["user2"]["username"], "user2_handle")
+        params = mock_instance.query.call_args.kwargs["job_config"].query_parameters
+        self.assertEqual(params[0].values, ["user1", "user2", "user3"])
+
+    @patch("data_fetcher.bigquery.Client")
+    def test_cached_profiles_are_not_queried(self, mock_client):
+        """Test that a second lookup is served from the profile cache."""
+        mock_instance = mock_client.return_value
+        mock_instance.query.return_value.result.return_value = [self.make_profile_row("user1")]
+
+        get_user_profiles(["user1"])
+        result = get_user_profiles(["user1"])
+        profile = get_user_profile("user1")
+
+        mock_instance.query.assert_called_once()
+        self.assertEqual(result["user1"]["full_name"], "Name user1")
+        self.assertEqual(profile["full_name"], "Name user1")
+
+    def test_empty_ids(self):
+        """Test that no query is issued for an empty list."""
+        self.assertEqual(get_user_profiles([]), {})
+
+class TestGenAINutritionFeedback(FetcherTestCase):
+
+    @patch("data_fetcher.bigquery.Client")
+    @patch("data_fetcher.get_genai_model")
+    def test_valid_nutrition_data(self, mock_get_model, mock_bigquery_client):
         """Test feedback generation with valid nutrition data."""
 
         # Mock result row from BigQuery
@@ -214,7 +399,7 @@ class TestGenAINutritionFeedback(unittest.TestCase):
         mock_query_job.result.return_value = iter([mock_row])
         mock_bigquery_client.return_value.query.return_value = mock_query_job
 
-        mock_generate_content.return_value.text = "Good job! Your macros look balanced overall."
+        mock_get_model.return_value.generate_content.return_value.text = "Good job! Your macros look balanced overall."
 
         feedback = get_genai_nutrition_feedback("user1")
 
@@ -224,8 +409,8 @@ class TestGenAINutritionFeedback(unittest.TestCase):
         self.assertEqual(feedback["content"], "Good job! Your macros look balanced overall.")
 
     @patch("data_fetcher.bigquery.Client")
-    @patch("data_fetcher.model.generate_content")
-    def test_no_nutrition_data(self, mock_generate_content, mock_bigquery_client):
+    @patch("data_fetcher.get_genai_model")
+    def test_no_nutrition_data(self, mock_get_model, mock_bigquery_client):
         """Test when no nutrition data is available for today."""
 
         mock_query_job = MagicMock()
@@ -242,7 +427,7 @@ class TestGenAINutritionFeedback(unittest.TestCase):
         with self.assertRaises(ValueError):
             get_genai_nutrition_feedback("")
 
-class TestGetUserWorkoutsByDate(unittest.TestCase):
+class TestGetUserWorkoutsByDate(FetcherTestCase):
     
     @patch("data_fetcher.bigquery.Client")
     def test_workouts_in_date_range(self, mock_client_cls):
@@ -271,8 +456,10 @@ class TestGetUserWorkoutsByDate(unittest.TestCase):
 
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0]["workout_id"], "workout1")
-        self.assertEqual(result[0]["start_timestamp"], "2024-07-29T07:00:00")
-        self.assertEqual(result[0]["end_timestamp"], "2024-07-29T08:00:00")
+        # Same formats as get_user_workouts, with the datetimes on the attributes
+        self.assertEqual(result[0]["start_timestamp"], "2024-07-29 07:00:00")
+        self.assertEqual(result[0]["end_timestamp"], "2024-07-29 08:00:00")
+        self.assertEqual(result[0].start_timestamp, datetime(2024, 7, 29, 7, 0, 0))
         self.assertEqual(result[0]["start_lat_lng"], (34.0522, -118.2437))
         self.assertEqual(result[0]["end_lat_lng"], (34.0523, -118.2438))
         self.assertEqual(result[0]["distance"], 5.0)
@@ -293,7 +480,7 @@ class TestGetUserWorkoutsByDate(unittest.TestCase):
 
         self.assertEqual(result, [])
 
-class TestGetUserTodayCalorieTracking(unittest.TestCase):
+class TestGetUserTodayCalorieTracking(FetcherTestCase):
 
     @patch("data_fetcher.bigquery.Client")
     def test_no_meal_data(self, mock_bigquery_client):
@@ -404,52 +591,167 @@ class TestGetUserTodayCalorieTracking(unittest.TestCase):
 
 
 
-class TestGetUserWeeklyCalorieSummary(unittest.TestCase):
+class TestGetUserWeeklyCalorieSummary(FetcherTestCase):
     @patch("data_fetcher.bigquery.Client")
     def test_weekly_summary_valid(self, mock_client_cls):
         """Test summary with valid weekly meal data."""
-        mock_client = mock_client_cls.return_value
-        mock_query_job = MagicMock()
-
-        # Mock row return
-        mock_row = MagicMock()
-        mock_row.MealDate = datetime(2025, 4, 20).date()
-        mock_row.total_calories = 1200.0
-        mock_row.total_protein = 45.0
-        mock_row.total_fats = 35.0
-        mock_row.total_carbs = 60.0
-
-        mock_query_job.to_dataframe.return_value = [
-            {
-                "MealDate": mock_row.MealDate,
-                "total_calories": mock_row.total_calories,
-                "total_protein": mock_row.total_protein,
-                "total_fats": mock_row.total_fats,
-                "total_carbs": mock_row.total_carbs
-            }
-        ]
-        mock_client.query.return_value = mock_query_job
+        today = datetime.utcnow().date()
+        mock_row = MagicMock(
+            MealDate=today - timedelta(days=1), total_calories=1200.0, total_protein=45.0,
+            total_fats=35.0, total_carbs=60.0, meal_count=3,
+        )
+        mock_client_cls.return_value.query.return_value.result.return_value = iter([mock_row])
 
         df = get_user_weekly_calorie_summary("user1")
 
-        self.assertEqual(len(df), 1)
-        self.assertEqual(df[0]["MealDate"], datetime(2025, 4, 20).date())
-        self.assertEqual(df[0]["total_calories"], 1200.0)
-        self.assertEqual(df[0]["total_protein"], 45.0)
-        self.assertEqual(df[0]["total_fats"], 35.0)
-        self.assertEqual(df[0]["total_carbs"], 60.0)
+        # One row per day, with days without meals filled with zeros
+        self.assertEqual(len(df), 7)
+        self.assertEqual(df["MealDate"].iloc[0], today - timedelta(days=6))
+        self.assertEqual(df["MealDate"].iloc[-1], today)
+        yesterday = df[df["MealDate"] == today - timedelta(days=1)].iloc[0]
+        self.assertEqual(yesterday["total_calories"], 1200.0)
+        self.assertEqual(yesterday["total_protein"], 45.0)
+        self.assertEqual(yesterday["total_fats"], 35.0)
+        self.assertEqual(yesterday["total_carbs"], 60.0)
+        self.assertEqual(df["total_calories"].sum(), 1200.0)
 
     @patch("data_fetcher.bigquery.Client")
     def test_no_data_returned(self, mock_client_cls):
         """Test when no meals are recorded for the past 7 days."""
+        mock_client_cls.return_value.query.return_value.result.return_value = iter([])
+
+        df = get_user_weekly_calorie_summary("user1")
+
+        self.assertEqual(len(df), 7)
+        self.assertEqual(df["total_calories"].sum(), 0)
+
+
+class TestGetUserCalorieSummary(FetcherTestCase):
+
+    @staticmethod
+    def queried_dates(mock_client):
+        """The days asked of the rollups, per query."""
+        return [
+            next(param.values for param in call.kwargs["job_config"].query_parameters if param.name == "dates")
+            for call in mock_client.query.call_args_list if call.args[0] == QUERY_CALORIE_DAYS
+        ]
+
+    @patch("data_fetcher.bigquery.Client")
+    def test_past_days_are_cached(self, mock_client_cls):
+        """Test that past days are queried once and today comes from its cached meals."""
         mock_client = mock_client_cls.return_value
-        mock_query_job = MagicMock()
+        mock_client.query.return_value.result.side_effect = lambda: iter([])
+        today = datetime.utcnow().date()
 
-        mock_query_job.to_dataframe.return_value = []
-        mock_client.query.return_value = mock_query_job
+        get_user_calorie_summary("user1", today - timedelta(days=29), today)
+        self.assertEqual(mock_client.query.call_count, 2)
+        self.assertEqual(self.queried_dates(mock_client), [[today - timedelta(days=i) for i in range(29, 0, -1)]])
+
+        get_user_calorie_summary("user1", today - timedelta(days=29), today)
+        self.assertEqual(mock_client.query.call_count, 2)
+
+        invalidate_user_data("user1", "CalorieTracking")
+        get_user_calorie_summary("user1", today - timedelta(days=29), today)
+        self.assertEqual(mock_client.query.call_count, 4)
+        self.assertEqual(len(self.queried_dates(mock_client)[-1]), 29)
+
+    @patch("data_fetcher.bigquery.Client")
+    def test_monthly_granularity(self, mock_client_cls):
+        """Test that days are added up per calendar month, zero-filled."""
+        rows = [
+            MagicMock(MealDate=date(2024, 1, 31), total_calories=500.0, total_protein=20.0,
+                      total_fats=10.0, total_carbs=60.0, meal_count=2),
+            MagicMock(MealDate=date(2024, 1, 5), total_calories=300.0, total_protein=None,
+                      total_fats=5.0, total_carbs=40.0, meal_count=1),
+        ]
+        mock_client_cls.return_value.query.return_value.result.return_value = iter(rows)
+
+        df = get_user_calorie_summary("user1", "2024-01-01", "2024-03-31", granularity="month")
+
+        self.assertEqual(list(df["MealDate"]), [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)])
+        self.assertEqual(list(df["total_calories"]), [800.0, 0.0, 0.0])
+        self.assertEqual(list(df["total_protein"]), [20.0, 0.0, 0.0])
+        self.assertEqual(list(df["meal_count"]), [3, 0, 0])
+
+    def test_invalid_arguments(self):
+        """Test an unknown granularity and a reversed range."""
+        with self.assertRaises(ValueError):
+            get_user_calorie_summary("user1", "2024-01-01", "2024-01-31", granularity="hour")
+        with self.assertRaises(ValueError):
+            get_user_calorie_summary("user1", "2024-02-01", "2024-01-31")
+
+
+class TestArrowFetchEngine(FetcherTestCase):
+    """The arrow engine must return exactly what the row engine returns."""
+
+    @staticmethod
+    def make_job(table):
+        from types import SimpleNamespace
+        query_job = MagicMock()
+        query_job.result.side_effect = lambda: iter(SimpleNamespace(**row) for row in table.to_pylist())
+        query_job.to_arrow.return_value = table
+        return query_job
+
+    def assert_engines_match(self, mock_client_cls, name, table, fetch):
+        mock_client_cls.return_value.query.return_value = self.make_job(table)
+        with patch.dict("data_fetcher.FETCH_ENGINES", {name: "rows"}):
+            expected = fetch.uncached("user1")
+        with patch.dict("data_fetcher.FETCH_ENGINES", {name: "arrow"}):
+            actual = fetch.uncached("user1")
+        self.assertEqual(actual, expected)
+        return actual
+
+    @patch("data_fetcher.bigquery.Client")
+    def test_workouts(self, mock_client_cls):
+        """Test that workouts, including missing locations and times, match."""
+        table = pa.table({
+            "WorkoutId": ["workout1", "workout2"],
+            "StartTimestamp": pa.array([datetime(2024, 7, 29, 7, 0, 0, 500), None], pa.timestamp("us", tz="UTC")),
+            "EndTimestamp": pa.array([datetime(2024, 7, 29, 8, 0, 0), None], pa.timestamp("us", tz="UTC")),
+            "StartLocationLat": [34.05, None],
+            "StartLocationLong": [-118.24, None],
+            "EndLocationLat": [34.06, 0.0],
+            "EndLocationLong": [-118.25, 5.0],
+            "TotalDistance": [5.0, 3.0],
+            "TotalSteps": [8000, 4000],
+            "CaloriesBurned": [400, 200],
+        })
+
+        workouts = self.assert_engines_match(mock_client_cls, "workouts", table, get_user_workouts)
+
+        self.assertEqual(workouts[0]["start_timestamp"], "2024-07-29 07:00:00")
+        self.assertIsNone(workouts[1]["end_lat_lng"])
+
+    @patch("data_fetcher.bigquery.Client")
+    def test_calorie_tracking(self, mock_client_cls):
+        """Test that meals, including zero and missing values, match."""
+        table = pa.table({
+            "MealId": ["meal1", "meal2"],
+            "UserId": ["user1", "user1"],
+            "MealDate": pa.array([datetime(2025, 4, 20).date(), None], pa.date32()),
+            "MealName": ["Oatmeal", None],
+            "Calories": [300, 0],
+            "Protein": [10.0, None],
+            "Carbs": [50.0, 0.0],
+            "Fats": [5.0, 1.0],
+            "CreatedAt": pa.array([datetime(2025, 4, 20, 8, 30, 0), None], pa.timestamp("us", tz="UTC")),
+        })
+
+        meals = self.assert_engines_match(mock_client_cls, "calories", table, get_user_calorie_tracking)
+
+        self.assertEqual(meals[0]["date"], "2025-04-20")
+        self.assertIsNone(meals[1]["calories"])
+
+    @patch("data_fetcher.bigquery.Client")
+    def test_table_fetcher_is_cached(self, mock_client_cls):
+        """Test that the table fetcher returns the Arrow result and caches it."""
+        table = pa.table({"WorkoutId": ["workout1"]})
+        mock_client_cls.return_value.query.return_value.to_arrow.return_value = table
+
+        self.assertIs(get_user_workouts_table("user1"), table)
+        self.assertIs(get_user_workouts_table("user1"), table)
+        mock_client_cls.return_value.query.assert_called_once()
 
-        df = get_user_weekly_calorie_summary("user1")
-        self.assertEqual(df, [])
 
 if __name__ == "__main__":
     unittest.main()
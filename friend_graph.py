@@ -0,0 +1,167 @@
+#############################################################################
+# friend_graph.py
+#
+# This file contains the in-process cache of the Friends table.
+#
+# Friendships change rarely, but the community page used to scan Friends on
+# every load. FriendGraph keeps each user's friends as a sorted tuple of
+# interned IDs, built from both directions of the table and deduplicated,
+# so "friends of X" and "mutual friends of X and Y" are answered from memory
+# in O(degree). Tuples take about a tenth of the memory of sets.
+#
+# Each user's entry expires FRIEND_GRAPH_TTL seconds after it was loaded.
+# Only expired or unseen users are fetched again, all of a call's users in
+# one query, and friendships the app writes itself can be applied to the
+# entries in place with add_friendship and remove_friendship.
+#############################################################################
+
+import sys
+import threading
+import time
+
+from google.cloud import bigquery
+
+from queries import run_within_budget
+from storage import get_storage_backend
+
+# Seconds a user's friend list is used before it is fetched again.
+FRIEND_GRAPH_TTL = 600
+# Most users whose friends are fetched in one query.
+FRIEND_GRAPH_BATCH_SIZE = 10000
+
+FRIENDSHIPS_QUERY = """
+    SELECT UserId1, UserId2
+    FROM `sectiona4project.ISE.Friends`
+    WHERE UserId1 IN UNNEST(@user_ids) OR UserId2 IN UNNEST(@user_ids)
+"""
+
+_EMPTY = ()
+
+
+def query_friendships(user_ids):
+    """Returns every (UserId1, UserId2) row of Friends involving one of user_ids."""
+    rows = run_within_budget(get_storage_backend(), "friendships", FRIENDSHIPS_QUERY, [
+        bigquery.ArrayQueryParameter("user_ids", "STRING", list(user_ids))
+    ]).result()
+    return [(row.UserId1, row.UserId2) for row in rows]
+
+
+class FriendGraph:
+    """A symmetric friend graph, loaded a user at a time and kept in memory.
+
+    Args:
+        ttl (float): Seconds a user's friends stay valid after loading.
+        loader (callable): Takes a list of user IDs and returns every
+            (user, user) friendship involving them. Defaults to querying the
+            Friends table.
+        clock (callable): Returns the current time in seconds.
+    """
+
+    def __init__(self, ttl=FRIEND_GRAPH_TTL, loader=None, clock=time.monotonic):
+        self.ttl = ttl
+        self._loader = loader or query_friendships
+        self._clock = clock
+        self._friends = {}
+        self._expires_at = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def _load(self, user_ids):
+        """Fetches the friends of user_ids, in batches, and stores them."""
+        for start in range(0, len(user_ids), FRIEND_GRAPH_BATCH_SIZE):
+            batch = user_ids[start:start + FRIEND_GRAPH_BATCH_SIZE]
+            wanted = set(batch)
+            adjacency = {user_id: set() for user_id in batch}
+            for first, second in self._loader(batch):
+                if first == second:
+                    continue
+                # Either column can hold the user, and a pair can be stored twice
+                if first in wanted:
+                    adjacency[first].add(sys.intern(second))
+                if second in wanted:
+                    adjacency[second].add(sys.intern(first))
+            expires_at = self._clock() + self.ttl
+            with self._lock:
+                self.loads += 1
+                for user_id, friends in adjacency.items():
+                    self._friends[user_id] = tuple(sorted(friends)) if friends else _EMPTY
+                    self._expires_at[user_id] = expires_at
+
+    def _ensure(self, user_ids):
+        user_ids = list(dict.fromkeys(user_ids))
+        now = self._clock()
+        with self._lock:
+            stale = [user_id for user_id in user_ids if self._expires_at.get(user_id, now) <= now]
+            self.misses += len(stale)
+            self.hits += len(user_ids) - len(stale)
+        if stale:
+            self._load(stale)
+
+    def preload(self, user_ids):
+        """Loads the friends of every user in user_ids that is not loaded yet."""
+        self._ensure(list(user_ids))
+
+    def friends_of(self, user_id):
+        """Returns the sorted tuple of user_id's friends."""
+        self._ensure([user_id])
+        return self._friends.get(user_id, _EMPTY)
+
+    def mutual_friends(self, user_id, other_id):
+        """Returns the sorted tuple of users who are friends of both users."""
+        self._ensure([user_id, other_id])
+        smaller, larger = sorted((self._friends.get(user_id, _EMPTY), self._friends.get(other_id, _EMPTY)), key=len)
+        members = set(smaller)
+        # larger is sorted, so the result is too
+        return tuple(friend for friend in larger if friend in members)
+
+    def add_friendship(self, user_id, other_id):
+        """Records a new friendship in the entries already loaded."""
+        self._update(user_id, other_id, add=True)
+        self._update(other_id, user_id, add=True)
+
+    def remove_friendship(self, user_id, other_id):
+        """Drops a friendship from the entries already loaded."""
+        self._update(user_id, other_id, add=False)
+        self._update(other_id, user_id, add=False)
+
+    def _update(self, user_id, friend_id, add):
+        with self._lock:
+            friends = self._friends.get(user_id)
+            if friends is not None:
+                updated = set(friends)
+                if add:
+                    updated.add(sys.intern(friend_id))
+                else:
+                    updated.discard(friend_id)
+                self._friends[user_id] = tuple(sorted(updated))
+
+    def invalidate(self, user_id=None):
+        """Forgets user_id's friends, or everyone's, so they are fetched again."""
+        with self._lock:
+            if user_id is None:
+                self._friends.clear()
+                self._expires_at.clear()
+            else:
+                self._friends.pop(user_id, None)
+                self._expires_at.pop(user_id, None)
+
+    def stats(self):
+        """Returns the number of users loaded and the lookup counters."""
+        with self._lock:
+            return {
+                "users": len(self._friends),
+                "edges": sum(len(friends) for friends in self._friends.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+            }
+
+
+_graph = FriendGraph()
+
+
+def get_friend_graph():
+    """Returns the friend graph shared by every session in this process."""
+    return _graph
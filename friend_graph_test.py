@@ -0,0 +1,84 @@
+#############################################################################
+# friend_graph_test.py
+#
+# This file contains tests for friend_graph.py.
+#############################################################################
+import unittest
+from unittest.mock import MagicMock
+
+from friend_graph import FriendGraph
+
+FRIENDSHIPS = [
+    ("alice", "bob"),
+    ("carol", "alice"),
+    ("bob", "alice"),  # stored in both directions
+    ("alice", "dave"),
+    ("bob", "carol"),
+    ("bob", "dave"),
+    ("erin", "erin"),
+]
+
+
+def load_friendships(user_ids):
+    return [pair for pair in FRIENDSHIPS if pair[0] in user_ids or pair[1] in user_ids]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFriendGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.loader = MagicMock(side_effect=load_friendships)
+        self.graph = FriendGraph(ttl=60, loader=self.loader, clock=self.clock)
+
+    def test_friends_are_symmetric_and_deduplicated(self):
+        """Test that friendships count from either column, once each."""
+        self.assertEqual(self.graph.friends_of("alice"), ("bob", "carol", "dave"))
+        self.assertEqual(self.graph.friends_of("carol"), ("alice", "bob"))
+        self.assertEqual(self.graph.friends_of("erin"), ())
+        self.assertEqual(self.graph.friends_of("nobody"), ())
+
+    def test_mutual_friends_loads_both_users_at_once(self):
+        """Test that mutual friends need one load for two unseen users."""
+        self.assertEqual(self.graph.mutual_friends("alice", "bob"), ("carol", "dave"))
+        self.loader.assert_called_once()
+        self.assertCountEqual(self.loader.call_args.args[0], ["alice", "bob"])
+
+    def test_only_expired_users_are_reloaded(self):
+        """Test that lookups are served from memory until a user's entry expires."""
+        self.graph.friends_of("alice")
+        self.clock.now = 30
+        self.graph.friends_of("bob")
+        self.graph.mutual_friends("alice", "bob")
+        self.assertEqual(self.loader.call_count, 2)
+
+        self.clock.now = 61
+        self.graph.mutual_friends("alice", "bob")
+        self.assertEqual(self.loader.call_count, 3)
+        self.assertEqual(self.loader.call_args.args[0], ["alice"])
+
+        stats = self.graph.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["loads"]), (3, 3, 3))
+
+    def test_local_updates(self):
+        """Test that friendships written by the app update loaded entries in place."""
+        self.graph.preload(["alice", "erin"])
+
+        self.graph.add_friendship("erin", "alice")
+        self.assertEqual(self.graph.friends_of("erin"), ("alice",))
+        self.assertIn("erin", self.graph.friends_of("alice"))
+
+        self.graph.remove_friendship("alice", "bob")
+        self.assertNotIn("bob", self.graph.friends_of("alice"))
+        self.loader.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
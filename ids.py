@@ -0,0 +1,74 @@
+#############################################################################
+# ids.py
+#
+# This file contains the allocator for the IDs of rows the app inserts.
+#
+# IDs are made without reading the table: each one is the table's prefix
+# followed by a 26-character ULID, a 48-bit millisecond timestamp and 80
+# random bits in Crockford's base 32. IDs with the same prefix sort in the
+# order they were made, so an ID also works as a pagination cursor, and
+# IDs made in the same millisecond by this process still come out in order.
+#############################################################################
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# Crockford's base 32, which sorts in the same order as the values it encodes.
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ID_LENGTH = 26
+
+_RANDOM_BITS = 80
+_lock = threading.Lock()
+_last_millis = -1
+_last_random = 0
+
+
+def _encode(value):
+    chars = []
+    for _ in range(ID_LENGTH):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def new_id(prefix="", clock=time.time):
+    """Returns a new unique ID that sorts after every earlier one.
+
+    Args:
+        prefix (str): Put in front of the ID, e.g. "post" or "meal".
+        clock (callable): Returns the current time in seconds.
+
+    Returns:
+        str: prefix followed by 26 characters.
+    """
+    global _last_millis, _last_random
+    millis = int(clock() * 1000)
+    with _lock:
+        if millis <= _last_millis:
+            # Same millisecond, or the clock went back: count up from the last ID
+            millis = _last_millis
+            random = _last_random + 1
+            if random >> _RANDOM_BITS:
+                millis += 1
+                random = int.from_bytes(os.urandom(10), "big")
+        else:
+            random = int.from_bytes(os.urandom(10), "big")
+        _last_millis, _last_random = millis, random
+    return prefix + _encode(millis << _RANDOM_BITS | random)
+
+
+def id_timestamp(value, prefix=""):
+    """Returns the UTC time an ID made by new_id was made at, to the millisecond.
+
+    Raises:
+        ValueError: If value is not prefix followed by an ID from new_id.
+    """
+    encoded = value[len(prefix):] if value.startswith(prefix) else ""
+    if len(encoded) != ID_LENGTH or any(char not in ALPHABET for char in encoded):
+        raise ValueError(f"Not an ID with prefix {prefix!r}: {value!r}")
+    number = 0
+    for char in encoded:
+        number = number * 32 + ALPHABET.index(char)
+    return datetime.fromtimestamp((number >> _RANDOM_BITS) / 1000, tz=timezone.utc)
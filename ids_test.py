@@ -0,0 +1,55 @@
+#############################################################################
+# ids_test.py
+#
+# This file contains tests for ids.py.
+#############################################################################
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from ids import ID_LENGTH, id_timestamp, new_id
+
+
+class TestNewId(unittest.TestCase):
+
+    def setUp(self):
+        # Forget IDs made by earlier tests with other clocks
+        last = patch("ids._last_millis", -1)
+        last.start()
+        self.addCleanup(last.stop)
+
+    def test_format_and_timestamp(self):
+        """Test that an ID is the prefix plus 26 characters encoding its time."""
+        made_at = datetime(2025, 4, 20, 12, 30, 15, 123000, tzinfo=timezone.utc)
+
+        value = new_id("post", clock=made_at.timestamp)
+
+        self.assertTrue(value.startswith("post"))
+        self.assertEqual(len(value), len("post") + ID_LENGTH)
+        self.assertEqual(id_timestamp(value, prefix="post"), made_at)
+
+    def test_ids_sort_in_creation_order(self):
+        """Test that IDs sort by time, including many made in the same millisecond."""
+        earlier = new_id("meal", clock=lambda: 1_700_000_000.0)
+        same_millisecond = [new_id("meal", clock=lambda: 1_800_000_000.0) for _ in range(1000)]
+
+        ids = [earlier] + same_millisecond
+        self.assertEqual(sorted(ids), ids)
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_clock_going_back_keeps_order(self):
+        """Test that an ID made after the clock stepped back still sorts last."""
+        first = new_id(clock=lambda: 1_900_000_000.0)
+        second = new_id(clock=lambda: 1_899_999_999.0)
+
+        self.assertGreater(second, first)
+
+    def test_invalid_ids(self):
+        """Test that strings not made by new_id are rejected."""
+        for value in ["post5", "post" + "I" * ID_LENGTH, "meal" + new_id()]:
+            with self.assertRaises(ValueError):
+                id_timestamp(value, prefix="post")
+
+
+if __name__ == "__main__":
+    unittest.main()
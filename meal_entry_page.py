@@ -1,15 +1,25 @@
 import streamlit as st
-from google.cloud import bigquery
-from data_fetcher import get_user_today_calorie_tracking, get_genai_nutrition_feedback, get_user_weekly_calorie_summary
+from data_fetcher import get_genai_nutrition_feedback
+from calorie_planner import CaloriePlanner
 import streamlit as st
-from modules import display_macro_calorie_chart, display_weekly_calorie_summary
+from modules import display_macro_calorie_chart, display_weekly_calorie_summary, display_streamed_text, display_query_debug_panel, display_failed_writes
+import nutrition_rollups  # keeps the daily rollups up to date as meals are written
+from write_buffer import get_write_buffer
+from ids import new_id
 import datetime
 import time
 
 userId = 'user1'
 def display_meal_entry_page(userId):
     st.header("Calorie/Macro Tracking")
-    meal_list = get_user_today_calorie_tracking(userId)
+    display_failed_writes(userId, "CalorieTracking",
+                          lambda row: f"Your meal \"{row.get('MealName')}\" on {row.get('MealDate')}")
+    # Today's meals, today's totals and the weekly summary come from one read of the week's meals
+    planner = CaloriePlanner(userId)
+    today_meals = planner.today_meals()
+    today_totals = planner.today_totals()
+    weekly_summary = planner.weekly_summary()
+    meal_list = today_meals.result()
 
     @st.dialog("Meal Entry")
     def show_meal_entry():
@@ -25,7 +35,7 @@ def display_meal_entry_page(userId):
         if submitted:
                 print("submit button clicked")   
                 new_row = {
-                    "MealId": "meal" + str(len(meal_list) + 1),
+                    "MealId": new_id("meal"),
                     "UserId": userId,
                     "MealName": mealname,
                     "Calories": calories,
@@ -36,23 +46,10 @@ def display_meal_entry_page(userId):
                     "CreatedAt": datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
                 }
 
-                try:
-                    client = bigquery.Client(project="sectiona4project")
-                    table_ref = client.dataset("ISE").table("CalorieTracking")
-
-                    rows_to_insert = [new_row]
-                    errors = client.insert_rows_json(table_ref, rows_to_insert)
-
-                    if errors == []:
-                        st.write("Entry successful")
-                        st.rerun()
-                        print("Successfully added row to sectiona4project.ISE.CalorieTracking")
-                    else:
-                        st.write("Entry failed")
-                        print(f"Errors encountered while inserting rows: {errors}")
-
-                except Exception as e:
-                    print(f"An error occurred: {e}")
+                # Written in the background; the page already shows the pending meal
+                get_write_buffer("CalorieTracking").add(new_row)
+                st.write("Entry successful")
+                st.rerun()
     
 
     if st.button("Meal Entry"):
@@ -66,14 +63,15 @@ def display_meal_entry_page(userId):
     with st.container():
         if st.button("💡 Generate Today's Feedback"):
             with st.spinner("Analyzing your meal data and generating feedback..."):
-                feedback = get_genai_nutrition_feedback(userId)
+                feedback = get_genai_nutrition_feedback(userId, stream=True, totals=today_totals.result())
 
             with st.expander("📋 View Nutrition Feedback", expanded=True):
-                st.write(feedback["content"])
+                display_streamed_text(feedback["content"])
 
 
     st.markdown("## 📅 Weekly Meal Summary")
-    weekly_df = get_user_weekly_calorie_summary(userId)
+    weekly_df = weekly_summary.result()
     display_weekly_calorie_summary(weekly_df)
 if __name__ == '__main__':
-    display_meal_entry_page(userId)
\ No newline at end of file
+    display_meal_entry_page(userId)
+    display_query_debug_panel()
\ No newline at end of file
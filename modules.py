@@ -11,6 +11,17 @@ from internals import create_component
 import streamlit as st
 import pandas as pd
 import altair as alt
+from workout_stats import summarize_workouts
+from cache import cache_stats
+from telemetry import QUERY_DEBUG_PANEL, get_telemetry
+from write_buffer import take_failed_rows
+
+# A card costs Streamlit six to eight elements, so long histories would send
+# thousands of them on every rerun. Cards are shown WORKOUT_PAGE_SIZE at a
+# time behind a "Load more" button, and histories longer than
+# WORKOUT_TABLE_THRESHOLD are shown as one scrollable table instead.
+WORKOUT_PAGE_SIZE = 9
+WORKOUT_TABLE_THRESHOLD = 45
 # This one has been written for you as an example. You may change it as wanted.
 def display_my_custom_component(value):
     """Displays a 'my custom component' which showcases an example of how custom
@@ -36,7 +47,8 @@ def display_post(username, user_image, timestamp, content, post_image):
         # User Info Section
         col1, col2 = st.columns([1, 8])
         with col1:
-            st.image(user_image, width=50)
+            if user_image:
+                st.image(user_image, width=50)
         with col2:
             st.markdown(f"**{username}**")
             st.caption(timestamp)
@@ -50,6 +62,37 @@ def display_post(username, user_image, timestamp, content, post_image):
     
         st.markdown("---")
 
+def _shown_workout_count(key, total):
+    """Returns how many workout cards the list named key shows this rerun."""
+    if total <= WORKOUT_PAGE_SIZE:
+        return total
+    return min(st.session_state.get(key, WORKOUT_PAGE_SIZE), total)
+
+
+def _display_load_more(key, shown, total):
+    """Shows a button that reveals the next page of the list named key."""
+    if shown >= total:
+        return
+
+    def load_more():
+        st.session_state[key] = shown + WORKOUT_PAGE_SIZE
+
+    st.caption(f"Showing {shown} of {total} workouts")
+    st.button("Load more", key=f"{key}_load_more", on_click=load_more)
+
+
+def display_workouts_table(workouts_list):
+    """Displays workouts as a single table, however many there are."""
+    columns = ['workout_id', 'start_timestamp', 'end_timestamp', 'distance', 'steps',
+               'calories_burned', 'start_lat_lng', 'end_lat_lng']
+    rows = [{column: workout.get(column) for column in columns} for workout in workouts_list]
+    df = pd.DataFrame(rows, columns=columns)
+    # Locations are tuples, which the table cannot show as they are
+    for column in ('start_lat_lng', 'end_lat_lng'):
+        df[column] = df[column].map(lambda value: None if value is None else str(value))
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+
 # Function written in part with Gemini
 # Prompt: what should display_activity_summary return
 # https://docs.google.com/document/d/1Q6FG2HOza7nRNnsZdfhs8krbtd_FY57Byn4MoN9fSMk/edit?usp=sharing
@@ -63,58 +106,45 @@ def display_activity_summary(workouts_list):
             - 'dihonstance': float (km)
             - 'steps': int
             - 'calories_burned': int
-    Return: A dictionary of processed data.
+    Return: A dictionary of processed data, as computed by summarize_workouts.
     """
 
     st.subheader("Your Workout Summary")
 
-    if not workouts_list:
+    summary = summarize_workouts(workouts_list)
+    if not summary:
         st.write("No workouts found.")
         return {}
-        
 
-    workout_details = []
-    for workout in workouts_list:
-        workout_details.append({
-            "workout_id": workout.get('workout_id', 'N/A'),
-            "start_timestamp": workout.get('start_timestamp', 'N/A'),
-            "end_timestamp": workout.get('end_timestamp', 'N/A'),
-            "distance": workout.get('distance', 0),
-            "steps": workout.get('steps', 0),
-            "calories_burned": workout.get('calories_burned', 0)
-        })
-
-    for workout in workouts_list:
-        if "distance" not in workout or "steps" not in workout or "calories_burned" not in workout:
-            st.write("Cannot display chart data with missing values.")
-
-    total_distance = sum(workout['distance'] for workout in workouts_list)
-    total_steps = sum(workout['steps'] for workout in workouts_list)
-    total_calories = sum(workout['calories_burned'] for workout in workouts_list)
-
-    workout_names = [f"Workout {i+1}" for i in range(len(workouts_list))]
-    distances = [workout['distance'] for workout in workouts_list]
-    steps = [workout['steps'] for workout in workouts_list]
-
-    for workout in workout_details:
-        with st.container():
-            st.markdown(f"**Workout ID:** {workout['workout_id']}")
-            st.write(f"📅 **Start Time:** {workout['start_timestamp']}")
-            st.write(f"🏁 **End Time:** {workout['end_timestamp']}")
-            st.write(f"📏 **Distance:** {workout['distance']} km")
-            st.write(f"🚶 **Steps:** {workout['steps']}")
-            st.write(f"🔥 **Calories Burned:** {workout['calories_burned']} kcal")
-            st.divider()
+    if summary['has_missing']:
+        st.write("Cannot display chart data with missing values.")
+
+    total = len(workouts_list)
+    if total > WORKOUT_TABLE_THRESHOLD:
+        display_workouts_table(workouts_list)
+    else:
+        shown = _shown_workout_count("activity_summary_shown", total)
+        for workout in workouts_list[:shown]:
+            with st.container():
+                st.markdown(f"**Workout ID:** {workout.get('workout_id', 'N/A')}")
+                st.write(f"📅 **Start Time:** {workout.get('start_timestamp', 'N/A')}")
+                st.write(f"🏁 **End Time:** {workout.get('end_timestamp', 'N/A')}")
+                st.write(f"📏 **Distance:** {workout.get('distance', 0)} km")
+                st.write(f"🚶 **Steps:** {workout.get('steps', 0)}")
+                st.write(f"🔥 **Calories Burned:** {workout.get('calories_burned', 0)} kcal")
+                st.divider()
+        _display_load_more("activity_summary_shown", shown, total)
 
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Distance", f"{total_distance:.1f} km")
-    col2.metric("Total Steps", f"{total_steps:,}")
-    col3.metric("Calories Burned", f"{total_calories} kcal")
+    col1.metric("Total Distance", f"{summary['total_distance']:.1f} km")
+    col2.metric("Total Steps", f"{summary['total_steps']:,}")
+    col3.metric("Calories Burned", f"{summary['total_calories']} kcal")
 
-    st.line_chart({"Distance (km)": distances}, use_container_width=True)
-    st.bar_chart({"Steps": steps}, use_container_width=True)
+    st.line_chart({"Distance (km)": summary['distances']}, use_container_width=True)
+    st.bar_chart({"Steps": summary['steps']}, use_container_width=True)
 
     st.write("Stay consistent and keep pushing yourself! 💪")
+    return summary
 
 def display_recent_workouts(workouts_list):
     """
@@ -131,11 +161,15 @@ def display_recent_workouts(workouts_list):
         return
     st.subheader('Recent Workouts')
 
-  
+    total = len(workouts_list)
+    if total > WORKOUT_TABLE_THRESHOLD:
+        display_workouts_table(workouts_list)
+        return
+    shown = _shown_workout_count("recent_workouts_shown", total)
 
     cols = st.columns(3)
 
-    for i, workout in enumerate(workouts_list):
+    for i, workout in enumerate(workouts_list[:shown]):
         # Select the appropriate column for this workout
         col = cols[i % 3]  # Cycle through columns
 
@@ -153,6 +187,8 @@ def display_recent_workouts(workouts_list):
                 st.write(f"Calories Burned: {workout['calories_burned']}")
                 st.write(f"Start Location: {workout['start_lat_lng']}")
                 st.write(f"End Location: {workout['end_lat_lng']}")
+
+    _display_load_more("recent_workouts_shown", shown, total)
        
 
 def display_genai_advice(timestamp, content, image):
@@ -167,7 +203,56 @@ def display_genai_advice(timestamp, content, image):
         # print(f"Rendering image: {image}") 
         st.image(image)
 
-    
+
+
+def display_streamed_text(chunks, placeholder=None, prefix=""):
+    """Writes text into a placeholder chunk by chunk as it arrives.
+
+    Args:
+        chunks (iterable of str): The text, e.g. a streamed GenAI response.
+        placeholder: A Streamlit element to render into; a new st.empty() if None.
+        prefix (str): Written before the text, e.g. "content: ".
+
+    Returns:
+        str: The complete text.
+    """
+    if placeholder is None:
+        placeholder = st.empty()
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        placeholder.write(f"{prefix}{text}")
+    if not text:
+        placeholder.write(prefix)
+    return text
+
+
+def display_genai_advice_stream(timestamp, content_chunks, image, container=None):
+    """Displays GenAI advice like display_genai_advice, rendering the content as it streams in.
+
+    Args:
+        timestamp (str): When the advice was generated.
+        content_chunks (iterable of str): The advice text in chunks.
+        image (str): URL of an image to show, or None.
+        container: A Streamlit container reserved earlier in the page, so the
+            rest of the page can paint before the advice arrives. Defaults to
+            the current position.
+
+    Returns:
+        str: The complete advice text.
+    """
+    if container is None:
+        container = st.container()
+    with container:
+        st.header("Gen AI ADVICE")
+        st.write(f"timestamp : {timestamp}")
+        content = display_streamed_text(content_chunks, prefix="content: ")
+        if not image:
+            st.write("No image to be displayed")
+        else:
+            st.image(image)
+    return content
+
 
 def display_filtered_workouts(filtered_workouts):
     """
@@ -190,9 +275,15 @@ def display_filtered_workouts(filtered_workouts):
 
     st.subheader("Filtered Workouts")
 
+    total = len(filtered_workouts)
+    if total > WORKOUT_TABLE_THRESHOLD:
+        display_workouts_table(filtered_workouts)
+        return
+    shown = _shown_workout_count("filtered_workouts_shown", total)
+
     cols = st.columns(3)  # Creates a 3-column layout
 
-    for i, workout in enumerate(filtered_workouts):
+    for i, workout in enumerate(filtered_workouts[:shown]):
         col = cols[i % 3]  # Cycle through the 3 columns: 0, 1, 2
 
         with col:
@@ -207,7 +298,7 @@ def display_filtered_workouts(filtered_workouts):
                 st.write(f"📍 **Start Location:** {workout.get('start_lat_lng', 'N/A')}")
                 st.write(f"📍 **End Location:** {workout.get('end_lat_lng', 'N/A')}")
 
-    pass
+    _display_load_more("filtered_workouts_shown", shown, total)
 
 #Used Gemini to help me figure out a way to display data in a table and have the totals of the macros in the last column
 def display_macro_calorie_chart(meal_list):
@@ -239,12 +330,16 @@ def display_macro_calorie_chart(meal_list):
 
 def display_weekly_calorie_summary(df):
     """Displays a bar chart of daily nutrient totals for the week."""
-    if df.empty:
+    # The summary has a row for every day, so a week without meals is all zeros
+    totals = ["total_calories", "total_protein", "total_fats", "total_carbs"]
+    if df.empty or not df[totals].fillna(0).any(axis=None):
         st.info("No meal data available for the past week.")
         return
 
     st.subheader("📊 Weekly Calorie & Macro Summary")
 
+    # The frame may be shared through the fetcher's cache, so change a copy
+    df = df.drop(columns=["meal_count"], errors="ignore")
     df["MealDate"] = df["MealDate"].astype(str)
 
     st.dataframe(df)
@@ -268,3 +363,45 @@ def display_weekly_calorie_summary(df):
     ).properties(height=400).configure_axisX(labelAngle=0)
 
     st.altair_chart(chart, use_container_width=True)
+
+
+def display_failed_writes(user_id, table, describe):
+    """Warns the user about their rows the write buffer gave up on.
+
+    The page said the change was saved when it was queued, so each failed
+    row is reported once, on the next rerun, and then forgotten.
+
+    user_id: the user whose rows to report
+    table: "Posts" or "CalorieTracking"
+    describe: turns a failed row into the words shown for it
+    """
+    for row in take_failed_rows(table, user_id):
+        st.warning(f"{describe(row)} could not be saved. Please try again.")
+
+
+def display_query_debug_panel():
+    """Displays the storage calls the app has made, for debugging slow pages.
+
+    Only shown when QUERY_DEBUG_PANEL=1 or the URL has ?debug=1.
+    """
+    if not QUERY_DEBUG_PANEL and st.query_params.get("debug") != "1":
+        return
+    telemetry = get_telemetry()
+    with st.expander("Query debug panel"):
+        summary = telemetry.summary()
+        if not summary:
+            st.write("No queries recorded yet.")
+            return
+        st.subheader("Latency by caller (seconds)")
+        st.dataframe(pd.DataFrame(summary))
+
+        st.subheader("Recent queries")
+        recent = pd.DataFrame([event._asdict() for event in reversed(telemetry.recent())])
+        recent["started_at"] = pd.to_datetime(recent["started_at"], unit="s")
+        st.dataframe(recent)
+
+        st.subheader("Caches")
+        st.dataframe(pd.DataFrame.from_dict(cache_stats(), orient="index"))
+
+        st.download_button("Download Prometheus metrics", telemetry.prometheus(),
+                           file_name="ise_metrics.prom", mime="text/plain")
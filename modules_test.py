@@ -13,8 +13,13 @@ from unittest.mock import patch, Mock, MagicMock, call
 from modules import display_post, display_activity_summary, display_genai_advice, display_recent_workouts
 from unittest.mock import patch, Mock, call
 from modules import display_post, display_activity_summary, display_genai_advice, display_recent_workouts, display_filtered_workouts, display_weekly_calorie_summary, display_macro_calorie_chart
+from modules import display_genai_advice_stream, display_streamed_text, display_failed_writes
 import altair as alt
 import pandas as pd
+from datetime import date
+from clients import reset_genai_model, set_genai_model
+from data_fetcher import clear_caches
+from storage import SQLiteBackend, set_storage_backend
 
 # Write your tests below
 
@@ -240,6 +245,40 @@ class TestDisplayGenaiAdvice(unittest.TestCase):
     
         
 
+class TestDisplayGenaiAdviceStream(unittest.TestCase):
+    """Tests the streaming variant of display_genai_advice."""
+
+    def test_streamed_text_renders_progressively(self):
+        """Each chunk should update the placeholder with the text so far."""
+        placeholder = Mock()
+
+        text = display_streamed_text(iter(["Keep ", "it ", "up!"]), placeholder, prefix="content: ")
+
+        self.assertEqual(text, "Keep it up!")
+        placeholder.write.assert_has_calls([
+            call("content: Keep "),
+            call("content: Keep it "),
+            call("content: Keep it up!"),
+        ])
+
+    @patch("streamlit.empty")
+    @patch("streamlit.header")
+    @patch("streamlit.image")
+    @patch("streamlit.write")
+    def test_stream_matches_blocking_layout(self, mock_write, mock_image, mock_header, mock_empty):
+        """The streamed advice should show the same header, timestamp and image."""
+        timestamp = "2024-01-01 00:00:00"
+        image = "https://plus.unsplash.com/premium_photo-1669048780129.jpg"
+
+        content = display_genai_advice_stream(timestamp, iter(["Great ", "job"]), image, MagicMock())
+
+        self.assertEqual(content, "Great job")
+        mock_header.assert_called_once_with("Gen AI ADVICE")
+        mock_write.assert_any_call(f"timestamp : {timestamp}")
+        mock_empty.return_value.write.assert_called_with("content: Great job")
+        mock_image.assert_called_once_with(image)
+
+
 class TestDisplayRecentWorkouts(unittest.TestCase):
     """Tests the display_recent_workouts function."""
 
@@ -312,6 +351,74 @@ class TestDisplayRecentWorkouts(unittest.TestCase):
 
 
 
+class TestWorkoutListElementCount(unittest.TestCase):
+    """Long workout histories must not grow the page element by element."""
+
+    def setUp(self):
+        # The home page's other reads go to an empty local database and a fake
+        # model, so the page renders the same with or without credentials
+        set_storage_backend(SQLiteBackend(":memory:"))
+        self.addCleanup(set_storage_backend, None)
+        model = MagicMock()
+        model.generate_content.return_value = [MagicMock(text="Keep it up!")]
+        set_genai_model(model)
+        self.addCleanup(reset_genai_model)
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+    @staticmethod
+    def make_workouts(count):
+        return [{
+            'workout_id': f'w{i}',
+            'start_timestamp': '2024-10-26 10:00:00',
+            'end_timestamp': '2024-10-26 11:00:00',
+            'distance': 3.5,
+            'steps': 5000,
+            'calories_burned': 300,
+            'start_lat_lng': (34.0522, -118.2437),
+            'end_lat_lng': None,
+        } for i in range(count)]
+
+    @staticmethod
+    def count_elements(node):
+        return 1 + sum(TestWorkoutListElementCount.count_elements(child)
+                       for child in getattr(node, 'children', {}).values())
+
+    def run_home_page(self, workout_count):
+        with patch('data_fetcher.get_user_workouts', return_value=self.make_workouts(workout_count)):
+            app = AppTest.from_file("app.py")
+            app.run(timeout=10)
+        self.assertEqual([error.value for error in app.error], [])
+        return app
+
+    def test_element_count_is_bounded(self):
+        """Test that 100 and 5000 workouts emit the same number of elements."""
+        hundred = self.run_home_page(100)
+        five_thousand = self.run_home_page(5000)
+
+        self.assertEqual(len(five_thousand.dataframe), 2)
+        self.assertEqual(self.count_elements(five_thousand._tree), self.count_elements(hundred._tree))
+        self.assertLess(self.count_elements(five_thousand._tree), 100)
+
+    def test_load_more_shows_next_page(self):
+        """Test that cards come a page at a time until the list is shown."""
+        from modules import WORKOUT_PAGE_SIZE
+
+        workouts = self.make_workouts(WORKOUT_PAGE_SIZE + 2)
+        with patch('data_fetcher.get_user_workouts', return_value=workouts):
+            app = AppTest.from_file("app.py")
+            app.run(timeout=10)
+            self.assertEqual([error.value for error in app.error], [])
+            cards = [m for m in app.markdown if m.value.startswith("**Workout ID:**")]
+            self.assertEqual(len(cards), WORKOUT_PAGE_SIZE)
+
+            app.button(key="activity_summary_shown_load_more").click().run(timeout=10)
+
+        cards = [m for m in app.markdown if m.value.startswith("**Workout ID:**")]
+        self.assertEqual(len(cards), WORKOUT_PAGE_SIZE + 2)
+        self.assertNotIn("activity_summary_shown_load_more", [button.key for button in app.button])
+
+
 class TestDisplayPost(unittest.TestCase):
     #I used gemini to generate some of this code
     @patch('streamlit.image')
@@ -420,9 +527,62 @@ class TestDisplayWeeklyCalorieSummary(unittest.TestCase):
         display_weekly_calorie_summary(df)
 
         mock_subheader.assert_called_once_with("📊 Weekly Calorie & Macro Summary")
-        mock_dataframe.assert_called_once_with(df)
+        pd.testing.assert_frame_equal(mock_dataframe.call_args.args[0], df)
         mock_altair_chart.assert_called_once()
 
+    @patch("streamlit.info")
+    def test_week_without_meals(self, mock_info):
+        """Should show the info message when every day of the summary is zero."""
+        df = pd.DataFrame({
+            'MealDate': [date(2025, 4, 19), date(2025, 4, 20)],
+            'total_calories': [0.0, 0.0],
+            'total_protein': [0.0, 0.0],
+            'total_fats': [0.0, 0.0],
+            'total_carbs': [0.0, 0.0],
+            'meal_count': [0, 0],
+        })
+        display_weekly_calorie_summary(df)
+        mock_info.assert_called_once_with("No meal data available for the past week.")
+
+    @patch("streamlit.altair_chart")
+    @patch("streamlit.dataframe")
+    @patch("streamlit.subheader")
+    def test_shared_frame_is_not_changed(self, mock_subheader, mock_dataframe, mock_altair_chart):
+        """Should leave the caller's frame as it was and not show the meal counts."""
+        df = pd.DataFrame({
+            'MealDate': [date(2025, 4, 19), date(2025, 4, 20)],
+            'total_calories': [400.0, 0.0],
+            'total_protein': [30.0, 0.0],
+            'total_fats': [10.0, 0.0],
+            'total_carbs': [50.0, 0.0],
+            'meal_count': [1, 0],
+        })
+        original = df.copy()
+        display_weekly_calorie_summary(df)
+
+        pd.testing.assert_frame_equal(df, original)
+        shown = mock_dataframe.call_args.args[0]
+        self.assertNotIn('meal_count', shown.columns)
+        self.assertEqual(list(shown['MealDate']), ['2025-04-19', '2025-04-20'])
+
+class TestDisplayFailedWrites(unittest.TestCase):
+    """Tests the display_failed_writes function."""
+
+    @patch("modules.take_failed_rows")
+    @patch("streamlit.warning")
+    def test_failed_rows_are_reported(self, mock_warning, mock_take_failed_rows):
+        """Should warn once per row the write buffer gave up on."""
+        mock_take_failed_rows.return_value = [{"MealName": "Pasta"}, {"MealName": "Salad"}]
+
+        display_failed_writes("user1", "CalorieTracking", lambda row: row["MealName"])
+
+        mock_take_failed_rows.assert_called_once_with("CalorieTracking", "user1")
+        self.assertEqual(mock_warning.call_args_list, [
+            call("Pasta could not be saved. Please try again."),
+            call("Salad could not be saved. Please try again."),
+        ])
+
+
 class TestDisplayMacroCalorieChart(unittest.TestCase):
     """Tests the display_macro_calorie_chart function."""
 
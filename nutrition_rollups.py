@@ -0,0 +1,164 @@
+#############################################################################
+# nutrition_rollups.py
+#
+# This file maintains the DailyNutrition table: one row per user per day with
+# the totals of that day's meals.
+#
+# Nutrition feedback and the weekly summary read these rows instead of
+# summing CalorieTracking on every request. Each meal logged through the app
+# adds itself to its day's row once the write buffer has written it, and
+# rebuild_rollups recomputes rows from the raw meals, so any drift (e.g. a
+# failed update or a meal written by another tool) is repaired. Run it on a
+# schedule, and once to create and backfill the table:
+#
+#     python -m nutrition_rollups [--user USER_ID]
+#
+# Backends that derive DailyNutrition from CalorieTracking (see storage.py)
+# need none of this, and the functions here do nothing on them.
+#############################################################################
+
+import argparse
+
+from google.cloud import bigquery
+
+from queries import run_within_budget
+from storage import get_storage_backend
+from write_buffer import FLUSH_ORDER_DERIVED, add_flush_listener
+
+ROLLUP_TABLE = "sectiona4project.ISE.DailyNutrition"
+
+CREATE_ROLLUP_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS `{ROLLUP_TABLE}` (
+        UserId STRING NOT NULL,
+        MealDate DATE NOT NULL,
+        TotalCalories FLOAT64,
+        TotalProtein FLOAT64,
+        TotalFats FLOAT64,
+        TotalCarbs FLOAT64,
+        MealCount INT64,
+        UpdatedAt TIMESTAMP
+    )
+    CLUSTER BY UserId, MealDate
+"""
+
+ADD_MEAL_TO_ROLLUP = f"""
+    MERGE `{ROLLUP_TABLE}` AS rollup
+    USING (SELECT @user_id AS UserId, @meal_date AS MealDate) AS meal
+    ON rollup.UserId = meal.UserId AND rollup.MealDate = meal.MealDate
+    WHEN MATCHED THEN UPDATE SET
+        TotalCalories = IFNULL(rollup.TotalCalories, 0) + @calories,
+        TotalProtein = IFNULL(rollup.TotalProtein, 0) + @protein,
+        TotalFats = IFNULL(rollup.TotalFats, 0) + @fats,
+        TotalCarbs = IFNULL(rollup.TotalCarbs, 0) + @carbs,
+        MealCount = IFNULL(rollup.MealCount, 0) + 1,
+        UpdatedAt = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN
+        INSERT (UserId, MealDate, TotalCalories, TotalProtein, TotalFats, TotalCarbs, MealCount, UpdatedAt)
+        VALUES (@user_id, @meal_date, @calories, @protein, @fats, @carbs, 1, CURRENT_TIMESTAMP())
+"""
+
+# With @user_id NULL every user's rows are rebuilt.
+REBUILD_ROLLUPS = f"""
+    MERGE `{ROLLUP_TABLE}` AS rollup
+    USING (
+        SELECT
+            UserId,
+            MealDate,
+            SUM(Calories) AS TotalCalories,
+            SUM(Protein) AS TotalProtein,
+            SUM(Fats) AS TotalFats,
+            SUM(Carbs) AS TotalCarbs,
+            COUNT(*) AS MealCount
+        FROM `sectiona4project.ISE.CalorieTracking`
+        WHERE (@user_id IS NULL OR UserId = @user_id) AND MealDate IS NOT NULL
+        GROUP BY UserId, MealDate
+    ) AS raw
+    ON rollup.UserId = raw.UserId AND rollup.MealDate = raw.MealDate
+    WHEN MATCHED AND NOT (
+        rollup.MealCount = raw.MealCount
+        AND IFNULL(rollup.TotalCalories, 0) = IFNULL(raw.TotalCalories, 0)
+        AND IFNULL(rollup.TotalProtein, 0) = IFNULL(raw.TotalProtein, 0)
+        AND IFNULL(rollup.TotalFats, 0) = IFNULL(raw.TotalFats, 0)
+        AND IFNULL(rollup.TotalCarbs, 0) = IFNULL(raw.TotalCarbs, 0)
+    ) THEN UPDATE SET
+        TotalCalories = raw.TotalCalories,
+        TotalProtein = raw.TotalProtein,
+        TotalFats = raw.TotalFats,
+        TotalCarbs = raw.TotalCarbs,
+        MealCount = raw.MealCount,
+        UpdatedAt = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (UserId, MealDate, TotalCalories, TotalProtein, TotalFats, TotalCarbs, MealCount, UpdatedAt)
+        VALUES (raw.UserId, raw.MealDate, raw.TotalCalories, raw.TotalProtein, raw.TotalFats,
+                raw.TotalCarbs, raw.MealCount, CURRENT_TIMESTAMP())
+    WHEN NOT MATCHED BY SOURCE AND (@user_id IS NULL OR rollup.UserId = @user_id) THEN
+        DELETE
+"""
+
+
+def _run(query_class, query, query_parameters=()):
+    backend = get_storage_backend()
+    if "DailyNutrition" in backend.derived_tables:
+        # The backend computes the rollups itself; there is nothing to maintain
+        return iter(())
+    return run_within_budget(backend, query_class, query, query_parameters).result()
+
+
+def record_meal(user_id, meal_date, calories, protein, fats, carbs):
+    """Adds one newly inserted meal to its day's rollup row.
+
+    Call this after the meal's CalorieTracking row was written. If it fails,
+    the next rebuild_rollups run puts the meal in.
+
+    Args:
+        user_id (str): The user who ate the meal.
+        meal_date (datetime.date or str): The day of the meal, 'YYYY-MM-DD'.
+        calories, protein, fats, carbs (float): The meal's values.
+    """
+    _run("rollup_update", ADD_MEAL_TO_ROLLUP, [
+        bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+        bigquery.ScalarQueryParameter("meal_date", "DATE", meal_date),
+        bigquery.ScalarQueryParameter("calories", "FLOAT64", calories or 0),
+        bigquery.ScalarQueryParameter("protein", "FLOAT64", protein or 0),
+        bigquery.ScalarQueryParameter("fats", "FLOAT64", fats or 0),
+        bigquery.ScalarQueryParameter("carbs", "FLOAT64", carbs or 0),
+    ])
+
+
+def _record_written_meals(table, rows):
+    if table != "CalorieTracking":
+        return
+    for row in rows:
+        try:
+            record_meal(row.get("UserId"), row.get("MealDate"), row.get("Calories"),
+                        row.get("Protein"), row.get("Fats"), row.get("Carbs"))
+        except Exception as e:
+            # The meal is saved; the next rollup rebuild adds it to the totals
+            print(f"Could not update nutrition rollup: {e}")
+
+
+# Runs before data_fetcher drops the cached totals, so they are read again
+# only once the rollup has the meal
+add_flush_listener(_record_written_meals, FLUSH_ORDER_DERIVED)
+
+
+def rebuild_rollups(user_id=None):
+    """Recomputes rollup rows from CalorieTracking, creating the table if needed.
+
+    Rows that already match the raw meals are left alone, wrong rows are
+    corrected, missing rows are added and rows for days without meals are
+    removed.
+
+    Args:
+        user_id (str): Only rebuild this user's rows. Defaults to every user.
+    """
+    _run("rollup_rebuild", CREATE_ROLLUP_TABLE)
+    _run("rollup_rebuild", REBUILD_ROLLUPS, [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild daily nutrition rollups from raw meals.")
+    parser.add_argument("--user", help="only rebuild this user's rollups")
+    args = parser.parse_args()
+    rebuild_rollups(args.user)
+    print(f"Rebuilt {ROLLUP_TABLE} for {args.user or 'all users'}")
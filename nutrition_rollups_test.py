@@ -0,0 +1,82 @@
+#############################################################################
+# nutrition_rollups_test.py
+#
+# This file contains tests for nutrition_rollups.py.
+#############################################################################
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from clients import reset_bigquery_client, set_bigquery_client
+from nutrition_rollups import ROLLUP_TABLE, rebuild_rollups, record_meal
+
+
+def query_parameters(mock_client, call_index=-1):
+    job_config = mock_client.query.call_args_list[call_index].kwargs["job_config"]
+    return {param.name: param.value for param in job_config.query_parameters}
+
+
+class TestNutritionRollups(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MagicMock()
+        set_bigquery_client(self.client)
+        self.addCleanup(reset_bigquery_client)
+
+    def test_record_meal_adds_to_its_day(self):
+        """Test that a logged meal is merged into its day's rollup row."""
+        record_meal("user1", date(2025, 4, 20), 300, 10, 5, None)
+
+        self.client.query.assert_called_once()
+        query = self.client.query.call_args.args[0]
+        self.assertIn(f"MERGE `{ROLLUP_TABLE}`", query)
+        self.assertIn("MealCount = IFNULL(rollup.MealCount, 0) + 1", query)
+        self.assertEqual(query_parameters(self.client), {
+            "user_id": "user1",
+            "meal_date": date(2025, 4, 20),
+            "calories": 300,
+            "protein": 10,
+            "fats": 5,
+            "carbs": 0,
+        })
+
+    def test_rebuild_creates_table_then_merges_raw_meals(self):
+        """Test that the repair job recomputes every user's rows from CalorieTracking."""
+        rebuild_rollups()
+
+        create, rebuild = [call.args[0] for call in self.client.query.call_args_list]
+        self.assertIn(f"CREATE TABLE IF NOT EXISTS `{ROLLUP_TABLE}`", create)
+        self.assertIn("FROM `sectiona4project.ISE.CalorieTracking`", rebuild)
+        self.assertIn("WHEN NOT MATCHED BY SOURCE", rebuild)
+        self.assertEqual(query_parameters(self.client), {"user_id": None})
+
+    def test_rebuild_one_user(self):
+        """Test that the repair job can be limited to one user."""
+        rebuild_rollups("user1")
+
+        self.assertEqual(query_parameters(self.client), {"user_id": "user1"})
+
+    @patch("data_fetcher.get_genai_model")
+    def test_fetchers_read_rollups(self, mock_get_model):
+        """Test that nutrition feedback and the weekly summary's past days read precomputed rows."""
+        from data_fetcher import (QUERY_TODAY_CALORIES, clear_caches, get_genai_nutrition_feedback,
+                                  get_user_weekly_calorie_summary)
+
+        clear_caches()
+        self.addCleanup(clear_caches)
+        self.client.query.return_value.result.side_effect = lambda: iter([])
+
+        get_genai_nutrition_feedback("user1")
+        get_user_weekly_calorie_summary("user1")
+
+        # Today is added up from its meals, which the meal page reads anyway
+        queries = [call.args[0] for call in self.client.query.call_args_list]
+        self.assertEqual(queries.count(QUERY_TODAY_CALORIES), 1)
+        for query in queries:
+            if query != QUERY_TODAY_CALORIES:
+                self.assertIn(f"FROM `{ROLLUP_TABLE}`", query)
+                self.assertNotIn("SUM(", query)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+#############################################################################
+# page_loader.py
+#
+# This file contains the loader that fetches a page's data concurrently.
+#
+# A page declares the data it needs up front as a list of dependencies. The
+# loader runs every dependency whose inputs are ready on a shared, bounded
+# thread pool, so the page waits roughly as long as its slowest query instead
+# of the sum of all of them.
+#############################################################################
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, NamedTuple, Tuple
+
+from telemetry import carry_page
+
+# Threads shared by every page load in the process. Fetchers only wait on the
+# network, so this bounds concurrent queries rather than CPU use.
+PAGE_LOADER_WORKERS = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class Dependency(NamedTuple):
+    """One piece of data a page needs.
+
+    Attributes:
+        name (str): The field of the page bundle the result is stored in.
+        func (callable): Fetches the data. It is called with args, followed by
+            the results of the dependencies named in requires, in that order.
+        args (tuple): Positional arguments passed to func.
+        requires (tuple of str): Names of dependencies that must finish first.
+    """
+    name: str
+    func: Callable
+    args: Tuple = ()
+    requires: Tuple[str, ...] = ()
+
+
+class DependencyFailed(Exception):
+    """Raised in place of a result whose required dependency failed."""
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=PAGE_LOADER_WORKERS, thread_name_prefix="page-loader"
+            )
+        return _executor
+
+
+def load_page_data(bundle_type, dependencies):
+    """Fetches every dependency, running independent ones concurrently.
+
+    A failing dependency does not stop the others: its field is left as None
+    and the exception is recorded in the bundle's errors dict, so the page can
+    still render everything that did load.
+
+    Args:
+        bundle_type (NamedTuple class): The page's bundle. It must have a field
+            per dependency name plus an 'errors' field; all default to None.
+        dependencies (list of Dependency): The page's data, in any order.
+
+    Returns:
+        bundle_type: The loaded data.
+    """
+    by_name = {dependency.name: dependency for dependency in dependencies}
+    for dependency in dependencies:
+        unknown = [name for name in dependency.requires if name not in by_name]
+        if unknown:
+            raise ValueError(f"{dependency.name} requires unknown dependencies: {unknown}")
+
+    executor = _get_executor()
+    results = {}
+    errors = {}
+    pending = dict(by_name)
+    running = {}
+
+    while pending or running:
+        # Skipping one dependency can make others skippable, so repeat until
+        # nothing changes.
+        changed = True
+        while changed:
+            changed = False
+            for name, dependency in list(pending.items()):
+                failed = [required for required in dependency.requires if required in errors]
+                if failed:
+                    errors[name] = DependencyFailed(f"{name} skipped because {failed} failed")
+                elif all(required in results for required in dependency.requires):
+                    inputs = [results[required] for required in dependency.requires]
+                    running[executor.submit(carry_page(dependency.func), *dependency.args, *inputs)] = name
+                else:
+                    continue
+                del pending[name]
+                changed = True
+
+        if not running:
+            if pending:
+                raise ValueError(f"Circular dependencies between {sorted(pending)}")
+            break
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+
+    return bundle_type(**results, errors=errors)
@@ -0,0 +1,74 @@
+#############################################################################
+# page_loader_test.py
+#
+# This file contains tests for page_loader.py.
+#############################################################################
+import time
+import unittest
+from typing import NamedTuple
+
+from page_loader import Dependency, DependencyFailed, load_page_data
+
+
+class Bundle(NamedTuple):
+    first: object = None
+    second: object = None
+    combined: object = None
+    errors: dict = None
+
+
+def slow(value, delay=0.2):
+    time.sleep(delay)
+    return value
+
+
+def fail():
+    raise RuntimeError("query failed")
+
+
+class TestLoadPageData(unittest.TestCase):
+
+    def test_independent_dependencies_run_concurrently(self):
+        """Test that the page waits for the slowest query, not the sum."""
+        started = time.perf_counter()
+        data = load_page_data(Bundle, [
+            Dependency("first", slow, args=(1,)),
+            Dependency("second", slow, args=(2,)),
+        ])
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual((data.first, data.second), (1, 2))
+        self.assertEqual(data.errors, {})
+        self.assertLess(elapsed, 0.35)
+
+    def test_dependent_receives_required_results(self):
+        """Test that a dependency runs after, and is given, what it requires."""
+        data = load_page_data(Bundle, [
+            Dependency("combined", lambda first, second: first + second, requires=("first", "second")),
+            Dependency("first", slow, args=(1, 0.05)),
+            Dependency("second", slow, args=(2, 0.0)),
+        ])
+
+        self.assertEqual(data.combined, 3)
+
+    def test_failure_is_isolated(self):
+        """Test that one failing query leaves the others loaded."""
+        data = load_page_data(Bundle, [
+            Dependency("first", fail),
+            Dependency("second", slow, args=(2, 0.0)),
+            Dependency("combined", lambda first: first, requires=("first",)),
+        ])
+
+        self.assertEqual(data.second, 2)
+        self.assertIsNone(data.first)
+        self.assertIsInstance(data.errors["first"], RuntimeError)
+        self.assertIsInstance(data.errors["combined"], DependencyFailed)
+
+    def test_unknown_requirement(self):
+        """Test that a typo in requires is reported up front."""
+        with self.assertRaises(ValueError):
+            load_page_data(Bundle, [Dependency("combined", slow, requires=("missing",))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+#############################################################################
+# queries.py
+#
+# This file contains the helpers that build the fetchers' queries and keep
+# what they cost within a budget.
+#
+# BigQuery bills a query for every byte of every column it reads, whatever
+# the WHERE clause, so SELECT * pays for columns no fetcher looks at, and for
+# any column added to a table later. select() builds a query of only the
+# columns a fetcher maps; columns_read() finds those columns by running the
+# fetcher's row mapper on a recording row.
+#
+# Each query runs in a class (one per fetcher, plus the community feed, the
+# friend graph, the replica's syncs and the nutrition rollups) with a byte
+# budget, sent to BigQuery as maximum_bytes_billed so a query over it fails
+# instead of being billed. With QUERY_DRY_RUN=1 the query is also estimated with a dry run
+# before it is sent, and fails with QueryBudgetExceeded before it starts.
+# Estimates are kept for DRY_RUN_TTL seconds per query, as the bytes a query
+# scans change only as slowly as its tables grow.
+#############################################################################
+
+import os
+
+from cache import get_cache
+from clients import PROJECT_ID
+from storage import DATASET, TABLES
+
+QUERY_DRY_RUN = os.environ.get("QUERY_DRY_RUN", "0") == "1"
+DRY_RUN_TTL = 60 * 60
+
+# The most bytes BigQuery may bill each class of query; one over its budget
+# fails instead of running. BigQuery bills at least 10 MB for each table a
+# query reads, so no budget can be lower than that.
+MAXIMUM_BYTES_BILLED = {
+    "workouts": 1 << 30,
+    "workouts_by_date": 1 << 30,
+    "sensor_data": 10 << 30,
+    "advice": 1 << 30,
+    "profiles": 100 << 20,
+    "posts": 1 << 30,
+    "calories": 1 << 30,
+    "today_calories": 1 << 30,
+    "calories_between": 1 << 30,
+    "nutrition_feedback": 100 << 20,
+    "calorie_days": 100 << 20,
+    "community_feed": 1 << 30,
+    "friendships": 100 << 20,
+    # A user's rows of one table changed since the watermark (every row on the first sync)
+    "replica_sync": 1 << 30,
+    # One meal added to its day's row
+    "rollup_update": 100 << 20,
+    # Every user's meals, when rebuild_rollups runs for all users
+    "rollup_rebuild": 10 << 30,
+}
+
+_estimates = get_cache("dry_runs", maxsize=256, ttl=DRY_RUN_TTL)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a query would scan more bytes than its class may be billed."""
+
+
+class _ColumnRecorder:
+    def __init__(self):
+        self.columns = []
+
+    def __getattr__(self, name):
+        if name not in self.columns:
+            self.columns.append(name)
+        # Truthy, so conditional reads like "row.Lat and row.Long" read both
+        return 1
+
+
+def columns_read(from_row):
+    """Returns the columns a row mapper reads, in the order it reads them."""
+    recorder = _ColumnRecorder()
+    from_row(recorder)
+    return recorder.columns
+
+
+def select(table, columns, where):
+    """Builds a SELECT of the given columns of an ISE table.
+
+    Raises:
+        ValueError: If a column is not one of the table's.
+    """
+    unknown = sorted(set(columns) - {name for name, _ in TABLES[table]["columns"]})
+    if unknown:
+        raise ValueError(f"{table} has no columns {unknown}")
+    return f"SELECT {', '.join(columns)} FROM `{PROJECT_ID}.{DATASET}.{table}` WHERE {where}"
+
+
+def estimate_bytes(backend, query_class, sql, query_parameters=()):
+    """Returns the bytes a query would scan, from a dry run, or None if the backend cannot tell."""
+    estimate = _estimates.get((query_class, sql))
+    if estimate is None:
+        estimate = backend.estimate_bytes(sql, query_parameters)
+        if estimate is None:
+            return None
+        _estimates.set((query_class, sql), estimate)
+    return estimate
+
+
+def run_within_budget(backend, query_class, sql, query_parameters=(), maximum_bytes_billed=None):
+    """Runs a query on backend, billed at most maximum_bytes_billed bytes.
+
+    The budget defaults to MAXIMUM_BYTES_BILLED[query_class].
+
+    Raises:
+        QueryBudgetExceeded: With QUERY_DRY_RUN set, if the dry run shows the
+            query would scan more than that.
+    """
+    if maximum_bytes_billed is None:
+        maximum_bytes_billed = MAXIMUM_BYTES_BILLED[query_class]
+    if QUERY_DRY_RUN:
+        estimate = estimate_bytes(backend, query_class, sql, query_parameters)
+        if estimate is not None and estimate > maximum_bytes_billed:
+            raise QueryBudgetExceeded(
+                f"The {query_class} query would scan {estimate:,} bytes, over its budget of "
+                f"{maximum_bytes_billed:,}. Narrow the query or raise MAXIMUM_BYTES_BILLED[{query_class!r}]."
+            )
+    return backend.query(sql, query_parameters, maximum_bytes_billed=maximum_bytes_billed)
@@ -0,0 +1,127 @@
+#############################################################################
+# queries_test.py
+#
+# This file contains tests for queries.py and the fetchers' projected,
+# budgeted queries. BigQuery is mocked.
+#############################################################################
+import unittest
+from unittest.mock import MagicMock, patch
+
+import data_fetcher
+from clients import reset_bigquery_client, set_bigquery_client
+from community import get_friends_feed
+from data_fetcher import clear_caches, get_user_workouts
+from friend_graph import get_friend_graph
+from nutrition_rollups import rebuild_rollups, record_meal
+from queries import MAXIMUM_BYTES_BILLED, QueryBudgetExceeded, columns_read, select
+from replica import REPLICA_TABLES, Replica
+from storage import BigQueryBackend, SQLiteBackend, set_storage_backend
+
+
+class TestProjection(unittest.TestCase):
+
+    def test_queries_select_the_columns_the_mappers_read(self):
+        """Test that each fetcher's column list is exactly what its row mapper reads."""
+        for from_row, columns in [
+            (data_fetcher._workout_from_row, data_fetcher.WORKOUT_COLUMNS),
+            (data_fetcher._profile_from_row, data_fetcher.PROFILE_COLUMNS),
+            (data_fetcher._post_from_row, data_fetcher.POST_COLUMNS),
+            (data_fetcher._meal_from_row, data_fetcher.MEAL_COLUMNS),
+        ]:
+            self.assertEqual(columns_read(from_row), columns)
+
+        for query in [data_fetcher.QUERY_WORKOUTS, data_fetcher.QUERY_WORKOUTS_BY_DATE, data_fetcher.QUERY_PROFILES,
+                      data_fetcher.QUERY_POSTS, data_fetcher.QUERY_CALORIES, data_fetcher.QUERY_TODAY_CALORIES]:
+            self.assertNotIn("*", query)
+
+    def test_unknown_columns_are_rejected(self):
+        """Test that select() refuses a column the table does not have."""
+        self.assertEqual(
+            select("Posts", ["PostId"], "AuthorId = @user_id"),
+            "SELECT PostId FROM `sectiona4project.ISE.Posts` WHERE AuthorId = @user_id",
+        )
+        with self.assertRaises(ValueError):
+            select("Posts", ["PostId", "Likes"], "TRUE")
+
+
+@patch("data_fetcher.bigquery.Client")
+class TestByteBudget(unittest.TestCase):
+
+    def setUp(self):
+        reset_bigquery_client()
+        clear_caches()
+        self.addCleanup(reset_bigquery_client)
+        self.addCleanup(clear_caches)
+
+    def job_configs(self, mock_client_cls):
+        return [call.kwargs["job_config"] for call in mock_client_cls.return_value.query.call_args_list]
+
+    def test_budget_is_sent_with_the_query(self, mock_client_cls):
+        """Test that the query's class budget becomes its maximum_bytes_billed, without a dry run."""
+        mock_client_cls.return_value.query.return_value.result.return_value = []
+        get_user_workouts("user1")
+
+        (job_config,) = self.job_configs(mock_client_cls)
+        self.assertEqual(job_config.maximum_bytes_billed, MAXIMUM_BYTES_BILLED["workouts"])
+
+    @patch("queries.QUERY_DRY_RUN", True)
+    def test_dry_run_over_budget_fails_fast(self, mock_client_cls):
+        """Test that a query estimated over budget is never run, and the estimate is reused."""
+        mock_client_cls.return_value.query.return_value = MagicMock(
+            total_bytes_processed=MAXIMUM_BYTES_BILLED["workouts"] + 1
+        )
+        for _ in range(2):
+            with self.assertRaisesRegex(QueryBudgetExceeded, "workouts query would scan"):
+                get_user_workouts.uncached("user1")
+
+        (job_config,) = self.job_configs(mock_client_cls)
+        self.assertTrue(job_config.dry_run)
+
+    @patch("queries.QUERY_DRY_RUN", True)
+    def test_dry_run_within_budget_runs(self, mock_client_cls):
+        """Test that a query estimated within budget runs after its dry run."""
+        mock_client_cls.return_value.query.return_value = MagicMock(total_bytes_processed=1024)
+        mock_client_cls.return_value.query.return_value.result.return_value = []
+        self.assertEqual(get_user_workouts("user1"), [])
+
+        dry_run, run = self.job_configs(mock_client_cls)
+        self.assertTrue(dry_run.dry_run)
+        self.assertFalse(run.dry_run)
+
+    def test_every_query_class_has_a_budget(self, mock_client_cls):
+        """Test that the feed, friend graph, replica syncs and rollups run within their own budgets."""
+        client = MagicMock()
+        client.query.return_value.result.return_value = []
+        set_bigquery_client(client)
+        set_storage_backend(BigQueryBackend())
+        self.addCleanup(set_storage_backend, None)
+        get_friend_graph().invalidate()
+        self.addCleanup(get_friend_graph().invalidate)
+
+        client.query.return_value.result.return_value = [MagicMock(UserId1="user1", UserId2="user2")]
+        get_friends_feed("user1")
+        client.query.return_value.result.return_value = []
+        Replica(SQLiteBackend(":memory:")).sync("user1", "Posts")
+        record_meal("user1", "2025-04-20", 500, 20, 10, 60)
+        rebuild_rollups("user1")
+
+        budgets = [call.kwargs["job_config"].maximum_bytes_billed for call in client.query.call_args_list]
+        self.assertEqual(budgets, [MAXIMUM_BYTES_BILLED[query_class] for query_class in [
+            "friendships", "community_feed", "replica_sync", "rollup_update", "rollup_rebuild", "rollup_rebuild",
+        ]])
+
+    @patch("queries.QUERY_DRY_RUN", True)
+    def test_replica_reads_are_budgeted(self, mock_client_cls):
+        """Test that a fetcher read served by the replica still runs within its class's budget."""
+        local = MagicMock()
+        local.estimate_bytes.return_value = MAXIMUM_BYTES_BILLED["posts"] + 1
+        replica = Replica(local, remote_factory=MagicMock())
+        replica.is_fresh = lambda user_id, table: True
+
+        with self.assertRaisesRegex(QueryBudgetExceeded, "posts query would scan"):
+            replica.query("Posts", "user1", REPLICA_TABLES["Posts"][1], (), "posts")
+        local.query.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+#############################################################################
+# records.py
+#
+# This file contains the record types the data fetchers return.
+#
+# Each record is an immutable NamedTuple, so it is much smaller than a dict
+# and can be shared safely between cached callers. Attributes hold native
+# values (datetimes, dates). Indexing by field name still works as it did on
+# the old dicts, and returns timestamps in the string formats those dicts
+# used, so code written against the dicts keeps working unchanged.
+#############################################################################
+
+from datetime import date, datetime
+from typing import NamedTuple, Optional, Tuple
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class Record:
+    """Adds read-only, dict-style access by field name to a NamedTuple.
+
+    Subclasses list the fields to show as strings under dict-style access in
+    _string_formats, mapping each field name to a strftime format.
+    """
+    __slots__ = ()
+    _string_formats = {}
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            return super().__getitem__(key)
+        if key not in self._fields:
+            raise KeyError(key)
+        value = getattr(self, key)
+        string_format = self._string_formats.get(key)
+        if string_format is not None and value is not None:
+            return value.strftime(string_format)
+        return value
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return dict(self.items()) == other
+        return super().__eq__(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = tuple.__hash__
+
+    def get(self, key, default=None):
+        """Returns self[key], or default if there is no such field."""
+        if key not in self._fields:
+            return default
+        return self[key]
+
+    def keys(self):
+        """Returns the field names, so dict(record) gives the old dict."""
+        return self._fields
+
+    def values(self):
+        return [self[key] for key in self._fields]
+
+    def items(self):
+        return [(key, self[key]) for key in self._fields]
+
+
+class _WorkoutFields(NamedTuple):
+    workout_id: str
+    start_timestamp: Optional[datetime]
+    end_timestamp: Optional[datetime]
+    start_lat_lng: Optional[Tuple[float, float]]
+    end_lat_lng: Optional[Tuple[float, float]]
+    distance: float
+    steps: int
+    calories_burned: int
+
+
+class Workout(Record, _WorkoutFields):
+    """One workout from the Workouts table."""
+    __slots__ = ()
+    _string_formats = {'start_timestamp': TIMESTAMP_FORMAT, 'end_timestamp': TIMESTAMP_FORMAT}
+
+
+class _MealFields(NamedTuple):
+    meal_id: Optional[str]
+    user_id: Optional[str]
+    date: Optional[date]
+    meal_name: Optional[str]
+    calories: Optional[float]
+    protein: Optional[float]
+    carbs: Optional[float]
+    fat: Optional[float]
+    created_at: Optional[datetime]
+
+
+class Meal(Record, _MealFields):
+    """One meal from the CalorieTracking table."""
+    __slots__ = ()
+    _string_formats = {'date': DATE_FORMAT, 'created_at': TIMESTAMP_FORMAT}
+
+
+class _PostFields(NamedTuple):
+    user_id: str
+    post_id: str
+    timestamp: datetime
+    content: str
+    image: Optional[str]
+
+
+class Post(Record, _PostFields):
+    """One post from the Posts table. user_id is the author."""
+    __slots__ = ()
+    _string_formats = {'timestamp': TIMESTAMP_FORMAT}
+
+
+class _FeedPostFields(NamedTuple):
+    user_id: str
+    post_id: str
+    timestamp: datetime
+    content: str
+    image: Optional[str]
+    author_full_name: Optional[str]
+    author_username: Optional[str]
+    author_profile_image: Optional[str]
+
+
+class FeedPost(Record, _FeedPostFields):
+    """One post of the community feed, with its author's profile fields."""
+    __slots__ = ()
+    _string_formats = {'timestamp': TIMESTAMP_FORMAT}
+
+
+class _ProfileFields(NamedTuple):
+    user_id: str
+    full_name: str
+    username: str
+    profile_image: Optional[str]
+    date_of_birth: Optional[date]
+
+
+class Profile(Record, _ProfileFields):
+    """One user from the Users table."""
+    __slots__ = ()
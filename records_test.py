@@ -0,0 +1,72 @@
+#############################################################################
+# records_test.py
+#
+# This file contains tests for records.py.
+#############################################################################
+import pickle
+import unittest
+from datetime import date, datetime
+
+from records import Meal, Workout
+
+
+class TestRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.workout = Workout(
+            workout_id="workout1",
+            start_timestamp=datetime(2024, 7, 29, 7, 0, 0),
+            end_timestamp=None,
+            start_lat_lng=(34.05, -118.24),
+            end_lat_lng=None,
+            distance=5.0,
+            steps=8000,
+            calories_burned=400,
+        )
+
+    def test_attributes_are_native(self):
+        """Test that attributes keep datetimes and dates as they are."""
+        self.assertEqual(self.workout.start_timestamp, datetime(2024, 7, 29, 7, 0, 0))
+        meal = Meal("meal1", "user1", date(2025, 4, 20), "Oatmeal", 300, 10, 50, 5, None)
+        self.assertEqual(meal.date, date(2025, 4, 20))
+        self.assertEqual(meal["date"], "2025-04-20")
+
+    def test_dict_style_access(self):
+        """Test that records read like the dicts they replace."""
+        self.assertEqual(self.workout["start_timestamp"], "2024-07-29 07:00:00")
+        self.assertIsNone(self.workout["end_timestamp"])
+        self.assertEqual(self.workout.get("steps"), 8000)
+        self.assertEqual(self.workout.get("missing", "N/A"), "N/A")
+        self.assertIn("calories_burned", self.workout)
+        self.assertNotIn("missing", self.workout)
+        with self.assertRaises(KeyError):
+            self.workout["missing"]
+
+    def test_equals_the_old_dict(self):
+        """Test that a record equals the dict the fetchers used to return."""
+        expected = {
+            "workout_id": "workout1",
+            "start_timestamp": "2024-07-29 07:00:00",
+            "end_timestamp": None,
+            "start_lat_lng": (34.05, -118.24),
+            "end_lat_lng": None,
+            "distance": 5.0,
+            "steps": 8000,
+            "calories_burned": 400,
+        }
+        self.assertEqual(self.workout, expected)
+        self.assertEqual(dict(self.workout), expected)
+        self.assertNotEqual(self.workout, {**expected, "steps": 1})
+
+    def test_immutable_and_compact(self):
+        """Test that records cannot be changed and carry no per-instance dict."""
+        with self.assertRaises(AttributeError):
+            self.workout.steps = 1
+        with self.assertRaises(TypeError):
+            self.workout["steps"] = 1
+        self.assertFalse(hasattr(self.workout, "__dict__"))
+        self.assertEqual(pickle.loads(pickle.dumps(self.workout)), self.workout)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+#############################################################################
+# replica.py
+#
+# This file contains the local replica of each user's workouts, posts and
+# meals.
+#
+# A cold session used to read a user's whole history with SELECT * on every
+# cache miss. With REPLICA_PATH set, those reads are answered by a SQLite
+# database on local disk instead (see storage.SQLiteBackend). Each user's
+# rows of a table are synced from the storage backend the first time they
+# are read, and afterwards only rows past the user's watermark for the table
+# are pulled: the newest EndTimestamp, Timestamp or CreatedAt seen so far.
+#
+# A table is synced again before a read once REPLICA_MAX_STALENESS seconds
+# have passed since its last sync, so a read is never older than that. Rows
+# the app writes through the write buffer are copied in as soon as they are
+# written. Each sync re-reads REPLICA_SYNC_OVERLAP seconds before the
+# watermark to catch rows that arrive late, e.g. from retried inserts.
+# Workouts still in progress (no EndTimestamp) are re-read on every sync.
+# Rows deleted remotely stay in the replica until its file is removed.
+#############################################################################
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from google.cloud import bigquery
+
+from queries import run_within_budget, select
+from storage import TABLES, SQLiteBackend, get_storage_backend
+from telemetry import InstrumentedBackend
+from write_buffer import FLUSH_ORDER_DERIVED, add_flush_listener
+
+# The replica's database file. Empty turns the replica off and every read
+# goes to the storage backend.
+REPLICA_PATH = os.environ.get("REPLICA_PATH", "")
+
+# Seconds a user's synced rows of each table are read before syncing again.
+REPLICA_MAX_STALENESS = {
+    "Workouts": 300,
+    "Posts": 60,
+    "CalorieTracking": 60,
+}
+
+# Seconds before the watermark that each sync reads again.
+REPLICA_SYNC_OVERLAP = 300
+
+
+def _select_all(table, where):
+    # Every column the replica stores, and no others the table may have
+    return select(table, [name for name, _ in TABLES[table]["columns"]], where)
+
+
+# The replicated tables: the watermark column and the query for a user's rows changed since @since (every row if NULL).
+REPLICA_TABLES = {
+    "Workouts": ("EndTimestamp", _select_all(
+        "Workouts", "UserId = @user_id AND (@since IS NULL OR EndTimestamp IS NULL OR EndTimestamp >= @since)"
+    )),
+    "Posts": ("Timestamp", _select_all(
+        "Posts", "AuthorId = @user_id AND (@since IS NULL OR Timestamp >= @since)"
+    )),
+    "CalorieTracking": ("CreatedAt", _select_all(
+        "CalorieTracking", "UserId = @user_id AND (@since IS NULL OR CreatedAt >= @since)"
+    )),
+}
+
+CREATE_WATERMARKS = """
+    CREATE TABLE IF NOT EXISTS ReplicaWatermarks (
+        UserId TEXT NOT NULL,
+        TableName TEXT NOT NULL,
+        Watermark TEXT,
+        SyncedAt REAL NOT NULL,
+        PRIMARY KEY (UserId, TableName)
+    )
+"""
+
+
+class Replica:
+    """Users' rows of the REPLICA_TABLES, kept in a local database.
+
+    Args:
+        local (SQLiteBackend): Holds the replicated rows and the watermarks.
+            It is wrapped in telemetry.InstrumentedBackend like the storage
+            backend, so local reads and syncs show up in the telemetry too.
+        remote_factory (callable): Returns the backend rows are synced from.
+        clock (callable): Returns the current time in seconds since the epoch.
+    """
+
+    def __init__(self, local, remote_factory=get_storage_backend, clock=time.time):
+        if not isinstance(local, InstrumentedBackend):
+            local = InstrumentedBackend(local)
+        self.local = local
+        self._remote_factory = remote_factory
+        self._clock = clock
+        self._state = {}
+        self._lock = threading.Lock()
+        self._sync_locks = {}
+        self.syncs = 0
+        self.rows_pulled = 0
+        self.local_reads = 0
+        local.execute(CREATE_WATERMARKS)
+        for user_id, table, watermark, synced_at in local.execute(
+            "SELECT UserId, TableName, Watermark, SyncedAt FROM ReplicaWatermarks"
+        ):
+            self._state[user_id, table] = (_parse_watermark(watermark), synced_at)
+
+    def watermark(self, user_id, table):
+        """Returns the newest watermark value synced for the user, or None."""
+        with self._lock:
+            return self._state.get((user_id, table), (None, None))[0]
+
+    def is_fresh(self, user_id, table):
+        """Returns whether the user's rows of table were synced recently enough."""
+        with self._lock:
+            synced_at = self._state.get((user_id, table), (None, None))[1]
+        return synced_at is not None and self._clock() - synced_at < REPLICA_MAX_STALENESS[table]
+
+    def sync(self, user_id, table):
+        """Pulls the user's rows of table changed since the last sync.
+
+        Returns:
+            int: The number of rows pulled.
+        """
+        column, query = REPLICA_TABLES[table]
+        with self._lock:
+            sync_lock = self._sync_locks.setdefault((user_id, table), threading.Lock())
+        with sync_lock:
+            watermark = self.watermark(user_id, table)
+            since = watermark - timedelta(seconds=REPLICA_SYNC_OVERLAP) if watermark else None
+            started = self._clock()
+            rows = run_within_budget(self._remote_factory(), "replica_sync", query, [
+                bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+                bigquery.ScalarQueryParameter("since", "TIMESTAMP", since),
+            ]).result()
+
+            columns = [name for name, _ in TABLES[table]["columns"]]
+            records = [{name: row.get(name) for name in columns} for row in rows]
+            errors = self.local.insert_rows(table, records, replace=True)
+            if errors:
+                raise RuntimeError(f"Could not replicate {len(errors)} {table} rows of {user_id}: {errors}")
+
+            newest = max((record[column] for record in records if record[column] is not None), default=None)
+            if newest is not None and (watermark is None or newest > watermark):
+                watermark = newest
+            self.local.execute(
+                "INSERT OR REPLACE INTO ReplicaWatermarks VALUES (?, ?, ?, ?)",
+                (user_id, table, watermark.isoformat() if watermark else None, started),
+            )
+            with self._lock:
+                # Staleness counts from before the query, so rows written
+                # while it ran are at most REPLICA_MAX_STALENESS late too
+                self._state[user_id, table] = (watermark, started)
+                self.syncs += 1
+                self.rows_pulled += len(records)
+            return len(records)
+
+    def query(self, table, user_id, sql, query_parameters=(), query_class=None):
+        """Runs a query of the user's rows of table on the replica.
+
+        The rows are synced first if they are missing or stale. With a
+        query_class the query runs within that class's budget, as it would on
+        the storage backend.
+        """
+        if not self.is_fresh(user_id, table):
+            self.sync(user_id, table)
+        with self._lock:
+            self.local_reads += 1
+        if query_class is None:
+            return self.local.query(sql, query_parameters)
+        return run_within_budget(self.local, query_class, sql, query_parameters)
+
+    def apply_rows(self, table, rows):
+        """Copies rows just written to the storage backend into the replica."""
+        if table in REPLICA_TABLES:
+            self.local.insert_rows(table, rows, replace=True)
+
+    def stats(self):
+        """Returns the number of synced (user, table) pairs and the counters."""
+        with self._lock:
+            return {
+                "synced": len(self._state),
+                "syncs": self.syncs,
+                "rows_pulled": self.rows_pulled,
+                "local_reads": self.local_reads,
+            }
+
+
+def _parse_watermark(value):
+    if value is None:
+        return None
+    watermark = datetime.fromisoformat(value)
+    return watermark if watermark.tzinfo else watermark.replace(tzinfo=timezone.utc)
+
+
+_replica_lock = threading.Lock()
+_replica = None
+
+
+def get_replica():
+    """Returns the replica for this process, or None if REPLICA_PATH is unset."""
+    global _replica
+    if _replica is None and REPLICA_PATH:
+        with _replica_lock:
+            if _replica is None:
+                _replica = Replica(SQLiteBackend(REPLICA_PATH))
+    return _replica
+
+
+def set_replica(replica):
+    """Installs a replica for this process; None goes back to REPLICA_PATH."""
+    global _replica
+    with _replica_lock:
+        _replica = replica
+
+
+def _replicate_written_rows(table, rows):
+    replica = get_replica()
+    if replica is not None:
+        replica.apply_rows(table, rows)
+
+
+# The app's own writes show up without waiting for the next sync
+add_flush_listener(_replicate_written_rows, FLUSH_ORDER_DERIVED)
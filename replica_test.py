@@ -0,0 +1,126 @@
+#############################################################################
+# replica_test.py
+#
+# This file contains tests for replica.py. Both the replica and the backend
+# it syncs from are in-memory SQLite databases.
+#############################################################################
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from data_fetcher import clear_caches, get_user_posts, get_user_workouts
+from replica import REPLICA_MAX_STALENESS, Replica, _replicate_written_rows, set_replica
+from storage import SQLiteBackend, set_storage_backend
+from telemetry import get_telemetry
+
+START = datetime(2025, 4, 20, 8, 0, tzinfo=timezone.utc)
+
+
+def post_row(i, author="user1"):
+    return {"PostId": f"post{i}", "AuthorId": author, "Timestamp": (START + timedelta(hours=i)).isoformat(),
+            "ImageUrl": None, "Content": f"Post {i}"}
+
+
+def workout_row(workout_id, end=None):
+    return {"WorkoutId": workout_id, "UserId": "user1", "StartTimestamp": START.isoformat(),
+            "EndTimestamp": end.isoformat() if end else None, "TotalSteps": 100}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReplica(unittest.TestCase):
+
+    def setUp(self):
+        self.remote = SQLiteBackend(":memory:")
+        set_storage_backend(self.remote)
+        self.addCleanup(set_storage_backend, None)
+        self.local = SQLiteBackend(":memory:")
+        self.clock = FakeClock()
+        self.replica = Replica(self.local, clock=self.clock)
+        set_replica(self.replica)
+        self.addCleanup(set_replica, None)
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+        overlap = patch("replica.REPLICA_SYNC_OVERLAP", 0)
+        overlap.start()
+        self.addCleanup(overlap.stop)
+
+    def test_only_rows_past_the_watermark_are_pulled(self):
+        """Test that after the first sync, syncs pull rows from the watermark on."""
+        self.remote.insert_rows("Posts", [post_row(i) for i in range(3)])
+        self.assertEqual(self.replica.sync("user1", "Posts"), 3)
+        self.assertEqual(self.replica.watermark("user1", "Posts"), START + timedelta(hours=2))
+
+        self.remote.insert_rows("Posts", [post_row(3), post_row(4, author="user2")])
+        # The row at the watermark is read again, and nothing older
+        self.assertEqual(self.replica.sync("user1", "Posts"), 2)
+        self.assertEqual(self.replica.watermark("user1", "Posts"), START + timedelta(hours=3))
+        self.assertEqual(self.replica.stats()["rows_pulled"], 5)
+
+    def test_reads_are_served_locally_until_stale(self):
+        """Test that fetchers read the replica and sync once the staleness bound passes."""
+        self.remote.insert_rows("Posts", [post_row(0)])
+        self.assertEqual(len(get_user_posts("user1")), 1)
+
+        self.remote.insert_rows("Posts", [post_row(1)])
+        clear_caches()
+        self.assertEqual(len(get_user_posts("user1")), 1)
+        self.assertEqual(self.replica.stats()["syncs"], 1)
+
+        self.clock.now += REPLICA_MAX_STALENESS["Posts"]
+        clear_caches()
+        self.assertEqual([post.post_id for post in get_user_posts("user1")], ["post0", "post1"])
+        self.assertEqual(self.replica.stats()["syncs"], 2)
+
+    def test_workouts_in_progress_are_updated(self):
+        """Test that a workout without an end is pulled again once it ends."""
+        self.remote.insert_rows("Workouts", [workout_row("workout1", end=START)])
+        self.remote.insert_rows("Workouts", [workout_row("workout2")])
+        self.replica.sync("user1", "Workouts")
+
+        self.remote.insert_rows("Workouts", [workout_row("workout2", end=START + timedelta(hours=1))], replace=True)
+        self.replica.sync("user1", "Workouts")
+
+        workouts = {workout.workout_id: workout for workout in get_user_workouts("user1")}
+        self.assertEqual(workouts["workout2"].end_timestamp, START + timedelta(hours=1))
+
+    def test_watermarks_survive_a_restart(self):
+        """Test that a new Replica on the same database resumes from the stored state."""
+        self.remote.insert_rows("Posts", [post_row(0)])
+        self.replica.sync("user1", "Posts")
+
+        restarted = Replica(self.local, clock=self.clock)
+        self.assertEqual(restarted.watermark("user1", "Posts"), START)
+        self.assertTrue(restarted.is_fresh("user1", "Posts"))
+
+    def test_written_rows_are_copied_in(self):
+        """Test that rows flushed by the write buffer appear before the next sync."""
+        self.assertEqual(get_user_posts("user1"), [])
+
+        _replicate_written_rows("Posts", [post_row(0)])
+        clear_caches()
+        self.assertEqual([post.post_id for post in get_user_posts("user1")], ["post0"])
+        self.assertEqual(self.replica.stats()["syncs"], 1)
+
+    def test_local_reads_are_instrumented(self):
+        """Test that the replica's own queries are recorded and attributed to the fetcher."""
+        self.remote.insert_rows("Posts", [post_row(0)])
+        self.replica.sync("user1", "Posts")
+        get_telemetry().clear()
+        self.addCleanup(get_telemetry().clear)
+
+        get_user_posts("user1")
+
+        (event,) = get_telemetry().recent()
+        self.assertEqual((event.operation, event.caller, event.rows), ("query", "data_fetcher.get_user_posts", 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
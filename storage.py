@@ -0,0 +1,485 @@
+#############################################################################
+# storage.py
+#
+# This file contains the storage backends the fetchers and writers go
+# through.
+#
+# Every query in the app is written in BigQuery SQL against the
+# `sectiona4project.ISE.*` tables. BigQueryBackend sends them to BigQuery as
+# before. SQLiteBackend holds the same tables in an embedded SQLite database
+# and runs the same queries on it, after translating the few BigQuery
+# constructs they use, so a per-user lookup takes a millisecond instead of a
+# job round trip, and the app, its tests and the benchmarks can run without
+# the cloud.
+#
+# Choose the backend with the STORAGE_BACKEND environment variable
+# ("bigquery" or "sqlite"; SQLITE_PATH names the database file), or install
+# one with set_storage_backend. Create an empty database with:
+#
+#     python -m storage --init [PATH]
+#############################################################################
+
+import argparse
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timezone
+
+import pyarrow as pa
+from google.cloud import bigquery
+from google.cloud.bigquery.table import Row
+
+from clients import get_bigquery_client
+from telemetry import InstrumentedBackend
+
+DATASET = "ISE"
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "bigquery")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "ise.sqlite3")
+
+# The tables of the ISE dataset: their columns with BigQuery types, and the
+# columns whose value identifies a row (inserting the same key twice keeps
+# the first row, as BigQuery does for a repeated insert ID).
+TABLES = {
+    "Users": {
+        "columns": [
+            ("UserId", "STRING"),
+            ("Name", "STRING"),
+            ("Username", "STRING"),
+            ("ImageUrl", "STRING"),
+            ("DateOfBirth", "DATE"),
+        ],
+        "key": ("UserId",),
+    },
+    "Workouts": {
+        "columns": [
+            ("WorkoutId", "STRING"),
+            ("UserId", "STRING"),
+            ("StartTimestamp", "TIMESTAMP"),
+            ("EndTimestamp", "TIMESTAMP"),
+            ("StartLocationLat", "FLOAT64"),
+            ("StartLocationLong", "FLOAT64"),
+            ("EndLocationLat", "FLOAT64"),
+            ("EndLocationLong", "FLOAT64"),
+            ("TotalDistance", "FLOAT64"),
+            ("TotalSteps", "INT64"),
+            ("CaloriesBurned", "FLOAT64"),
+        ],
+        "key": ("WorkoutId",),
+    },
+    "SensorData": {
+        "columns": [
+            ("SensorId", "STRING"),
+            ("WorkoutID", "STRING"),
+            ("Timestamp", "TIMESTAMP"),
+            ("SensorValue", "FLOAT64"),
+        ],
+        "key": (),
+    },
+    "SensorTypes": {
+        "columns": [
+            ("SensorId", "STRING"),
+            ("Name", "STRING"),
+            ("Units", "STRING"),
+        ],
+        "key": ("SensorId",),
+    },
+    "Posts": {
+        "columns": [
+            ("PostId", "STRING"),
+            ("AuthorId", "STRING"),
+            ("Timestamp", "TIMESTAMP"),
+            ("ImageUrl", "STRING"),
+            ("Content", "STRING"),
+        ],
+        "key": ("PostId",),
+    },
+    "Friends": {
+        "columns": [
+            ("UserId1", "STRING"),
+            ("UserId2", "STRING"),
+        ],
+        "key": (),
+    },
+    "CalorieTracking": {
+        "columns": [
+            ("MealId", "STRING"),
+            ("UserId", "STRING"),
+            ("MealName", "STRING"),
+            ("Calories", "FLOAT64"),
+            ("Protein", "FLOAT64"),
+            ("Carbs", "FLOAT64"),
+            ("Fats", "FLOAT64"),
+            ("MealDate", "DATE"),
+            ("CreatedAt", "TIMESTAMP"),
+        ],
+        "key": ("MealId",),
+    },
+}
+
+# The indexes behind each table's per-user and per-workout lookups.
+INDEXES = {
+    "Workouts": [("UserId", "StartTimestamp")],
+    "SensorData": [("WorkoutID", "Timestamp")],
+    "Posts": [("AuthorId", "Timestamp", "PostId"), ("Timestamp", "PostId")],
+    "Friends": [("UserId1",), ("UserId2",)],
+    "CalorieTracking": [("UserId", "MealDate")],
+}
+
+# DailyNutrition is a table kept up to date by nutrition_rollups.py in
+# BigQuery. Summing a user's meals is as fast as reading the rollup here, so
+# SQLite derives it from CalorieTracking as a view and never needs a rebuild.
+DAILY_NUTRITION_VIEW = """
+    CREATE VIEW IF NOT EXISTS DailyNutrition AS
+    SELECT
+        UserId,
+        MealDate,
+        SUM(Calories) AS TotalCalories,
+        SUM(Protein) AS TotalProtein,
+        SUM(Fats) AS TotalFats,
+        SUM(Carbs) AS TotalCarbs,
+        COUNT(*) AS MealCount,
+        MAX(CreatedAt) AS UpdatedAt
+    FROM CalorieTracking
+    WHERE MealDate IS NOT NULL
+    GROUP BY UserId, MealDate
+"""
+
+_SQLITE_TYPES = {"STRING": "TEXT", "DATE": "TEXT", "TIMESTAMP": "TEXT", "FLOAT64": "REAL", "INT64": "INTEGER"}
+_ARROW_TYPES = {
+    "STRING": pa.string(),
+    "DATE": pa.date32(),
+    "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+    "FLOAT64": pa.float64(),
+    "INT64": pa.int64(),
+}
+
+# Result columns are typed by name. Names shared between tables have the same
+# type in each.
+COLUMN_TYPES = {name: kind for table in TABLES.values() for name, kind in table["columns"]}
+COLUMN_TYPES.update({
+    "TotalCalories": "FLOAT64", "TotalProtein": "FLOAT64", "TotalFats": "FLOAT64",
+    "TotalCarbs": "FLOAT64", "MealCount": "INT64", "UpdatedAt": "TIMESTAMP",
+})
+
+# Timestamps are stored as UTC text in one fixed-width format, so comparing
+# and sorting them as text orders them in time, and SQLite's date() reads them.
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+class StorageBackend:
+    """The operations the app performs on the ISE tables.
+
+    Attributes:
+        name (str): The backend's STORAGE_BACKEND name.
+        derived_tables (frozenset): Tables the backend computes from others,
+            which must not be written to or maintained.
+    """
+    name = None
+    derived_tables = frozenset()
+
+    def query(self, sql, query_parameters=(), maximum_bytes_billed=None):
+        """Runs a BigQuery SQL query with bigquery query parameters.
+
+        maximum_bytes_billed, if given, makes the query fail rather than be
+        billed for more bytes; backends that do not bill ignore it.
+
+        Returns:
+            A job with result() (an iterator of rows with attribute access),
+            to_arrow() and to_dataframe(), as a BigQuery QueryJob has.
+        """
+        raise NotImplementedError
+
+    def estimate_bytes(self, sql, query_parameters=()):
+        """Returns the bytes a query would scan without running it, or None if unknown."""
+        return None
+
+    def insert_rows(self, table, rows, row_ids=None):
+        """Inserts rows (dicts of column values) into the named table.
+
+        Returns:
+            list: One {"index": i, "errors": [...]} per row that failed, as
+            BigQuery's insert_rows_json reports; empty on success.
+        """
+        raise NotImplementedError
+
+
+class BigQueryBackend(StorageBackend):
+    """Runs everything on BigQuery through the process's shared client."""
+    name = "bigquery"
+
+    def query(self, sql, query_parameters=(), maximum_bytes_billed=None):
+        client = get_bigquery_client()
+        job_config = bigquery.QueryJobConfig(query_parameters=list(query_parameters))
+        if maximum_bytes_billed is not None:
+            job_config.maximum_bytes_billed = maximum_bytes_billed
+        return client.query(sql, job_config=job_config)
+
+    def estimate_bytes(self, sql, query_parameters=()):
+        client = get_bigquery_client()
+        job = client.query(
+            sql,
+            job_config=bigquery.QueryJobConfig(
+                query_parameters=list(query_parameters), dry_run=True, use_query_cache=False,
+            )
+        )
+        return job.total_bytes_processed
+
+    def insert_rows(self, table, rows, row_ids=None):
+        client = get_bigquery_client()
+        return client.insert_rows_json(client.dataset(DATASET).table(table), rows, row_ids=row_ids)
+
+
+@functools.lru_cache(maxsize=None)
+def translate_sql(sql):
+    """Rewrites a query of this app from BigQuery SQL into SQLite SQL.
+
+    Only the constructs the app's queries use are handled: qualified table
+    names, @parameters, IN UNNEST(@array), CURRENT_DATE() and IF().
+    """
+    sql = re.sub(r"`(?:[\w-]+\.)*(\w+)`", r"\1", sql)
+    sql = re.sub(r"IN\s+UNNEST\(\s*@(\w+)\s*\)", r"IN (SELECT value FROM json_each(:\1))", sql, flags=re.I)
+    sql = re.sub(r"@(\w+)", r":\1", sql)
+    sql = re.sub(r"\bCURRENT_DATE\(\)", "date('now')", sql, flags=re.I)
+    sql = re.sub(r"\bIF\(", "iif(", sql, flags=re.I)
+    return sql
+
+
+def _to_sqlite(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.strftime(_TIMESTAMP_FORMAT)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _parameter_value(parameter):
+    if isinstance(parameter, bigquery.ArrayQueryParameter):
+        return json.dumps([_to_sqlite(value) for value in parameter.values])
+    value = parameter.value
+    if isinstance(value, str) and parameter.type_ == "TIMESTAMP":
+        return _column_to_sqlite("TIMESTAMP", value)
+    return _to_sqlite(value)
+
+
+def _column_to_sqlite(kind, value):
+    """Converts a value written to a column into its stored form."""
+    if value is None:
+        return None
+    if kind == "TIMESTAMP" and isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    elif kind == "DATE" and isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return _to_sqlite(value)
+
+
+def _column_from_sqlite(kind, value):
+    """Converts a stored value into the Python type BigQuery returns."""
+    if value is None or kind is None:
+        return value
+    if kind == "TIMESTAMP":
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+    if kind == "DATE":
+        return date.fromisoformat(value)
+    if kind == "FLOAT64":
+        return float(value)
+    return value
+
+
+class SQLiteRowIterator:
+    """The rows of a SQLiteQueryJob, with total_rows like a BigQuery RowIterator."""
+
+    def __init__(self, rows):
+        self.total_rows = len(rows)
+        self._rows = iter(rows)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._rows)
+
+
+class SQLiteQueryJob:
+    """A finished SQLite query, read the way the fetchers read a QueryJob.
+
+    created and started are when it was submitted and when it got the
+    connection, as on a QueryJob.
+    """
+
+    def __init__(self, names, rows, created=None, started=None):
+        self._names = names
+        self._rows = rows
+        self.created = created
+        self.started = started
+
+    def result(self):
+        index = {name: i for i, name in enumerate(self._names)}
+        return SQLiteRowIterator([Row(values, index) for values in self._rows])
+
+    def to_arrow(self, **kwargs):
+        arrays = []
+        for i, name in enumerate(self._names):
+            kind = COLUMN_TYPES.get(name)
+            values = [row[i] for row in self._rows]
+            arrays.append(pa.array(values, type=_ARROW_TYPES[kind]) if kind else pa.array(values))
+        return pa.Table.from_arrays(arrays, names=list(self._names))
+
+    def to_dataframe(self, **kwargs):
+        return self.to_arrow().to_pandas()
+
+
+class SQLiteBackend(StorageBackend):
+    """The ISE tables in an embedded SQLite database.
+
+    One connection is shared by every thread; SQLite serializes the
+    statements anyway, and each one takes well under a millisecond for the
+    per-user lookups the app makes.
+
+    Args:
+        path (str): The database file, created with the schema if missing.
+            ":memory:" keeps the database in this process only.
+    """
+    name = "sqlite"
+    derived_tables = frozenset({"DailyNutrition"})
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self.create_schema()
+
+    def create_schema(self):
+        """Creates any missing table, index and view."""
+        statements = []
+        for table, spec in TABLES.items():
+            columns = [f"{name} {_SQLITE_TYPES[kind]}" for name, kind in spec["columns"]]
+            if spec["key"]:
+                columns.append(f"PRIMARY KEY ({', '.join(spec['key'])})")
+            statements.append(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+            for columns in INDEXES.get(table, ()):
+                statements.append(
+                    f"CREATE INDEX IF NOT EXISTS {table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+                )
+        statements.append(DAILY_NUTRITION_VIEW)
+        with self._lock:
+            for statement in statements:
+                self._connection.execute(statement)
+
+    def query(self, sql, query_parameters=(), maximum_bytes_billed=None):
+        parameters = {parameter.name: _parameter_value(parameter) for parameter in query_parameters}
+        created = datetime.now(timezone.utc)
+        with self._lock:
+            started = datetime.now(timezone.utc)
+            cursor = self._connection.execute(translate_sql(sql), parameters)
+            names = [column[0] for column in cursor.description or ()]
+            rows = cursor.fetchall()
+        kinds = [COLUMN_TYPES.get(name) for name in names]
+        rows = [
+            tuple(_column_from_sqlite(kind, value) for kind, value in zip(kinds, row))
+            for row in rows
+        ]
+        return SQLiteQueryJob(names, rows, created, started)
+
+    def insert_rows(self, table, rows, row_ids=None, replace=False):
+        """Inserts rows as StorageBackend.insert_rows does.
+
+        With replace, a row whose key is already stored overwrites it
+        instead of being dropped.
+        """
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        columns = dict(TABLES[table]["columns"])
+        errors = []
+        values = []
+        for i, row in enumerate(rows):
+            unknown = sorted(set(row) - set(columns))
+            if unknown:
+                errors.append({"index": i, "errors": [
+                    {"reason": "invalid", "message": f"no such field: {name}"} for name in unknown
+                ]})
+                continue
+            try:
+                values.append([_column_to_sqlite(kind, row.get(name)) for name, kind in columns.items()])
+            except (TypeError, ValueError) as e:
+                errors.append({"index": i, "errors": [{"reason": "invalid", "message": str(e)}]})
+
+        statement = (
+            f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(statement, values)
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return errors
+
+    def execute(self, sql, parameters=()):
+        """Runs a SQLite statement as it is and returns its rows as tuples."""
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+_backend_lock = threading.Lock()
+_backend = None
+
+
+def _default_backend():
+    if STORAGE_BACKEND == "bigquery":
+        return BigQueryBackend()
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteBackend(SQLITE_PATH)
+    raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+
+
+def get_storage_backend():
+    """Returns the backend for this process, creating it on first use.
+
+    The backend is wrapped in telemetry.InstrumentedBackend, so every call
+    through it is recorded.
+    """
+    global _backend
+    backend = _backend
+    if backend is not None:
+        return backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = InstrumentedBackend(_default_backend())
+        return _backend
+
+
+def set_storage_backend(backend):
+    """Installs a backend (e.g. an in-memory SQLiteBackend) for this process.
+
+    Passing None drops the current backend so the next call builds the one
+    STORAGE_BACKEND names.
+    """
+    global _backend
+    if backend is not None and not isinstance(backend, InstrumentedBackend):
+        backend = InstrumentedBackend(backend)
+    with _backend_lock:
+        _backend = backend
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create an empty SQLite database with the ISE tables.")
+    parser.add_argument("--init", nargs="?", const=SQLITE_PATH, metavar="PATH", required=True,
+                        help=f"the database file (default {SQLITE_PATH})")
+    args = parser.parse_args()
+    SQLiteBackend(args.init).close()
+    print(f"Created the ISE tables in {args.init}")
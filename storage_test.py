@@ -0,0 +1,154 @@
+#############################################################################
+# storage_test.py
+#
+# This file contains tests for storage.py. The fetchers run their real
+# queries on an in-memory SQLite database.
+#############################################################################
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+
+import community
+from data_fetcher import (
+    clear_caches,
+    get_user_calorie_summary,
+    get_user_calorie_tracking_between,
+    get_user_posts,
+    get_user_profile,
+    get_user_sensor_data,
+    get_user_today_calorie_tracking,
+    get_user_workouts,
+    get_user_workouts_by_date,
+)
+from friend_graph import get_friend_graph
+from nutrition_rollups import record_meal
+from storage import SQLiteBackend, set_storage_backend, translate_sql
+from timeline_store import get_timeline_store
+
+START = datetime(2025, 4, 20, 8, 0, tzinfo=timezone.utc)
+
+
+class TestTranslateSql(unittest.TestCase):
+
+    def test_bigquery_constructs_are_rewritten(self):
+        """Test that table names, parameters, UNNEST, CURRENT_DATE and IF are translated."""
+        sql = translate_sql(
+            "SELECT IF(x, 1, 2) FROM `sectiona4project.ISE.Posts` "
+            "WHERE AuthorId IN UNNEST(@ids) AND Day = CURRENT_DATE() AND Id = @id"
+        )
+        self.assertEqual(
+            sql,
+            "SELECT iif(x, 1, 2) FROM Posts "
+            "WHERE AuthorId IN (SELECT value FROM json_each(:ids)) AND Day = date('now') AND Id = :id"
+        )
+
+
+class TestSQLiteBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = SQLiteBackend(":memory:")
+        set_storage_backend(self.backend)
+        self.addCleanup(set_storage_backend, None)
+        clear_caches()
+        self.addCleanup(clear_caches)
+        get_friend_graph().invalidate()
+        get_timeline_store().clear()
+
+        self.insert("Users", [
+            {"UserId": "user1", "Name": "Alice", "Username": "alice", "ImageUrl": None, "DateOfBirth": "1990-01-02"},
+            {"UserId": "user2", "Name": "Bob", "Username": "bob", "ImageUrl": "bob.png", "DateOfBirth": None},
+        ])
+        self.insert("Workouts", [{
+            "WorkoutId": "workout1", "UserId": "user1",
+            "StartTimestamp": START.isoformat(), "EndTimestamp": (START + timedelta(hours=1)).isoformat(),
+            "StartLocationLat": 37.1, "StartLocationLong": -122.1, "EndLocationLat": 37.2,
+            "EndLocationLong": -122.2, "TotalDistance": 5.0, "TotalSteps": 6000, "CaloriesBurned": 300.0,
+        }])
+        self.insert("SensorTypes", [{"SensorId": "sensor1", "Name": "Heart Rate", "Units": "bpm"}])
+        self.insert("SensorData", [
+            {"SensorId": "sensor1", "WorkoutID": "workout1",
+             "Timestamp": (START + timedelta(minutes=i)).isoformat(), "SensorValue": 120 + i}
+            for i in (1, 0)
+        ])
+        self.insert("Friends", [{"UserId1": "user1", "UserId2": "user2"}])
+        self.insert("Posts", [
+            {"PostId": f"post{i}", "AuthorId": "user2", "Timestamp": (START + timedelta(hours=i)).isoformat(),
+             "ImageUrl": None, "Content": f"Post {i}"}
+            for i in range(3)
+        ])
+
+    def insert(self, table, rows):
+        self.assertEqual(self.backend.insert_rows(table, rows), [])
+
+    def meal(self, meal_id, day, calories):
+        return {"MealId": meal_id, "UserId": "user1", "MealName": "Lunch", "Calories": calories,
+                "Protein": 10.0, "Carbs": 20.0, "Fats": 5.0, "MealDate": day.isoformat(),
+                "CreatedAt": START.isoformat()}
+
+    def test_rows_come_back_with_bigquery_types(self):
+        """Test that fetchers get datetimes, dates and numbers as from BigQuery."""
+        workout = get_user_workouts("user1")[0]
+        self.assertEqual(workout.start_timestamp, START)
+        self.assertEqual(workout.start_lat_lng, (37.1, -122.1))
+        self.assertEqual(workout.steps, 6000)
+
+        profile = get_user_profile("user1")
+        self.assertEqual(profile["full_name"], "Alice")
+        self.assertEqual(profile.date_of_birth, date(1990, 1, 2))
+
+        readings = get_user_sensor_data("user1", "workout1")
+        self.assertEqual([r["data"] for r in readings], [120, 121])
+        self.assertEqual(readings[0]["timestamp"], "2025-04-20T08:00:00")
+        self.assertEqual(len(get_user_sensor_data("user1", "workout1", columnar=True)["Heart Rate"].values), 2)
+
+        self.assertEqual(len(get_user_workouts_by_date("user1", "2025-04-20", "2025-04-20")), 1)
+        self.assertEqual(get_user_workouts_by_date("user1", "2025-04-21", "2025-04-22"), [])
+
+    def test_arrow_engine_reads_the_same_rows(self):
+        """Test that to_arrow results give the same records as row results."""
+        rows = get_user_workouts("user1")
+        clear_caches()
+        with patch.dict("data_fetcher.FETCH_ENGINES", workouts="arrow"):
+            self.assertEqual(get_user_workouts("user1"), rows)
+
+    def test_inserts_are_deduplicated_by_key(self):
+        """Test that a row inserted again with the same key is kept once."""
+        self.insert("Posts", [{"PostId": "post0", "AuthorId": "user2", "Timestamp": START.isoformat(),
+                               "ImageUrl": None, "Content": "Retried"}])
+        posts = get_user_posts("user2")
+        self.assertEqual(len(posts), 3)
+        self.assertEqual(posts[0]["timestamp"], "2025-04-20 08:00:00")
+
+        errors = self.backend.insert_rows("Posts", [{"PostId": "post9", "Unknown": 1}])
+        self.assertEqual(errors[0]["index"], 0)
+
+    def test_meals_and_derived_rollups(self):
+        """Test that today's meals and nutrition totals are read without a rollup table."""
+        today = datetime.utcnow().date()
+        self.insert("CalorieTracking", [
+            self.meal("meal1", today, 500.0),
+            self.meal("meal2", today, 250.0),
+            self.meal("meal3", today - timedelta(days=1), 100.0),
+        ])
+        record_meal("user1", today, 500.0, 10.0, 5.0, 20.0)  # nothing to maintain
+
+        self.assertEqual(len(get_user_today_calorie_tracking("user1")), 2)
+        self.assertEqual(len(get_user_calorie_tracking_between("user1", today - timedelta(days=1), today)), 3)
+
+        summary = get_user_calorie_summary("user1", today - timedelta(days=1), today)
+        self.assertEqual(summary["total_calories"].tolist(), [100.0, 750.0])
+        self.assertEqual(summary["meal_count"].tolist(), [1, 2])
+
+    def test_feed_pages_use_the_cursor(self):
+        """Test that the community feed query pages through posts newest first."""
+        first = community.get_friends_feed.uncached("user1", None, 2)
+        self.assertEqual([post.post_id for post in first.posts], ["post2", "post1"])
+        self.assertEqual(first.posts[0].author_username, "bob")
+
+        second = community.get_friends_feed.uncached("user1", first.next_cursor, 2)
+        self.assertEqual([post.post_id for post in second.posts], ["post0"])
+        self.assertIsNone(second.next_cursor)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,374 @@
+#############################################################################
+# telemetry.py
+#
+# This file contains the instrumentation of every query and insert the app
+# sends to its storage backend.
+#
+# get_storage_backend() hands out the backend wrapped in InstrumentedBackend,
+# so the fetchers, the community feed, the friend graph, the rollups, the
+# replica and the write buffer are all measured without changes of their
+# own. Each call is recorded with:
+#   - its wall latency, from submitting the query until its rows are read;
+#   - the time the job waited before it started (BigQuery's queue, or the
+#     wait for SQLite's connection);
+#   - the rows returned or inserted and the bytes BigQuery processed;
+#   - the function that issued it, and the page it was issued for.
+#
+# Calls are aggregated per (caller, operation): totals since start, and
+# latency percentiles over the last TELEMETRY_WINDOW calls. The last
+# TELEMETRY_RECENT calls are kept as they are, so one rerun's queries can be
+# seen together. Cache hit counts come from cache.py.
+#
+# modules.display_query_debug_panel shows all this at the bottom of each page
+# when QUERY_DEBUG_PANEL=1 or the URL has ?debug=1. Set
+# TELEMETRY_EXPORT_PATH to write the Prometheus text format to that file
+# every TELEMETRY_EXPORT_INTERVAL seconds, e.g. for node_exporter's textfile
+# collector.
+#############################################################################
+
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from cache import cache_stats
+
+QUERY_DEBUG_PANEL = os.environ.get("QUERY_DEBUG_PANEL", "0") == "1"
+TELEMETRY_EXPORT_PATH = os.environ.get("TELEMETRY_EXPORT_PATH", "")
+TELEMETRY_EXPORT_INTERVAL = 15.0
+
+# Calls per (caller, operation) that the latency percentiles cover.
+TELEMETRY_WINDOW = 1000
+# Calls kept individually for the debug panel.
+TELEMETRY_RECENT = 100
+TELEMETRY_QUANTILES = (0.5, 0.9, 0.99)
+
+# The functions that draw each page; a call made under one is attributed to it.
+PAGE_FUNCTIONS = {"display_app_page", "display_activity_page", "display_meal_entry_page", "community_page"}
+# Modules between a caller and the backend, skipped when naming the caller.
+_PLUMBING_MODULES = {"telemetry", "storage", "queries", "replica", "cache", "threading", "thread", "page_loader"}
+
+_page = contextvars.ContextVar("telemetry_page", default=None)
+
+
+class QueryEvent(NamedTuple):
+    """One call to the storage backend.
+
+    Attributes:
+        operation (str): "query" or "insert".
+        caller (str): The module and function that made the call, e.g.
+            "data_fetcher.get_user_workouts".
+        page (str): The PAGE_FUNCTIONS entry it was made for, or None.
+        started_at (float): When it was made, in seconds since the epoch.
+        latency (float): Seconds until its rows were read or inserted.
+        queue_time (float): Seconds the job waited to start, or None.
+        rows (int): Rows returned or inserted, or None if unknown.
+        bytes_processed (int): Bytes BigQuery billed the query for, or None.
+        error (str): The error it failed with, or None.
+    """
+    operation: str
+    caller: str
+    page: Optional[str]
+    started_at: float
+    latency: float
+    queue_time: Optional[float]
+    rows: Optional[int]
+    bytes_processed: Optional[int]
+    error: Optional[str]
+
+
+def _module_name(frame):
+    return os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+
+
+def _attribution():
+    """Returns (caller, page) for a call made from the current stack."""
+    frame = sys._getframe(2)
+    caller = fallback = page = None
+    while frame is not None:
+        module = _module_name(frame)
+        function = frame.f_code.co_name
+        if module not in _PLUMBING_MODULES:
+            name = f"{module}.{function}"
+            fallback = fallback or name
+            # Helpers like _run_query name the query less well than their caller
+            if caller is None and not function.startswith(("_", "<")):
+                caller = name
+            if function in PAGE_FUNCTIONS:
+                page = function
+        frame = frame.f_back
+    return caller or fallback or "unknown", page or _page.get()
+
+
+def current_page():
+    """Returns the page function the current call is made for, or None."""
+    return _attribution()[1]
+
+
+def carry_page(func):
+    """Wraps func so calls it makes on another thread count toward the current page."""
+    page = current_page()
+
+    def run(*args, **kwargs):
+        token = _page.set(page)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _page.reset(token)
+    return run
+
+
+class _Series:
+    """The aggregate of one (caller, operation)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.queue_total = 0.0
+        self.rows = 0
+        self.bytes_processed = 0
+        self.latencies = deque(maxlen=TELEMETRY_WINDOW)
+
+    def add(self, event):
+        self.calls += 1
+        self.errors += event.error is not None
+        self.latency_total += event.latency
+        self.queue_total += event.queue_time or 0.0
+        self.rows += event.rows or 0
+        self.bytes_processed += event.bytes_processed or 0
+        self.latencies.append(event.latency)
+
+
+def _quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+class QueryTelemetry:
+    """Collects QueryEvents and aggregates them per caller and operation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._recent = deque(maxlen=TELEMETRY_RECENT)
+        self._exporter = None
+
+    def record(self, event):
+        with self._lock:
+            series = self._series.get((event.caller, event.operation))
+            if series is None:
+                series = self._series[event.caller, event.operation] = _Series()
+            series.add(event)
+            self._recent.append(event)
+        if TELEMETRY_EXPORT_PATH and self._exporter is None:
+            self._start_exporter()
+
+    def recent(self):
+        """Returns the last TELEMETRY_RECENT events, oldest first."""
+        with self._lock:
+            return list(self._recent)
+
+    def summary(self):
+        """Returns one dict per (caller, operation), slowest p90 first.
+
+        Each has caller, operation, calls, errors, rows, bytes_processed,
+        mean_latency, mean_queue_time, and p50, p90 and p99 latency in
+        seconds over the last TELEMETRY_WINDOW calls.
+        """
+        with self._lock:
+            items = [(key, series, sorted(series.latencies)) for key, series in self._series.items()]
+        rows = []
+        for (caller, operation), series, ordered in items:
+            row = {
+                "caller": caller,
+                "operation": operation,
+                "calls": series.calls,
+                "errors": series.errors,
+                "rows": series.rows,
+                "bytes_processed": series.bytes_processed,
+                "mean_latency": series.latency_total / series.calls,
+                "mean_queue_time": series.queue_total / series.calls,
+            }
+            for q in TELEMETRY_QUANTILES:
+                row[f"p{round(q * 100)}"] = _quantile(ordered, q)
+            rows.append(row)
+        return sorted(rows, key=lambda row: row["p90"], reverse=True)
+
+    def prometheus(self):
+        """Returns every aggregate, and the cache counters, in the Prometheus text format."""
+        with self._lock:
+            items = [(key, series, sorted(series.latencies)) for key, series in sorted(self._series.items())]
+        lines = [
+            "# HELP ise_query_latency_seconds Wall time of storage calls; quantiles over recent calls.",
+            "# TYPE ise_query_latency_seconds summary",
+        ]
+        for (caller, operation), series, ordered in items:
+            labels = f'caller="{_escape(caller)}",operation="{operation}"'
+            for q in TELEMETRY_QUANTILES:
+                lines.append(f'ise_query_latency_seconds{{{labels},quantile="{q}"}} {_quantile(ordered, q)}')
+            lines.append(f"ise_query_latency_seconds_sum{{{labels}}} {series.latency_total}")
+            lines.append(f"ise_query_latency_seconds_count{{{labels}}} {series.calls}")
+        for name, attribute, help_text in [
+            ("ise_query_queue_seconds_total", "queue_total", "Seconds storage calls waited to start."),
+            ("ise_query_rows_total", "rows", "Rows returned by queries or written by inserts."),
+            ("ise_query_bytes_processed_total", "bytes_processed", "Bytes processed by queries."),
+            ("ise_query_errors_total", "errors", "Storage calls that failed."),
+        ]:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (caller, operation), series, _ in items:
+                labels = f'caller="{_escape(caller)}",operation="{operation}"'
+                lines.append(f"{name}{{{labels}}} {getattr(series, attribute)}")
+
+        caches = sorted(cache_stats().items())
+        for name, field, help_text in [
+            ("ise_cache_hits_total", "hits", "Fetcher results served from a cache."),
+            ("ise_cache_misses_total", "misses", "Fetcher results not found in a cache."),
+        ]:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for cache, stats in caches:
+                lines.append(f'{name}{{cache="{_escape(cache)}"}} {stats[field]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Writes prometheus() to path, replacing it atomically."""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            f.write(self.prometheus())
+        os.replace(temporary, path)
+
+    def _start_exporter(self):
+        def run():
+            while True:
+                time.sleep(TELEMETRY_EXPORT_INTERVAL)
+                try:
+                    self.export(TELEMETRY_EXPORT_PATH)
+                except Exception as e:
+                    print(f"Could not export query telemetry: {e}")
+
+        with self._lock:
+            if self._exporter is None:
+                self._exporter = threading.Thread(target=run, name="telemetry-export", daemon=True)
+                self._exporter.start()
+
+    def clear(self):
+        """Forgets every event and aggregate."""
+        with self._lock:
+            self._series.clear()
+            self._recent.clear()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    # Mocked jobs answer every attribute; only real numbers count
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _queue_time(job):
+    created, started = getattr(job, "created", None), getattr(job, "started", None)
+    if isinstance(created, datetime) and isinstance(started, datetime):
+        return max(0.0, (started - created).total_seconds())
+    return None
+
+
+class _InstrumentedJob:
+    """A query job that records its call once its rows are read."""
+
+    def __init__(self, job, telemetry, caller, page, started_at, started):
+        self._job = job
+        self._telemetry = telemetry
+        self._caller = caller
+        self._page = page
+        self._started_at = started_at
+        self._started = started
+        self._recorded = False
+
+    def _record(self, rows, error=None):
+        if self._recorded:
+            return
+        self._recorded = True
+        self._telemetry.record(QueryEvent(
+            "query", self._caller, self._page, self._started_at, time.perf_counter() - self._started,
+            _queue_time(self._job), rows, _number(getattr(self._job, "total_bytes_processed", None)), error,
+        ))
+
+    def _read(self, method, count, *args, **kwargs):
+        try:
+            result = getattr(self._job, method)(*args, **kwargs)
+        except Exception as e:
+            self._record(None, f"{type(e).__name__}: {e}")
+            raise
+        self._record(count(result))
+        return result
+
+    def result(self, *args, **kwargs):
+        return self._read("result", lambda rows: _number(getattr(rows, "total_rows", None)), *args, **kwargs)
+
+    def to_arrow(self, *args, **kwargs):
+        return self._read("to_arrow", lambda table: _number(getattr(table, "num_rows", None)), *args, **kwargs)
+
+    def to_dataframe(self, *args, **kwargs):
+        return self._read("to_dataframe", lambda frame: _number(len(frame)), *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._job, name)
+
+
+class InstrumentedBackend:
+    """Wraps a storage backend so every query and insert is recorded.
+
+    Args:
+        backend (StorageBackend): The backend doing the work.
+        telemetry (QueryTelemetry): Where calls are recorded.
+    """
+
+    def __init__(self, backend, telemetry=None):
+        self.backend = backend
+        self._telemetry = telemetry or get_telemetry()
+
+    def query(self, sql, query_parameters=(), **kwargs):
+        caller, page = _attribution()
+        started_at, started = time.time(), time.perf_counter()
+        try:
+            job = self.backend.query(sql, query_parameters, **kwargs)
+        except Exception as e:
+            self._telemetry.record(QueryEvent(
+                "query", caller, page, started_at, time.perf_counter() - started, None, None, None,
+                f"{type(e).__name__}: {e}",
+            ))
+            raise
+        return _InstrumentedJob(job, self._telemetry, caller, page, started_at, started)
+
+    def insert_rows(self, table, rows, *args, **kwargs):
+        caller, page = _attribution()
+        started_at, started = time.time(), time.perf_counter()
+        error = None
+        try:
+            errors = self.backend.insert_rows(table, rows, *args, **kwargs)
+            if errors:
+                error = f"{len(errors)} rows failed"
+            return errors
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._telemetry.record(QueryEvent(
+                "insert", caller, page, started_at, time.perf_counter() - started, None, len(rows), None, error,
+            ))
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+_telemetry = QueryTelemetry()
+
+
+def get_telemetry():
+    """Returns the telemetry shared by every session in this process."""
+    return _telemetry
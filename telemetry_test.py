@@ -0,0 +1,108 @@
+#############################################################################
+# telemetry_test.py
+#
+# This file contains tests for telemetry.py. The fetchers run their real
+# queries on an in-memory SQLite database; BigQuery jobs are mocked.
+#############################################################################
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from data_fetcher import clear_caches, get_user_posts
+from storage import SQLiteBackend, set_storage_backend
+from telemetry import InstrumentedBackend, QueryTelemetry, carry_page, get_telemetry
+
+START = datetime(2025, 4, 20, 8, 0, tzinfo=timezone.utc)
+
+
+def post_row(i):
+    return {"PostId": f"post{i}", "AuthorId": "user1", "Timestamp": START.isoformat(),
+            "ImageUrl": None, "Content": f"Post {i}"}
+
+
+def display_app_page(user_id):
+    """Stands in for the home page, which the telemetry recognises by name."""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(carry_page(get_user_posts), user_id).result()
+
+
+class TestFetcherTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = SQLiteBackend(":memory:")
+        set_storage_backend(self.backend)
+        self.addCleanup(set_storage_backend, None)
+        get_telemetry().clear()
+        self.addCleanup(get_telemetry().clear)
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+    def test_queries_are_attributed_to_fetcher_and_page(self):
+        """Test that a fetcher's query records its caller, rows and page, even on a pool thread."""
+        self.backend.insert_rows("Posts", [post_row(i) for i in range(3)])
+        self.assertEqual(len(display_app_page("user1")), 3)
+
+        (event,) = get_telemetry().recent()
+        self.assertEqual(event.operation, "query")
+        self.assertEqual(event.caller, "data_fetcher.get_user_posts")
+        self.assertEqual(event.page, "display_app_page")
+        self.assertEqual(event.rows, 3)
+        self.assertIsNotNone(event.queue_time)
+        self.assertIsNone(event.error)
+
+        # A cache hit issues no query
+        get_user_posts("user1")
+        (summary,) = get_telemetry().summary()
+        self.assertEqual((summary["calls"], summary["rows"]), (1, 3))
+        self.assertIn('ise_cache_hits_total{cache="posts"} 1', get_telemetry().prometheus())
+
+    def test_inserts_and_failures_are_recorded(self):
+        """Test that inserts count their rows and failed queries are recorded and raised."""
+        backend = InstrumentedBackend(self.backend)
+        backend.insert_rows("Posts", [post_row(0), {"Unknown": 1}])
+        with self.assertRaises(Exception):
+            backend.query("SELECT * FROM Missing").result()
+
+        insert, query = get_telemetry().recent()
+        self.assertEqual((insert.operation, insert.rows, insert.error), ("insert", 2, "1 rows failed"))
+        self.assertEqual(insert.caller, "telemetry_test.test_inserts_and_failures_are_recorded")
+        self.assertIn("no such table", query.error)
+
+
+class TestQueryTelemetry(unittest.TestCase):
+
+    def test_bigquery_job_statistics_are_read(self):
+        """Test that bytes processed and queue time come from the QueryJob."""
+        job = MagicMock(total_bytes_processed=2048, created=START, started=START + timedelta(seconds=2))
+        job.result.return_value = MagicMock(total_rows=5)
+        telemetry = QueryTelemetry()
+        InstrumentedBackend(MagicMock(**{"query.return_value": job}), telemetry).query("SELECT 1").result()
+
+        (event,) = telemetry.recent()
+        self.assertEqual((event.rows, event.bytes_processed, event.queue_time), (5, 2048, 2.0))
+
+    def test_prometheus_export(self):
+        """Test that the export has quantiles, sums and counts per caller, written to a file."""
+        telemetry = QueryTelemetry()
+        backend = InstrumentedBackend(MagicMock(), telemetry)
+        for _ in range(4):
+            backend.query("SELECT 1").to_dataframe()
+
+        text = telemetry.prometheus()
+        labels = 'caller="telemetry_test.test_prometheus_export",operation="query"'
+        self.assertIn(f'ise_query_latency_seconds{{{labels},quantile="0.99"}}', text)
+        self.assertIn(f"ise_query_latency_seconds_count{{{labels}}} 4", text)
+        self.assertIn("# TYPE ise_query_errors_total counter", text)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ise.prom")
+            telemetry.export(path)
+            with open(path) as f:
+                self.assertEqual(f.read(), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
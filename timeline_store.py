@@ -0,0 +1,186 @@
+#############################################################################
+# timeline_store.py
+#
+# This file contains the precomputed community feed timelines.
+#
+# Reading the feed used to mean querying every friend's posts sorted by
+# time. Instead each user has a timeline of their friends' newest posts,
+# kept newest last by (timestamp, post ID). Publishing a post appends it to
+# the timeline of each of the author's friends (fan-out on write), so
+# reading a feed page is a binary search and a slice of page size.
+#
+# Authors with more than TIMELINE_FANOUT_LIMIT friends would make every post
+# a large write, so their posts only go to their own outbox, and each reader
+# merges the outboxes of such friends in when reading (fan-out on read).
+#
+# LocalTimelineStore keeps everything in this process's memory. Timelines are
+# built on first read from the feed query and capped at TIMELINE_MAX_LENGTH
+# posts; pages older than that are read with the query again. A timeline is
+# rebuilt after TIMELINE_TTL seconds, which also picks up posts published by
+# other processes.
+#############################################################################
+
+import bisect
+import heapq
+import threading
+import time
+
+# Posts kept per timeline and per outbox; older ones are dropped.
+TIMELINE_MAX_LENGTH = 500
+# Authors with more friends than this are read from their outbox instead.
+TIMELINE_FANOUT_LIMIT = 1000
+# Seconds a timeline is read before it is built again from the query.
+TIMELINE_TTL = 3600
+
+
+def _key(post):
+    return (post.timestamp, post.post_id)
+
+
+def _entry_key(entry):
+    return entry[:2]
+
+
+class LocalTimelineStore:
+    """Per-user feed timelines held in memory.
+
+    Each timeline is a list of (timestamp, post_id, post) in ascending order.
+    Entries for the same post share one FeedPost, so a post costs one record
+    plus one small tuple per friend.
+
+    Args:
+        clock (callable): Returns the current time in seconds.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._timelines = {}
+        self._built_at = {}
+        self._complete = {}
+        self._outboxes = {}
+        self._heavy_authors = set()
+        self._lock = threading.Lock()
+        self.fanout_writes = 0
+
+    def has_timeline(self, user_id):
+        """Returns whether user_id's timeline is built and not expired."""
+        with self._lock:
+            built_at = self._built_at.get(user_id)
+            return built_at is not None and self._clock() < built_at + TIMELINE_TTL
+
+    def backfill(self, user_id, posts, complete):
+        """Builds user_id's timeline from posts read with the feed query.
+
+        Args:
+            user_id (str): The reader.
+            posts (list of FeedPost): Their friends' newest posts.
+            complete (bool): Whether posts holds every post of their friends,
+                so a read past the oldest one needs no query.
+        """
+        entries = sorted({post.post_id: (*_key(post), post) for post in posts}.values(), key=_entry_key)
+        with self._lock:
+            # Posts already in an outbox merged on read must not be stored twice
+            outboxed = {entry[1] for author in self._heavy_authors for entry in self._outboxes[author]}
+            entries = [entry for entry in entries if entry[1] not in outboxed]
+            self._timelines[user_id] = entries[-TIMELINE_MAX_LENGTH:]
+            self._built_at[user_id] = self._clock()
+            self._complete[user_id] = complete and len(entries) <= TIMELINE_MAX_LENGTH
+
+    def publish(self, post, friend_ids):
+        """Adds a new post to its author's outbox and, fanning out, to the
+        built timelines of the author's friends.
+
+        Args:
+            post (FeedPost): The post; post.user_id is the author.
+            friend_ids (iterable of str): The author's friends.
+        """
+        entry = (*_key(post), post)
+        friend_ids = list(friend_ids)
+        with self._lock:
+            outbox = self._outboxes.setdefault(post.user_id, [])
+            self._insert(outbox, entry)
+            if len(friend_ids) > TIMELINE_FANOUT_LIMIT:
+                self._heavy_authors.add(post.user_id)
+                return
+            for friend_id in friend_ids:
+                timeline = self._timelines.get(friend_id)
+                # Timelines not built yet get the post from the query later
+                if timeline is not None:
+                    if len(timeline) >= TIMELINE_MAX_LENGTH:
+                        # The oldest post is about to be dropped
+                        self._complete[friend_id] = False
+                    self._insert(timeline, entry)
+                    self.fanout_writes += 1
+
+    @staticmethod
+    def _insert(entries, entry):
+        if entries and entry[:2] < entries[-1][:2]:
+            bisect.insort(entries, entry, key=_entry_key)
+        else:
+            entries.append(entry)
+        if len(entries) > TIMELINE_MAX_LENGTH:
+            del entries[:len(entries) - TIMELINE_MAX_LENGTH]
+
+    def read_page(self, user_id, friend_ids, before=None, page_size=10):
+        """Reads a page of user_id's timeline, newest first.
+
+        Args:
+            user_id (str): The reader, whose timeline must have been built.
+            friend_ids (iterable of str): The reader's friends, used to merge
+                in the outboxes of authors not fanned out on write.
+            before (tuple): (timestamp, post_id) cursor; the page holds posts
+                strictly older. None for the newest page.
+            page_size (int): Most posts on the page.
+
+        Returns:
+            tuple: (posts, next_cursor) as in FeedPage, or None if the page
+            reaches past the stored posts of an incomplete timeline and must
+            be read with the query instead.
+        """
+        with self._lock:
+            timeline = self._timelines[user_id]
+            sources = [timeline] + [
+                self._outboxes[friend_id] for friend_id in friend_ids
+                if friend_id in self._heavy_authors and friend_id in self._outboxes
+            ]
+            # Newest first from each source, starting just before the cursor
+            streams = []
+            for entries in sources:
+                end = len(entries) if before is None else bisect.bisect_left(entries, before, key=_entry_key)
+                streams.append(entries[max(0, end - page_size - 1):end][::-1])
+            complete = self._complete[user_id]
+
+        merged = heapq.merge(*streams, key=_entry_key, reverse=True)
+        seen = set()
+        posts = []
+        for _, post_id, post in merged:
+            if post_id in seen:
+                continue
+            seen.add(post_id)
+            posts.append(post)
+            if len(posts) > page_size:
+                break
+
+        if len(posts) <= page_size and not complete:
+            # Older posts may exist beyond what is stored
+            return None
+        page = posts[:page_size]
+        next_cursor = _key(page[-1]) if len(posts) > page_size else None
+        return page, next_cursor
+
+    def clear(self):
+        """Drops every timeline and outbox."""
+        with self._lock:
+            self._timelines.clear()
+            self._built_at.clear()
+            self._complete.clear()
+            self._outboxes.clear()
+            self._heavy_authors.clear()
+
+
+_store = LocalTimelineStore()
+
+
+def get_timeline_store():
+    """Returns the timeline store shared by every session in this process."""
+    return _store
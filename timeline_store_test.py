@@ -0,0 +1,91 @@
+#############################################################################
+# timeline_store_test.py
+#
+# This file contains tests for timeline_store.py.
+#############################################################################
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from records import FeedPost
+from timeline_store import TIMELINE_TTL, LocalTimelineStore
+
+START = datetime(2025, 4, 20, tzinfo=timezone.utc)
+
+
+def post(i, author="user2"):
+    return FeedPost(author, f"post{i:03d}", START + timedelta(minutes=i), f"Post {i}", None, None, None, None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLocalTimelineStore(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = LocalTimelineStore(clock=self.clock)
+
+    def ids(self, page):
+        return [p.post_id for p in page[0]]
+
+    def test_pages_follow_the_cursor(self):
+        """Test that pages come newest first and continue after the cursor."""
+        self.store.backfill("user1", [post(i) for i in range(5)], complete=True)
+
+        first = self.store.read_page("user1", ["user2"], page_size=2)
+        second = self.store.read_page("user1", ["user2"], first[1], page_size=2)
+        last = self.store.read_page("user1", ["user2"], second[1], page_size=2)
+
+        self.assertEqual(self.ids(first), ["post004", "post003"])
+        self.assertEqual(self.ids(second), ["post002", "post001"])
+        self.assertEqual(self.ids(last), ["post000"])
+        self.assertIsNone(last[1])
+
+    def test_publish_fans_out_to_built_timelines(self):
+        """Test that a new post lands on each friend's built timeline, in order."""
+        self.store.backfill("user1", [post(1), post(5)], complete=True)
+
+        self.store.publish(post(3), ["user1", "user3"])
+
+        self.assertEqual(self.ids(self.store.read_page("user1", ["user2"])), ["post005", "post003", "post001"])
+        self.assertFalse(self.store.has_timeline("user3"))
+        self.assertEqual(self.store.fanout_writes, 1)
+
+    @patch("timeline_store.TIMELINE_FANOUT_LIMIT", 1)
+    def test_authors_with_many_friends_are_merged_on_read(self):
+        """Test that posts of authors over the fan-out limit are read from their outbox."""
+        self.store.backfill("user1", [post(1), post(4)], complete=True)
+
+        self.store.publish(post(2, author="celebrity"), ["user1", "user3"])
+        self.store.publish(post(3, author="celebrity"), ["user1", "user3"])
+
+        self.assertEqual(self.store.fanout_writes, 0)
+        self.assertEqual(self.ids(self.store.read_page("user1", ["user2", "celebrity"])),
+                         ["post004", "post003", "post002", "post001"])
+        self.assertEqual(self.ids(self.store.read_page("user1", ["user2"])), ["post004", "post001"])
+
+    def test_incomplete_timeline_defers_to_the_query(self):
+        """Test that reading past the stored posts of a capped timeline returns None."""
+        self.store.backfill("user1", [post(i) for i in range(3)], complete=False)
+
+        first = self.store.read_page("user1", [], page_size=2)
+        self.assertEqual(self.ids(first), ["post002", "post001"])
+        self.assertIsNone(self.store.read_page("user1", [], first[1], page_size=2))
+
+    def test_timelines_expire(self):
+        """Test that a timeline must be built again after TIMELINE_TTL."""
+        self.store.backfill("user1", [], complete=True)
+        self.assertTrue(self.store.has_timeline("user1"))
+
+        self.clock.now = TIMELINE_TTL
+        self.assertFalse(self.store.has_timeline("user1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
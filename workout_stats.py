@@ -0,0 +1,176 @@
+#############################################################################
+# workout_stats.py
+#
+# This file contains the aggregation behind the activity summary.
+#
+# summarize_workouts turns a user's workouts into columns once and computes
+# every total, series and derived statistic from those columns with NumPy,
+# so the cost stays low for long histories and nothing here touches
+# Streamlit.
+#############################################################################
+
+import operator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from records import Record
+
+# The numeric fields summarized, and the Workouts columns they come from.
+METRIC_FIELDS = {
+    'distance': 'TotalDistance',
+    'steps': 'TotalSteps',
+    'calories_burned': 'CaloriesBurned',
+}
+TIMESTAMP_FIELDS = {
+    'start_timestamp': 'StartTimestamp',
+    'end_timestamp': 'EndTimestamp',
+}
+
+
+def _metric_array(values):
+    """Returns (values with missing ones as 0, mask of the missing ones)."""
+    array = np.asarray(values)
+    if array.dtype.kind in "iuf":
+        return array, np.zeros(len(array), dtype=bool)
+    missing = np.equal(array, None)
+    array[missing] = 0
+    filled = np.asarray(array.tolist())
+    if filled.dtype.kind not in "iuf":
+        filled = filled.astype(float)
+    return filled, missing
+
+
+def _timestamp_array(values):
+    """Parses datetimes or timestamp strings into UTC datetime64, NaT if missing."""
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), utc=True, errors="coerce", format="ISO8601")
+    return parsed.dt.tz_localize(None).to_numpy(dtype="datetime64[s]")
+
+
+def _arrays_from_rows(workouts):
+    """Transposes a list of Workout records or dicts into one array per field.
+
+    A field that is absent or None counts as missing.
+    """
+    if all(isinstance(workout, Record) for workout in workouts):
+        # Attributes are read in C and keep the timestamps as datetimes
+        def column(field):
+            return list(map(operator.attrgetter(field), workouts))
+    else:
+        def column(field):
+            return list(map(operator.methodcaller('get', field), workouts))
+
+    arrays = {field: _metric_array(column(field)) for field in METRIC_FIELDS}
+    arrays.update({field: _timestamp_array(column(field)) for field in TIMESTAMP_FIELDS})
+    return arrays
+
+
+def _arrays_from_table(table):
+    """Reads the same arrays as _arrays_from_rows from a Workouts pyarrow Table."""
+    arrays = {}
+    for field, name in METRIC_FIELDS.items():
+        column = table.column(name)
+        missing = column.is_null().to_numpy(zero_copy_only=False)
+        arrays[field] = (pc.fill_null(column, 0).to_numpy(zero_copy_only=False), missing)
+    for field, name in TIMESTAMP_FIELDS.items():
+        # BigQuery timestamps are UTC, so dropping the zone keeps UTC times
+        column = table.column(name).cast(pa.timestamp("s"), safe=False)
+        arrays[field] = column.to_numpy(zero_copy_only=False).astype("datetime64[s]")
+    return arrays
+
+
+def _python(value):
+    # Turn NumPy scalars into plain ints and floats for the caller
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _nan_to_none(values):
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def summarize_workouts(workouts):
+    """Computes the activity summary of a list of workouts in one pass.
+
+    Args:
+        workouts (list of Workout or dict, or pyarrow.Table): The workouts, as
+            returned by get_user_workouts or get_user_workouts_table. Missing
+            distances, steps or calories count as 0 in totals and are listed
+            under 'missing'.
+
+    Returns:
+        dict: The processed data, or an empty dict if there are no workouts:
+            - 'count': int, the number of workouts
+            - 'total_distance', 'total_steps', 'total_calories': totals
+            - 'average_distance', 'average_steps', 'average_calories': means
+            - 'distances', 'steps', 'calories': list per workout, in order
+            - 'durations': list of minutes per workout, None if unknown
+            - 'paces': list of minutes per unit of distance, None if unknown
+            - 'average_pace': total minutes over total distance of the
+              workouts with both, or None
+            - 'missing': dict of field name to the indices missing it
+            - 'has_missing': bool, whether any metric is missing
+            - 'daily': dict of lists 'date' (YYYY-MM-DD), 'workouts',
+              'distance', 'steps' and 'calories', one entry per day with a
+              workout, in date order
+    """
+    if isinstance(workouts, pa.Table):
+        if workouts.num_rows == 0:
+            return {}
+        arrays = _arrays_from_table(workouts)
+    else:
+        workouts = list(workouts)
+        if not workouts:
+            return {}
+        arrays = _arrays_from_rows(workouts)
+
+    distance, distance_missing = arrays['distance']
+    steps, steps_missing = arrays['steps']
+    calories, calories_missing = arrays['calories_burned']
+    start = arrays['start_timestamp']
+    end = arrays['end_timestamp']
+    count = len(distance)
+
+    minutes = (end - start).astype("timedelta64[s]").astype(float) / 60
+    minutes[np.isnat(start) | np.isnat(end)] = np.nan
+    has_pace = ~np.isnan(minutes) & (distance > 0)
+    paces = np.full(count, np.nan)
+    paces[has_pace] = minutes[has_pace] / distance[has_pace]
+    paced_distance = distance[has_pace].sum()
+
+    dated = ~np.isnat(start)
+    days, day_index = np.unique(start[dated].astype("datetime64[D]"), return_inverse=True)
+
+    def per_day(values):
+        return np.bincount(day_index, weights=values[dated], minlength=len(days))
+
+    missing = {
+        'distance': np.flatnonzero(distance_missing).tolist(),
+        'steps': np.flatnonzero(steps_missing).tolist(),
+        'calories_burned': np.flatnonzero(calories_missing).tolist(),
+    }
+    return {
+        'count': count,
+        'total_distance': _python(distance.sum()),
+        'total_steps': _python(steps.sum()),
+        'total_calories': _python(calories.sum()),
+        'average_distance': _python(distance.mean()),
+        'average_steps': _python(steps.mean()),
+        'average_calories': _python(calories.mean()),
+        'distances': distance.tolist(),
+        'steps': steps.tolist(),
+        'calories': calories.tolist(),
+        'durations': _nan_to_none(minutes),
+        'paces': _nan_to_none(paces),
+        'average_pace': _python(minutes[has_pace].sum() / paced_distance) if paced_distance else None,
+        'missing': missing,
+        'has_missing': any(missing.values()),
+        'daily': {
+            'date': np.datetime_as_string(days).tolist(),
+            'workouts': np.bincount(day_index, minlength=len(days)).tolist(),
+            'distance': per_day(distance).tolist(),
+            'steps': per_day(steps).astype(steps.dtype).tolist(),
+            'calories': per_day(calories).astype(calories.dtype).tolist(),
+        },
+    }
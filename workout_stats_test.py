@@ -0,0 +1,91 @@
+#############################################################################
+# workout_stats_test.py
+#
+# This file contains tests for workout_stats.py.
+#############################################################################
+import unittest
+from datetime import datetime, timezone
+
+import pyarrow as pa
+
+from records import Workout
+from workout_stats import summarize_workouts
+
+
+class TestSummarizeWorkouts(unittest.TestCase):
+
+    def setUp(self):
+        self.workouts = [
+            {'workout_id': '1', 'start_timestamp': '2023-10-26 10:00:00', 'end_timestamp': '2023-10-26 11:00:00',
+             'distance': 5.0, 'steps': 10000, 'calories_burned': 500},
+            {'workout_id': '2', 'start_timestamp': '2023-10-26 18:00:00', 'end_timestamp': '2023-10-26 18:30:00',
+             'distance': 3.0, 'steps': 6000, 'calories_burned': 300},
+            {'workout_id': '3', 'start_timestamp': '2023-10-28 07:00:00', 'end_timestamp': None,
+             'distance': 2.0, 'steps': 4000, 'calories_burned': 200},
+        ]
+
+    def test_empty(self):
+        """Test that no workouts give an empty summary."""
+        self.assertEqual(summarize_workouts([]), {})
+
+    def test_totals_and_derived_stats(self):
+        """Test totals, averages, durations, paces and day buckets."""
+        summary = summarize_workouts(self.workouts)
+
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['total_distance'], 10.0)
+        self.assertEqual(summary['total_steps'], 20000)
+        self.assertIsInstance(summary['total_steps'], int)
+        self.assertEqual(summary['total_calories'], 1000)
+        self.assertAlmostEqual(summary['average_steps'], 20000 / 3)
+        self.assertEqual(summary['distances'], [5.0, 3.0, 2.0])
+        self.assertEqual(summary['durations'], [60.0, 30.0, None])
+        self.assertEqual(summary['paces'], [12.0, 10.0, None])
+        # The third workout has no end time, so it is left out of the pace
+        self.assertEqual(summary['average_pace'], 90.0 / 8.0)
+        self.assertEqual(summary['daily'], {
+            'date': ['2023-10-26', '2023-10-28'],
+            'workouts': [2, 1],
+            'distance': [8.0, 2.0],
+            'steps': [16000, 4000],
+            'calories': [800, 200],
+        })
+        self.assertFalse(summary['has_missing'])
+
+    def test_missing_values(self):
+        """Test that missing metrics count as zero and are reported."""
+        del self.workouts[1]['calories_burned']
+        self.workouts[2]['steps'] = None
+
+        summary = summarize_workouts(self.workouts)
+
+        self.assertTrue(summary['has_missing'])
+        self.assertEqual(summary['missing'], {'distance': [], 'steps': [2], 'calories_burned': [1]})
+        self.assertEqual(summary['total_calories'], 700)
+        self.assertEqual(summary['steps'], [10000, 6000, 0])
+
+    def test_records_and_tables_match_dicts(self):
+        """Test that records and an Arrow table give the same summary as dicts."""
+        def parse(text):
+            return datetime.strptime(text, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc) if text else None
+
+        records = [
+            Workout(w['workout_id'], parse(w['start_timestamp']), parse(w['end_timestamp']), None, None,
+                    w['distance'], w['steps'], w['calories_burned'])
+            for w in self.workouts
+        ]
+        table = pa.table({
+            'StartTimestamp': pa.array([r.start_timestamp for r in records], pa.timestamp('us', tz='UTC')),
+            'EndTimestamp': pa.array([r.end_timestamp for r in records], pa.timestamp('us', tz='UTC')),
+            'TotalDistance': [r.distance for r in records],
+            'TotalSteps': [r.steps for r in records],
+            'CaloriesBurned': [r.calories_burned for r in records],
+        })
+
+        expected = summarize_workouts(self.workouts)
+        self.assertEqual(summarize_workouts(records), expected)
+        self.assertEqual(summarize_workouts(table), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,340 @@
+#############################################################################
+# write_buffer.py
+#
+# This file contains the write-behind buffer for rows the app inserts.
+#
+# Sharing a post or logging a meal used to stream one row into BigQuery while
+# the user waited. Instead the page adds the row to its table's buffer and
+# returns at once. A background thread per table sends the queued rows in
+# batches, retrying failed rows with exponential backoff, and the fetchers
+# merge rows that are still pending into what they read, so the user sees
+# their change on the very next rerun.
+#
+# Every row carries an insert ID (its PostId or MealId), so BigQuery drops
+# the duplicate if a retried batch had in fact been written.
+#############################################################################
+
+import atexit
+import threading
+import time
+from typing import NamedTuple
+
+from storage import get_storage_backend
+
+# The tables written through a buffer, with the field that identifies a row
+# and the field holding the user it belongs to.
+BUFFERED_TABLES = {
+    "Posts": ("PostId", "AuthorId"),
+    "CalorieTracking": ("MealId", "UserId"),
+}
+
+# Seconds the flush thread waits for more rows before sending a batch.
+WRITE_BUFFER_FLUSH_INTERVAL = 0.5
+# Most rows sent in one insert request.
+WRITE_BUFFER_MAX_BATCH = 500
+# Attempts per row before it is given up on and moved to the failed rows.
+WRITE_BUFFER_MAX_ATTEMPTS = 5
+# Seconds before the first retry; each further retry waits twice as long,
+# up to WRITE_BUFFER_MAX_BACKOFF.
+WRITE_BUFFER_BACKOFF = 0.5
+WRITE_BUFFER_MAX_BACKOFF = 30.0
+# Seconds the process waits at exit for pending rows to be written.
+WRITE_BUFFER_EXIT_TIMEOUT = 10.0
+
+# Flush listeners run in this order: first those that update data derived
+# from the rows (copies, rollups), then those that drop cached reads, so a
+# read made in between cannot cache what was there before the write. The
+# rows stop being pending in between, so a read made after the caches are
+# dropped cannot count a row both from storage and as pending.
+FLUSH_ORDER_DERIVED = 0
+FLUSH_ORDER_CACHES = 1
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+_flush_listeners = []
+
+
+class WriteBufferStats(NamedTuple):
+    """Counters of one write buffer.
+
+    Attributes:
+        table (str): The table written to.
+        queue_depth (int): Rows waiting to be sent.
+        in_flight (int): Rows in the batch being sent.
+        flushed (int): Rows written since the buffer was created.
+        failed (int): Rows given up on after WRITE_BUFFER_MAX_ATTEMPTS.
+        retries (int): Rows sent again after a failed attempt.
+        batches (int): Insert requests that wrote at least one row.
+        last_flush_latency (float): Seconds the last batch took to be
+            written, retries included, or None before the first.
+        max_flush_latency (float): The longest such time, or None.
+    """
+    table: str
+    queue_depth: int
+    in_flight: int
+    flushed: int
+    failed: int
+    retries: int
+    batches: int
+    last_flush_latency: float
+    max_flush_latency: float
+
+
+def add_flush_listener(callback, order=FLUSH_ORDER_CACHES):
+    """Registers callback(table, rows) to run after rows are written.
+
+    Listeners run on the flush thread, e.g. to drop cached results the new
+    rows make stale. They run by order (FLUSH_ORDER_DERIVED or
+    FLUSH_ORDER_CACHES), then in the order they were added, whatever order
+    their modules are imported in. FLUSH_ORDER_DERIVED listeners run while
+    the rows are still pending, FLUSH_ORDER_CACHES ones once they no longer
+    are. An exception in a listener is printed and does not affect the write.
+    """
+    _flush_listeners.append((order, callback))
+    _flush_listeners.sort(key=lambda listener: listener[0])
+
+
+class WriteBuffer:
+    """Queues rows for one table and inserts them in batches in the background.
+
+    Args:
+        table (str): The table name, e.g. "Posts".
+        key_field (str): The field that identifies a row, used as insert ID.
+        user_field (str): The field holding the user the row belongs to.
+        backend_factory (callable): Returns the storage backend.
+        sleep (callable): Waits the given seconds between retries.
+    """
+
+    def __init__(self, table, key_field, user_field, backend_factory=get_storage_backend, sleep=None):
+        self.table = table
+        self.key_field = key_field
+        self.user_field = user_field
+        self._backend_factory = backend_factory
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._sleep = sleep or self._stopped.wait
+        self._queue = []
+        self._in_flight = []
+        # True from taking a batch until its last listener has run
+        self._writing = False
+        self._failed = []
+        self._thread = None
+        self._flush_requested = False
+        self._flushed = 0
+        self._retries = 0
+        self._batches = 0
+        self._last_latency = None
+        self._max_latency = None
+
+    def add(self, row):
+        """Queues row (a dict of column values) to be inserted and returns at once."""
+        if not row.get(self.key_field):
+            raise ValueError(f"Row must have a {self.key_field}.")
+        with self._condition:
+            if self._stopped.is_set():
+                raise RuntimeError(f"The {self.table} write buffer is closed.")
+            self._queue.append((dict(row), time.monotonic()))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"write-buffer-{self.table}", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify_all()
+
+    def pending(self, user_id):
+        """Returns user_id's rows not written yet, oldest first."""
+        with self._condition:
+            rows = [row for row, _ in self._in_flight + self._queue]
+        return [row for row in rows if row.get(self.user_field) == user_id]
+
+    def failed(self):
+        """Returns the rows that could not be written, oldest first."""
+        with self._condition:
+            return [row for row, _ in self._failed]
+
+    def take_failed(self, user_id):
+        """Removes user_id's rows that could not be written and returns them, oldest first.
+
+        Pages call this to tell the user, once, that a change was not saved.
+        """
+        with self._condition:
+            taken = [row for row, _ in self._failed if row.get(self.user_field) == user_id]
+            self._failed = [entry for entry in self._failed if entry[0].get(self.user_field) != user_id]
+        return taken
+
+    def flush(self, timeout=None):
+        """Sends every queued row now and waits until none is pending.
+
+        Returns:
+            bool: False if rows were still pending after timeout seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._queue or self._in_flight or self._writing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def close(self, timeout=None):
+        """Flushes the queue, then stops the flush thread."""
+        self.flush(timeout)
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        """Returns the buffer's WriteBufferStats."""
+        with self._condition:
+            return WriteBufferStats(
+                table=self.table,
+                queue_depth=len(self._queue),
+                in_flight=len(self._in_flight),
+                flushed=self._flushed,
+                failed=len(self._failed),
+                retries=self._retries,
+                batches=self._batches,
+                last_flush_latency=self._last_latency,
+                max_flush_latency=self._max_latency,
+            )
+
+    def _next_batch(self):
+        """Waits for rows, then moves up to a batch of them in flight."""
+        with self._condition:
+            while not self._queue and not self._stopped.is_set():
+                self._condition.wait()
+            # Give rows added right after this one a chance to share the request
+            deadline = time.monotonic() + WRITE_BUFFER_FLUSH_INTERVAL
+            while (len(self._queue) < WRITE_BUFFER_MAX_BATCH and not self._flush_requested
+                   and not self._stopped.is_set()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            self._flush_requested = False
+            self._in_flight = self._queue[:WRITE_BUFFER_MAX_BATCH]
+            del self._queue[:WRITE_BUFFER_MAX_BATCH]
+            self._writing = bool(self._in_flight)
+            return list(self._in_flight)
+
+    def _insert(self, rows):
+        """Sends rows once; returns the indices of the rows that failed."""
+        try:
+            errors = self._backend_factory().insert_rows(
+                self.table, rows, row_ids=[row[self.key_field] for row in rows]
+            )
+        except Exception as e:
+            print(f"Could not write {len(rows)} rows to {self.table}: {e}")
+            return set(range(len(rows)))
+        if errors:
+            print(f"Errors encountered while inserting rows into {self.table}: {errors}")
+        return {error["index"] for error in errors or ()}
+
+    def _write(self, batch):
+        """Writes a batch, retrying the rows that fail, and reports the outcome."""
+        rows = batch
+        written = []
+        attempt = 0
+        while rows:
+            failed = self._insert([row for row, _ in rows])
+            written.extend(entry for i, entry in enumerate(rows) if i not in failed)
+            rows = [entry for i, entry in enumerate(rows) if i in failed]
+            attempt += 1
+            if not rows or attempt >= WRITE_BUFFER_MAX_ATTEMPTS or self._stopped.is_set():
+                break
+            with self._condition:
+                self._retries += len(rows)
+            self._sleep(min(WRITE_BUFFER_BACKOFF * 2 ** (attempt - 1), WRITE_BUFFER_MAX_BACKOFF))
+
+        listeners = list(_flush_listeners)
+        self._notify(written, [listener for order, listener in listeners if order < FLUSH_ORDER_CACHES])
+
+        with self._condition:
+            now = time.monotonic()
+            if written:
+                latency = now - min(added for _, added in written)
+                self._flushed += len(written)
+                self._batches += 1
+                self._last_latency = latency
+                self._max_latency = max(self._max_latency or 0.0, latency)
+            # The written rows stop being pending before cached reads are
+            # dropped; the failed ones until they are moved to the failed rows
+            self._in_flight = list(rows)
+
+        self._notify(written, [listener for order, listener in listeners if order >= FLUSH_ORDER_CACHES])
+
+        with self._condition:
+            self._failed.extend(rows)
+            self._in_flight = []
+            self._writing = False
+            self._condition.notify_all()
+
+    def _notify(self, written, listeners):
+        """Runs listeners on the written rows, if any."""
+        if not written:
+            return
+        for listener in listeners:
+            try:
+                listener(self.table, [row for row, _ in written])
+            except Exception as e:
+                print(f"Write buffer listener failed for {self.table}: {e}")
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif self._stopped.is_set():
+                return
+
+
+def get_write_buffer(table):
+    """Returns the process-wide write buffer of one of BUFFERED_TABLES."""
+    if table not in BUFFERED_TABLES:
+        raise ValueError(f"Table must be one of {sorted(BUFFERED_TABLES)}.")
+    with _buffers_lock:
+        buffer = _buffers.get(table)
+        if buffer is None:
+            key_field, user_field = BUFFERED_TABLES[table]
+            buffer = _buffers[table] = WriteBuffer(table, key_field, user_field)
+        return buffer
+
+
+def pending_rows(table, user_id):
+    """Returns user_id's rows for table that are not written yet."""
+    with _buffers_lock:
+        buffer = _buffers.get(table)
+    return buffer.pending(user_id) if buffer is not None else []
+
+
+def take_failed_rows(table, user_id):
+    """Removes and returns user_id's rows for table that could not be written."""
+    with _buffers_lock:
+        buffer = _buffers.get(table)
+    return buffer.take_failed(user_id) if buffer is not None else []
+
+
+def write_buffer_stats():
+    """Returns the WriteBufferStats of every buffer in use, keyed by table."""
+    with _buffers_lock:
+        buffers = dict(_buffers)
+    return {table: buffer.stats() for table, buffer in buffers.items()}
+
+
+def flush_all(timeout=None):
+    """Flushes every buffer, e.g. before the process exits.
+
+    Returns:
+        bool: False if any buffer still had pending rows after timeout seconds.
+    """
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+    return all([buffer.flush(timeout) for buffer in buffers])
+
+
+atexit.register(flush_all, WRITE_BUFFER_EXIT_TIMEOUT)
@@ -0,0 +1,202 @@
+#############################################################################
+# write_buffer_test.py
+#
+# This file contains tests for write_buffer.py.
+#############################################################################
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from clients import reset_bigquery_client, set_bigquery_client
+from data_fetcher import QUERY_POSTS, clear_caches, get_user_calorie_summary, get_user_posts
+from storage import SQLiteBackend, set_storage_backend
+from write_buffer import (FLUSH_ORDER_CACHES, FLUSH_ORDER_DERIVED, WriteBuffer, _flush_listeners,
+                          add_flush_listener, get_write_buffer, write_buffer_stats)
+
+
+def post_row(post_id, author="user1"):
+    return {
+        "PostId": post_id,
+        "AuthorId": author,
+        "Timestamp": "2025-04-20T12:00:00",
+        "ImageUrl": None,
+        "Content": f"Content of {post_id}",
+    }
+
+
+class TestWriteBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = MagicMock()
+        self.backend.insert_rows.return_value = []
+        self.sleeps = []
+        self.buffer = WriteBuffer("Posts", "PostId", "AuthorId",
+                                  backend_factory=lambda: self.backend, sleep=self.sleeps.append)
+        self.addCleanup(self.buffer.close, 5)
+
+        # Hold rows until flush() so tests control when batches go out
+        interval = patch("write_buffer.WRITE_BUFFER_FLUSH_INTERVAL", 60)
+        interval.start()
+        self.addCleanup(interval.stop)
+
+    def test_rows_are_sent_in_one_batch(self):
+        """Test that queued rows are inserted together with their IDs as insert IDs."""
+        self.buffer.add(post_row("post1"))
+        self.buffer.add(post_row("post2", author="user2"))
+
+        self.assertEqual([row["PostId"] for row in self.buffer.pending("user1")], ["post1"])
+        self.assertTrue(self.buffer.flush(timeout=5))
+
+        self.backend.insert_rows.assert_called_once()
+        rows = self.backend.insert_rows.call_args.args[1]
+        self.assertEqual([row["PostId"] for row in rows], ["post1", "post2"])
+        self.assertEqual(self.backend.insert_rows.call_args.kwargs["row_ids"], ["post1", "post2"])
+        self.assertEqual(self.buffer.pending("user1"), [])
+
+        stats = self.buffer.stats()
+        self.assertEqual((stats.queue_depth, stats.in_flight, stats.flushed, stats.batches), (0, 0, 2, 1))
+        self.assertIsNotNone(stats.last_flush_latency)
+
+    def test_failed_rows_are_retried_with_backoff(self):
+        """Test that only rows reported as failed are sent again, with growing waits."""
+        self.backend.insert_rows.side_effect = [
+            [{"index": 1, "errors": ["backendError"]}],
+            Exception("connection reset"),
+            [],
+        ]
+        self.buffer.add(post_row("post1"))
+        self.buffer.add(post_row("post2"))
+
+        self.assertTrue(self.buffer.flush(timeout=5))
+
+        retried = [call.args[1] for call in self.backend.insert_rows.call_args_list[1:]]
+        self.assertEqual(retried, [[post_row("post2")], [post_row("post2")]])
+        self.assertEqual(self.sleeps, [0.5, 1.0])
+        self.assertEqual(self.buffer.stats().retries, 2)
+        self.assertEqual(self.buffer.stats().flushed, 2)
+
+    @patch("write_buffer.WRITE_BUFFER_MAX_ATTEMPTS", 3)
+    def test_rows_are_given_up_after_max_attempts(self):
+        """Test that a row failing every attempt is moved to the failed rows."""
+        self.backend.insert_rows.side_effect = Exception("quota exceeded")
+        self.buffer.add(post_row("post1"))
+
+        self.assertTrue(self.buffer.flush(timeout=5))
+
+        self.assertEqual(self.backend.insert_rows.call_count, 3)
+        self.assertEqual(self.buffer.failed(), [post_row("post1")])
+        self.assertEqual(self.buffer.pending("user1"), [])
+        self.assertEqual(self.buffer.stats().failed, 1)
+
+        # Each failed row is reported to its user once
+        self.assertEqual(self.buffer.take_failed("user2"), [])
+        self.assertEqual(self.buffer.take_failed("user1"), [post_row("post1")])
+        self.assertEqual(self.buffer.take_failed("user1"), [])
+
+    def test_listeners_see_written_rows(self):
+        """Test that flush listeners get the rows once they are written, in order."""
+        seen = []
+        with patch("write_buffer._flush_listeners", []):
+            add_flush_listener(lambda table, rows: seen.append(("cache", table, rows)))
+            add_flush_listener(lambda table, rows: seen.append(("rollup", table, rows)), FLUSH_ORDER_DERIVED)
+            self.buffer.add(post_row("post1"))
+            self.buffer.flush(timeout=5)
+
+        # Derived data is updated before caches are dropped, whatever order they were added in
+        self.assertEqual(seen, [("rollup", "Posts", [post_row("post1")]), ("cache", "Posts", [post_row("post1")])])
+
+    def test_rows_need_an_id(self):
+        """Test that a row without its key field is rejected."""
+        with self.assertRaises(ValueError):
+            self.buffer.add({"AuthorId": "user1"})
+
+
+class TestPendingRowsInReads(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.insert_rows_json.return_value = []
+        self.client.query.return_value.result.side_effect = lambda: iter([])
+        set_bigquery_client(self.client)
+        self.addCleanup(reset_bigquery_client)
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+        buffers = patch.dict("write_buffer._buffers", clear=True)
+        buffers.start()
+        self.addCleanup(buffers.stop)
+        interval = patch("write_buffer.WRITE_BUFFER_FLUSH_INTERVAL", 60)
+        interval.start()
+        self.addCleanup(interval.stop)
+
+    def posts_queries(self):
+        # Written posts are also published to friends' timelines, which may query
+        return sum(call.args[0] == QUERY_POSTS for call in self.client.query.call_args_list)
+
+    def test_pending_post_is_read_back_once(self):
+        """Test that a post shows up before it is written and is not doubled after."""
+        get_user_posts("user1")
+        buffer = get_write_buffer("Posts")
+        self.addCleanup(buffer.close, 5)
+
+        buffer.add(post_row("post1"))
+        posts = get_user_posts("user1")
+        self.assertEqual([post.post_id for post in posts], ["post1"])
+        self.assertEqual(posts[0]["timestamp"], "2025-04-20 12:00:00")
+        self.assertEqual(self.posts_queries(), 1)
+        self.assertEqual(get_user_posts("user2"), [])
+
+        self.client.query.return_value.result.side_effect = lambda: iter([MagicMock(
+            AuthorId="user1", PostId="post1", Timestamp=None, Content="Content of post1", ImageUrl=None,
+        )])
+        buffer.flush(timeout=5)
+
+        # The write dropped the cached posts, so the stored row is read instead
+        self.assertEqual([post.post_id for post in get_user_posts("user1")], ["post1"])
+        self.assertEqual(self.posts_queries(), 3)
+        self.assertEqual(write_buffer_stats()["Posts"].flushed, 1)
+
+    def test_pending_meals_count_in_the_summary(self):
+        """Test that a meal not written yet is added to its day's totals, and not cached."""
+        today = datetime.utcnow().date()
+        yesterday = today - timedelta(days=1)
+        buffer = get_write_buffer("CalorieTracking")
+        self.addCleanup(buffer.close, 5)
+
+        buffer.add({"MealId": "meal1", "UserId": "user1", "MealName": "Pasta", "Calories": 600,
+                    "Protein": 20, "Carbs": 80, "Fats": 10, "MealDate": yesterday.isoformat(),
+                    "CreatedAt": "2025-04-20T12:00:00"})
+        summary = get_user_calorie_summary("user1", yesterday, today)
+        self.assertEqual(list(summary["total_calories"]), [600, 0])
+        self.assertEqual(list(summary["meal_count"]), [1, 0])
+
+        with patch.object(buffer, "pending", return_value=[]):
+            summary = get_user_calorie_summary("user1", yesterday, today)
+        self.assertEqual(list(summary["total_calories"]), [0, 0])
+
+    def test_meal_is_counted_once_during_its_flush(self):
+        """Test that a read made as caches are dropped sees the written meal once, not also as pending."""
+        set_storage_backend(SQLiteBackend(":memory:"))
+        self.addCleanup(set_storage_backend, None)
+        yesterday = datetime.utcnow().date() - timedelta(days=1)
+        buffer = get_write_buffer("CalorieTracking")
+        self.addCleanup(buffer.close, 5)
+
+        seen = []
+        read = lambda table, rows: seen.append(
+            list(get_user_calorie_summary("user1", yesterday, yesterday)["total_calories"])
+        )
+        # The read runs ahead of the other listeners that drop caches
+        listeners = sorted([(FLUSH_ORDER_CACHES, read)] + _flush_listeners, key=lambda listener: listener[0])
+        with patch("write_buffer._flush_listeners", listeners):
+            buffer.add({"MealId": "meal1", "UserId": "user1", "MealName": "Pasta", "Calories": 600,
+                        "Protein": 20, "Carbs": 80, "Fats": 10, "MealDate": yesterday.isoformat(),
+                        "CreatedAt": "2025-04-20T12:00:00"})
+            self.assertTrue(buffer.flush(timeout=5))
+
+        self.assertEqual(seen, [[600]])
+        self.assertEqual(list(get_user_calorie_summary("user1", yesterday, yesterday)["total_calories"]), [600])
+
+
+if __name__ == "__main__":
+    unittest.main()